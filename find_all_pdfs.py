@@ -2,127 +2,139 @@
 """
 Find all PDFs from SWE3 site - including those not in REST API
 """
-import requests
+import argparse
 import json
+import os
 import sys
 from urllib.parse import urljoin
 
+# Shared SWE3 client modules live with the scraper plugin
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wp-content', 'plugins', 'bkgt-swe3-scraper', 'includes'))
+from swe3_crawler import SWE3Crawler
+from swe3_media_client import SWE3MediaClient
+from swe3_output import NDJSONWriter, add_output_argument
+from swe3_sitemap import SWE3SitemapReader, advance_watermark, default_state_path, load_watermark
+
+def iter_pdfs_from_api():
+    """Yield PDFs from WordPress REST API as each page is parsed"""
+    client = SWE3MediaClient(max_pages=20)  # Check up to 20 pages (2000 items)
+    
+    try:
+        for doc in client.iter_documents():
+            yield {
+                'id': doc.id,
+                'title': doc.title,
+                'url': doc.url,
+                'size': doc.size,
+                'date': doc.date,
+                'source': 'REST API'
+            }
+    except Exception as e:
+        print(f"[API] Error: {e}", file=sys.stderr)
+    
+    print(f"[API] {client.stats['requests']} requests, {client.stats['bytes']:,} bytes "
+          f"in {client.stats['seconds']:.2f}s", file=sys.stderr)
+
 def find_pdfs_from_api():
     """Get PDFs from WordPress REST API with full pagination"""
-    base_url = 'https://amerikanskfotboll.swe3.se/wp-json/wp/v2/media'
-    all_files = {}
+    return {doc['url']: doc for doc in iter_pdfs_from_api()}
+
+def iter_pdfs_via_sitemap(incremental=False):
+    """
+    Yield PDF entries from the sitemap index and its (possibly gzipped) child sitemaps as they are parsed
     
-    for page in range(1, 20):  # Check up to 20 pages (2000 items)
-        try:
-            resp = requests.get(f'{base_url}?per_page=100&page={page}', timeout=10)
-            if resp.status_code != 200:
-                print(f"[API] Page {page}: Status {resp.status_code}", file=sys.stderr)
-                break
-            
-            data = resp.json()
-            if not data:
-                print(f"[API] Page {page}: No more data", file=sys.stderr)
-                break
-            
-            page_count = 0
-            for item in data:
-                if item.get('mime_type') == 'application/pdf':
-                    title = item.get('title', {})
-                    if isinstance(title, dict):
-                        title = title.get('rendered', item.get('slug', ''))
-                    
-                    all_files[item['source_url']] = {
-                        'id': item.get('id'),
-                        'title': title,
-                        'url': item.get('source_url', ''),
-                        'size': item.get('media_details', {}).get('filesize', 0),
-                        'date': item.get('date'),
-                        'source': 'REST API'
-                    }
-                    page_count += 1
-            
-            if page_count == 0:
-                print(f"[API] Page {page}: No PDFs on this page", file=sys.stderr)
-                if page > 1:
-                    break
-            else:
-                print(f"[API] Page {page}: Found {page_count} PDFs", file=sys.stderr)
-                
-        except Exception as e:
-            print(f"[API] Error on page {page}: {e}", file=sys.stderr)
-            break
+    Args:
+        incremental: Only entries changed since the last incremental run
+            (watermark in the state directory), then move the watermark
+    """
+    reader = SWE3SitemapReader()
+    state_path = default_state_path()
+    since = load_watermark(state_path) if incremental else None
     
-    return all_files
-
-def find_pdfs_via_sitemap():
-    """Try to get PDFs from sitemap or XML"""
     try:
-        resp = requests.get('https://amerikanskfotboll.swe3.se/sitemap.xml', timeout=10)
-        if resp.status_code == 200:
-            import re
-            urls = re.findall(r'<loc>(.*?\.pdf)</loc>', resp.text, re.IGNORECASE)
-            print(f"[SITEMAP] Found {len(urls)} PDF URLs", file=sys.stderr)
-            return urls
-    except:
-        pass
-    return []
+        yield from reader.iter_entries(since)
+    except Exception as e:
+        print(f"[SITEMAP] Error: {e}", file=sys.stderr)
+        return
+    
+    print(f"[SITEMAP] {reader.stats['matched'] - reader.stats['unchanged']} PDF URLs from "
+          f"{reader.stats['sitemaps']} sitemaps ({reader.stats['skipped_sitemaps']} unchanged sitemaps skipped, "
+          f"{reader.stats['errors']} errors) in {reader.stats['seconds']:.2f}s", file=sys.stderr)
+    if incremental:
+        advance_watermark(state_path, reader, since)
 
-def find_pdfs_via_crawl():
-    """Crawl common pages for PDF links"""
-    urls_found = set()
-    common_pages = [
-        '/regler/',
-        '/dokument/',
-        '/downloads/',
-        '/resources/',
-        '/tavlingsbestammelser/',
-        '/'
-    ]
+def find_pdfs_via_sitemap(incremental=False):
+    """Get PDF URLs from the site's sitemaps"""
+    return [entry.url for entry in iter_pdfs_via_sitemap(incremental)]
+
+def iter_pdfs_via_crawl(max_depth=3, time_budget=120):
+    """Crawl the public SWE3 site breadth-first, yielding PDF links as found"""
+    crawler = SWE3Crawler(max_depth=max_depth, time_budget=time_budget)
     
-    for page_path in common_pages:
-        try:
-            url = f'https://amerikanskfotboll.swe3.se{page_path}'
-            resp = requests.get(url, timeout=10)
-            if resp.status_code == 200:
-                import re
-                pdfs = re.findall(r'https://[^"\s]*\.pdf', resp.text, re.IGNORECASE)
-                if pdfs:
-                    print(f"[CRAWL] {page_path}: Found {len(pdfs)} PDFs", file=sys.stderr)
-                    urls_found.update(pdfs)
-        except Exception as e:
-            print(f"[CRAWL] Error on {page_path}: {e}", file=sys.stderr)
+    for url in crawler.crawl():
+        print(f"[CRAWL] {url}", file=sys.stderr)
+        yield url
     
-    return list(urls_found)
+    print(f"[CRAWL] {crawler.stats['pages']} pages, {crawler.stats['pdfs']} PDFs, "
+          f"{crawler.stats['errors']} errors", file=sys.stderr)
 
-if __name__ == '__main__':
-    print("=== Searching for all PDFs ===\n", file=sys.stderr)
-    
-    all_pdfs = {}
+def find_pdfs_via_crawl(max_depth=3, time_budget=120):
+    """Crawl the public SWE3 site breadth-first for PDF links"""
+    return list(iter_pdfs_via_crawl(max_depth, time_budget))
+
+def iter_all_pdfs(incremental_sitemap=False):
+    """Yield each unique PDF as soon as any source finds it (REST API, sitemap, crawl)"""
+    seen = set()
     
     # 1. Get from REST API
-    api_pdfs = find_pdfs_from_api()
-    all_pdfs.update(api_pdfs)
-    print(f"[API] Total: {len(api_pdfs)} PDFs\n", file=sys.stderr)
+    for doc in iter_pdfs_from_api():
+        if doc['url'] not in seen:
+            seen.add(doc['url'])
+            yield doc
+    print(f"[API] Total: {len(seen)} PDFs\n", file=sys.stderr)
     
-    # 2. Try sitemap
-    sitemap_urls = find_pdfs_via_sitemap()
-    for url in sitemap_urls:
-        if url not in all_pdfs:
-            all_pdfs[url] = {
-                'title': url.split('/')[-1],
-                'url': url,
+    # 2. Sitemaps
+    for entry in iter_pdfs_via_sitemap(incremental_sitemap):
+        if entry.url not in seen:
+            seen.add(entry.url)
+            yield {
+                'title': entry.url.split('/')[-1],
+                'url': entry.url,
+                'modified': entry.lastmod,
                 'source': 'Sitemap'
             }
     
-    # 3. Try crawling common pages
-    crawl_urls = find_pdfs_via_crawl()
-    for url in crawl_urls:
-        if url not in all_pdfs:
-            all_pdfs[url] = {
+    # 3. Crawl common pages
+    for url in iter_pdfs_via_crawl():
+        if url not in seen:
+            seen.add(url)
+            yield {
                 'title': url.split('/')[-1],
                 'url': url,
                 'source': 'Crawl'
             }
+
+def main():
+    """Command-line interface"""
+    parser = argparse.ArgumentParser(description='Find all PDFs on the SWE3 site')
+    parser.add_argument('--incremental-sitemap', action='store_true',
+                        help='Only sitemap entries changed since the last --incremental-sitemap run')
+    add_output_argument(parser)
+    args = parser.parse_args()
+    
+    print("=== Searching for all PDFs ===\n", file=sys.stderr)
+    
+    if args.output == 'ndjson':
+        writer = NDJSONWriter()
+        sources = {}
+        for doc in iter_all_pdfs(args.incremental_sitemap):
+            writer.document(doc)
+            sources[doc['source']] = sources.get(doc['source'], 0) + 1
+        print(f"\nTotal unique PDFs: {writer.count}", file=sys.stderr)
+        writer.summary(True, total_count=writer.count, sources=sources)
+        return 0
+    
+    all_pdfs = {doc['url']: doc for doc in iter_all_pdfs(args.incremental_sitemap)}
     
     print(f"\n=== Results ===", file=sys.stderr)
     print(f"Total unique PDFs: {len(all_pdfs)}", file=sys.stderr)
@@ -136,3 +148,7 @@ if __name__ == '__main__':
         'documents': sorted(list(all_pdfs.values()), key=lambda x: x.get('title', ''))
     }
     print(json.dumps(output, indent=2, ensure_ascii=False))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 """Test SWE3 upload endpoint"""
 
-import requests
+import os
 import sys
 
+# Shared SWE3 client modules live with the scraper plugin
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wp-content', 'plugins', 'bkgt-swe3-scraper', 'includes'))
+from swe3_http import get_session
+
 url = 'https://ledare.bkgt.se/wp-json/bkgt/v1/swe3-upload-document'
 
 # Create a test file
@@ -25,7 +29,7 @@ with open('/tmp/test_upload.pdf', 'rb') as f:
     print()
     
     try:
-        response = requests.post(url, files=files, data=data, timeout=10)
+        response = get_session().post(url, files=files, data=data, timeout=10)
         print(f"Status: {response.status_code}")
         print(f"Headers: {dict(response.headers)}")
         print(f"Body: {response.text[:500]}")
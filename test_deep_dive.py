@@ -4,15 +4,20 @@ SWE3 - Deep dive into available content
 Check posts, media, and look for PDF-related content
 """
 
-import requests
 import json
+import os
 import re
+import sys
+
+# Shared SWE3 client modules live with the scraper plugin
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wp-content', 'plugins', 'bkgt-swe3-scraper', 'includes'))
+from swe3_http import get_session
 
 base_url = 'https://amerikanskfotboll.swe3.se'
 
 print('=== Checking Posts ===')
 url = base_url + '/wp-json/wp/v2/posts?per_page=100'
-response = requests.get(url)
+response = get_session().get(url)
 posts = response.json()
 
 print(f'Found {len(posts)} posts')
@@ -28,7 +33,7 @@ if pdf_posts:
 
 print('\n=== Checking Media ===')
 url = base_url + '/wp-json/wp/v2/media?per_page=100'
-response = requests.get(url)
+response = get_session().get(url)
 media = response.json()
 
 print(f'Found {len(media)} media items')
@@ -41,7 +46,7 @@ for pdf_media in pdfs[:10]:
 
 print('\n=== Checking REST API Index ===')
 url = base_url + '/wp-json/'
-response = requests.get(url)
+response = get_session().get(url)
 root = response.json()
 
 namespaces = root.get('namespaces', [])
@@ -60,7 +65,7 @@ else:
 
 print('\n=== Getting Detailed Page Info ===')
 url = base_url + '/wp-json/wp/v2/pages/5776?_embed=true'
-response = requests.get(url)
+response = get_session().get(url)
 page = response.json()
 
 print(f'Page: {page["title"]["rendered"]}')
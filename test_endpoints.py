@@ -3,8 +3,13 @@
 SWE3 - Check for custom endpoints or alternative API routes
 """
 
-import requests
 import json
+import os
+import sys
+
+# Shared SWE3 client modules live with the scraper plugin
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wp-content', 'plugins', 'bkgt-swe3-scraper', 'includes'))
+from swe3_http import get_session
 
 endpoints_to_try = [
     # Standard WordPress REST API routes
@@ -36,7 +41,7 @@ print('Testing endpoints for PDF or document data:\n')
 for endpoint in endpoints_to_try:
     url = base_url + endpoint
     try:
-        response = requests.get(url, timeout=5)
+        response = get_session().get(url, timeout=5)
         
         # Check if response has content
         is_json = 'json' in response.headers.get('content-type', '')
@@ -71,7 +76,7 @@ for endpoint in endpoints_to_try:
 print(f'\n\nChecking page 5776 for attached media:')
 url = 'https://amerikanskfotboll.swe3.se/wp-json/wp/v2/pages/5776?_embed'
 try:
-    response = requests.get(url, timeout=5)
+    response = get_session().get(url, timeout=5)
     if response.status_code == 200:
         data = response.json()
         if '_embedded' in data:
@@ -4,9 +4,14 @@ SWE3 - Find PDF loading mechanism
 Check for JavaScript data, React props, or Ajax endpoints that fetch PDFs
 """
 
-import requests
 import re
 import json
+import os
+import sys
+
+# Shared SWE3 client modules live with the scraper plugin
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wp-content', 'plugins', 'bkgt-swe3-scraper', 'includes'))
+from swe3_http import get_session
 
 def find_pdf_loading():
     """Find how PDFs are loaded dynamically"""
@@ -14,7 +19,7 @@ def find_pdf_loading():
     
     print(f'Analyzing {url}...\n')
     
-    response = requests.get(url, timeout=10)
+    response = get_session().get(url, timeout=10)
     html = response.text
     
     # Look for window.* or window.DATA patterns
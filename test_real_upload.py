@@ -1,36 +1,34 @@
 #!/usr/bin/env python3
 """Quick test of SWE3 upload to DMS"""
 
-import requests
 import os
-
-# Get a real PDF URL from SWE3
-api_url = 'https://amerikanskfotboll.swe3.se/wp-json/wp/v2/media?per_page=1&mime_type=application/pdf'
-api_response = requests.get(api_url, timeout=30)
-
-if api_response.status_code != 200:
-    print(f'Failed to get API data: {api_response.status_code}')
+import sys
+
+# Shared SWE3 client modules live with the scraper plugin
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wp-content', 'plugins', 'bkgt-swe3-scraper', 'includes'))
+from swe3_http import get_session
+from swe3_media_client import SWE3MediaClient
+
+# Get a real PDF URL from SWE3 (first page of one item is enough)
+client = SWE3MediaClient(per_page=1, max_pages=1)
+try:
+    doc = next(client.iter_documents(), None)
+except RuntimeError as e:
+    print(f'Failed to get API data: {e}')
     exit(1)
 
-data = api_response.json()
-if not data:
+if not doc:
     print('No documents found')
     exit(1)
 
-doc = data[0]
-pdf_url = doc.get('source_url', '')
-title_obj = doc.get('title', {})
-
-if isinstance(title_obj, dict):
-    title = title_obj.get('rendered', f"doc_{doc.get('id', 'unknown')}")
-else:
-    title = str(title_obj)
+pdf_url = doc.url
+title = doc.title
 
 print(f'Found document: {title[:50]}')
 print(f'PDF URL: {pdf_url}')
 
 # Download the PDF
-pdf_response = requests.get(pdf_url, timeout=30)
+pdf_response = get_session().get(pdf_url, timeout=30)
 if pdf_response.status_code != 200:
     print(f'Failed to download PDF: {pdf_response.status_code}')
     exit(1)
@@ -44,13 +42,13 @@ print(f'Downloaded: {file_size} bytes')
 
 # Now upload to DMS
 with open(temp_file, 'rb') as f:
-    upload_response = requests.post(
+    upload_response = get_session().post(
         'https://ledare.bkgt.se/wp-admin/admin-ajax.php',
         data={
             'action': 'swe3_upload_document',
             'title': title,
             'url': pdf_url,
-            'date': doc.get('date', ''),
+            'date': doc.date,
             'size': file_size
         },
         files={'file': f},
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Link Extractor Benchmark
+Compares the single-pass swe3_link_extractor against the two regex passes
+SWE3DocumentScraper.extract_pdf_links used to run, on synthetic rendered
+pages of several megabytes (table rows of PDF links, nested anchor markup,
+inline scripts and filler). Prints a JSON report.
+
+Usage:
+    python3 bench_link_extractor.py [--sizes-mb 1 4 16] [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+import urllib.parse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'includes'))
+
+from swe3_link_extractor import PDFLinkExtractor, extract_pdf_links
+
+BASE_URL = 'https://amerikanskfotboll.swe3.se/forbundet/dokument/'
+
+
+def legacy_title_from_url(url):
+    """_extract_title_from_url as it was before the extractor"""
+    filename = urllib.parse.urlparse(url).path.split('/')[-1]
+    title = urllib.parse.unquote(filename)
+    if '.' in title:
+        title = title.rsplit('.', 1)[0]
+    return title or 'Document'
+
+
+def legacy_extract_pdf_links(html):
+    """The previous extract_pdf_links: two regex scans and a linear dedupe"""
+    documents = []
+
+    pdf_pattern = r'href=["\']?([^"\'>\s]+\.pdf)["\']?'
+    for match in re.finditer(pdf_pattern, html, re.IGNORECASE):
+        url = match.group(1)
+        if url.startswith('http') or url.startswith('/'):
+            documents.append({'url': url, 'title': legacy_title_from_url(url)})
+
+    link_pattern = r'<a\s+(?:[^>]*?\s+)?href=["\']?([^"\'>\s]+)["\']?[^>]*>([^<]+)</a>'
+    for match in re.finditer(link_pattern, html):
+        url = match.group(1)
+        title = match.group(2).strip()
+        if url.endswith('.pdf') or 'download' in url.lower() or 'document' in url.lower():
+            if not any(d['url'] == url for d in documents):
+                documents.append({'url': url, 'title': title if title else legacy_title_from_url(url)})
+
+    return documents
+
+
+def build_page(size_bytes, seed=0):
+    """
+    Rendered-page lookalike of roughly size_bytes
+
+    Returns:
+        (html, number of distinct document URLs in it)
+    """
+    rng = random.Random(seed)
+    parts = ['<!DOCTYPE html><html><head><title>Dokument</title>',
+             '<script>window.__STATE__ = {"menu": [1, 2, 3]};</script></head><body><table>']
+    size = sum(len(p) for p in parts)
+    urls = set()
+    row = 0
+
+    while size < size_bytes:
+        row += 1
+        year = 2015 + row % 11
+        kind = row % 4
+        if kind == 0:
+            url = f'/wp-content/uploads/{year}/{row % 12 + 1:02d}/regler-{row}.pdf'
+            cell = f'<a href="{url}">Spelregler {row}</a>'
+        elif kind == 1:
+            url = f'https://amerikanskfotboll.swe3.se/wp-content/uploads/{year}/protokoll_{row}.pdf'
+            cell = f'<a class="doc" href="{url}"><strong>Protokoll</strong> <em>{year}</em></a>'
+        elif kind == 2:
+            url = f'bilagor/bilaga-{row}.pdf'
+            cell = f'<a href="{url}" target="_blank"><span class="icon"></span>Bilaga {row}</a>'
+        else:
+            url = f'/download/{row}'
+            cell = f'<a href="{url}">Ladda ner {row}</a>'
+        urls.add(urllib.parse.urljoin(BASE_URL, url))
+
+        # Repeat some links, as menus and footers do
+        if rng.random() < 0.2:
+            cell += cell
+
+        filler = ''.join(rng.choice('abcdefghij klmnopqrstuvwxyz') for _ in range(rng.randint(80, 400)))
+        chunk = (f'<tr><td class="c{row % 7}">{cell}</td><td>{filler}</td>'
+                 f'<td><a href="/nyheter/{row}">Nyhet</a></td></tr>\n')
+        parts.append(chunk)
+        size += len(chunk)
+
+    parts.append('</table></body></html>')
+    return ''.join(parts), len(urls)
+
+
+def best_of(func, repeat):
+    """Fastest of `repeat` runs (seconds) and the last result"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def streamed(html_bytes, chunk_size=64 * 1024):
+    """Feed the extractor network-sized byte chunks"""
+    extractor = PDFLinkExtractor(BASE_URL)
+    for offset in range(0, len(html_bytes), chunk_size):
+        extractor.feed_bytes(html_bytes[offset:offset + chunk_size])
+    extractor.close()
+    return extractor.documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark PDF link extraction')
+    parser.add_argument('--sizes-mb', type=float, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    report = []
+    for size_mb in args.sizes_mb:
+        html, distinct = build_page(int(size_mb * 1024 * 1024))
+        html_bytes = html.encode('utf-8')
+        mb = len(html_bytes) / (1024 * 1024)
+        entry = {'size_mb': round(mb, 2), 'distinct_documents': distinct}
+
+        for name, func in (
+            ('regex', lambda: legacy_extract_pdf_links(html)),
+            ('extractor', lambda: extract_pdf_links(html, BASE_URL)),
+            ('extractor_streamed', lambda: streamed(html_bytes)),
+        ):
+            seconds, documents = best_of(func, args.repeat)
+            entry[name] = {
+                'seconds': round(seconds, 4),
+                'mb_per_second': round(mb / seconds, 2) if seconds else None,
+                'found': len(documents),
+                'unique_urls': len({d['url'] for d in documents})
+            }
+            print(f"[BENCH] {size_mb} MB {name}: {seconds:.3f}s", file=sys.stderr)
+
+        entry['speedup'] = round(entry['regex']['seconds'] / entry['extractor']['seconds'], 2)
+        report.append(entry)
+
+    print(json.dumps({'results': report}, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Offline Pipeline Benchmark
+Runs SWE3_DMS_Pipeline (staged, batched, streaming, batched with text
+extraction into the search index, batched with version detection, and a
+re-sync against a DMS that already holds every document) and the media
+library scrapers against the local stand-in servers in stand_in_servers.py
+and reports, per scenario:
+
+- listing pages/s, documents/s and payload MB/s
+- peak RSS of the process doing the work
+- p50/p95/p99 latency of each stage (list_page, download, upload,
+  upload_batch, stream, extract/index for the indexed scenario and
+  extract/match for the versioned one)
+
+Each scenario runs in its own child process, so peak RSS and warm caches
+do not leak between scenarios. The report records the commit, interpreter
+and full configuration; --compare prints the change against an earlier
+report made with the same settings.
+
+Usage:
+    python3 bench_pipeline.py --documents 500 --output bench.json
+    python3 bench_pipeline.py --output new.json --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from contextlib import redirect_stdout
+
+from stand_in_servers import add_arguments
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+INCLUDES_DIR = os.path.join(BENCH_DIR, '..', 'includes')
+
+SCENARIOS = ('staged', 'batched', 'stream', 'indexed', 'versioned', 'reconcile', 'scraper_final', 'scraper_complete')
+
+# Headline metrics compared across reports (higher is better unless listed)
+HEADLINE_METRICS = ('seconds', 'listing_pages_per_s', 'documents_per_s', 'mb_per_s', 'peak_rss_mb')
+LOWER_IS_BETTER = ('seconds', 'peak_rss_mb')
+
+
+class StageRecorder:
+    """Wall-clock spans of every call to the wrapped stage methods"""
+
+    def __init__(self):
+        self.spans = {}
+        self._lock = threading.Lock()
+
+    def wrap(self, obj, method, stage):
+        """Replace obj.method with a timed version recorded under `stage`"""
+        original = getattr(obj, method)
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                ended = time.perf_counter()
+                with self._lock:
+                    self.spans.setdefault(stage, []).append((started, ended))
+
+        setattr(obj, method, timed)
+
+    def summary(self):
+        """Per-stage count, percentiles and active window"""
+        stages = {}
+        for stage, spans in self.spans.items():
+            durations = sorted(end - start for start, end in spans)
+            stages[stage] = {
+                'count': len(durations),
+                'p50_ms': round(percentile(durations, 50) * 1000, 2),
+                'p95_ms': round(percentile(durations, 95) * 1000, 2),
+                'p99_ms': round(percentile(durations, 99) * 1000, 2),
+                'max_ms': round(durations[-1] * 1000, 2),
+                'window_s': round(max(end for _, end in spans) - min(start for start, _ in spans), 4),
+            }
+        return stages
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def run_child(args):
+    """Run one scenario in this process and write its measurements to args.result_file"""
+    sys.path.insert(0, INCLUDES_DIR)
+    recorder = StageRecorder()
+    result = {}
+
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        started = time.perf_counter()
+
+        if args.child in ('staged', 'batched', 'stream', 'indexed', 'versioned', 'reconcile'):
+            from swe3_fingerprint import SWE3FingerprintIndex, default_fingerprint_path
+            from swe3_manifest import default_state_dir
+            from swe3_metrics import EventLog
+            from swe3_pipeline_executor import SWE3_DMS_Pipeline
+            from swe3_search_index import SWE3SearchIndex, default_index_path
+
+            search_index = None
+            if args.child == 'indexed':
+                # Every run indexes from scratch
+                index_path = default_index_path(default_state_dir())
+                for path in (index_path, f'{index_path}-wal', f'{index_path}-shm'):
+                    if os.path.exists(path):
+                        os.remove(path)
+                search_index = SWE3SearchIndex(index_path)
+            fingerprints = None
+            if args.child == 'versioned':
+                # Versions are only found among this run's documents
+                index_path = default_fingerprint_path(default_state_dir())
+                for path in (index_path, f'{index_path}-wal', f'{index_path}-shm'):
+                    if os.path.exists(path):
+                        os.remove(path)
+                fingerprints = SWE3FingerprintIndex(index_path)
+
+            pipeline = SWE3_DMS_Pipeline(
+                args.dms_url,
+                list_workers=args.list_workers,
+                download_workers=args.download_workers,
+                upload_workers=args.upload_workers,
+                queue_size=args.queue_size,
+                stream=args.child == 'stream',
+                batch_size=args.batch_size if args.child in ('batched', 'indexed', 'versioned') else 1,
+                # The stand-in DMS keeps earlier scenarios' uploads; only reconcile may skip them
+                reconcile=args.child == 'reconcile',
+                events=EventLog(devnull),
+                search_index=search_index,
+                extract_workers=args.extract_workers,
+                fingerprints=fingerprints,
+                dms_token=args.dms_token
+            )
+            recorder.wrap(pipeline.media_client, 'fetch_page', 'list_page')
+            recorder.wrap(pipeline, 'download_document', 'download')
+            recorder.wrap(pipeline, 'upload_to_dms', 'upload')
+            recorder.wrap(pipeline, 'upload_batch', 'upload_batch')
+            recorder.wrap(pipeline, 'stream_document', 'stream')
+            result['success'] = pipeline.run()
+            result['documents'] = pipeline.stats['uploaded'] + pipeline.stats['skipped_unchanged']
+            result['pipeline_stats'] = dict(pipeline.stats)
+            shutil.rmtree(pipeline.temp_dir, ignore_errors=True)
+            if search_index or fingerprints:
+                # extract/index/match run in the process pool and its callbacks, outside the recorder
+                for stage in ('extract', 'index', 'match'):
+                    histogram = pipeline.metrics.to_dict()['stages'].get(stage)
+                    if histogram:
+                        result.setdefault('index_stages', {})[stage] = histogram
+            if search_index:
+                result['search_index'] = search_index.summary()
+                search_index.close()
+            if fingerprints:
+                result['fingerprints'] = fingerprints.summary()
+                fingerprints.close()
+
+        elif args.child == 'scraper_final':
+            from swe3_media_client import SWE3MediaClient
+            from swe3_scraper_final import scrape_swe3_documents
+
+            client = SWE3MediaClient(workers=args.list_workers)
+            recorder.wrap(client, 'fetch_page', 'list_page')
+            output = scrape_swe3_documents(client)
+            result['success'] = output['success']
+            result['documents'] = output['count']
+
+        elif args.child == 'scraper_complete':
+            from swe3_media_client import SWE3MediaClient
+            from swe3_scraper_complete import scrape_all_documents
+
+            client = SWE3MediaClient(workers=args.list_workers)
+            recorder.wrap(client, 'fetch_page', 'list_page')
+            documents, _, _ = scrape_all_documents(client)
+            result['success'] = bool(documents)
+            result['documents'] = len(documents)
+
+        result['seconds'] = time.perf_counter() - started
+
+    # ru_maxrss is KiB on Linux
+    result['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    result['stages'] = recorder.summary()
+    with open(args.result_file, 'w') as f:
+        json.dump(result, f)
+    return 0
+
+
+def fetch_stats(base_url):
+    with urllib.request.urlopen(f'{base_url}/__stats', timeout=10) as response:
+        return json.load(response)
+
+
+def stat_delta(before, after):
+    return {key: value - before.get(key, 0) for key, value in after.items()}
+
+
+def run_scenario(scenario, servers, args, state_dir):
+    """Run one scenario in a child process and derive throughput figures"""
+    result_file = os.path.join(state_dir, f'{scenario}.json')
+    command = [
+        sys.executable, os.path.abspath(__file__), '--child', scenario,
+        '--dms-url', servers['dms'], '--result-file', result_file,
+        '--list-workers', str(args.list_workers), '--download-workers', str(args.download_workers),
+        '--upload-workers', str(args.upload_workers), '--queue-size', str(args.queue_size),
+        '--batch-size', str(args.batch_size),
+    ] + (['--extract-workers', str(args.extract_workers)] if args.extract_workers else []) \
+      + (['--dms-token', args.dms_token] if args.dms_token else [])
+    env = dict(os.environ, SWE3_BASE_URL=servers['swe3'], SWE3_STATE_DIR=state_dir)
+
+    if scenario == 'reconcile':
+        # Untimed first sync, so the measured run finds everything already in the DMS
+        seed = command[:3] + ['staged'] + command[4:]
+        seed[seed.index('--result-file') + 1] = os.path.join(state_dir, 'seed.json')
+        if subprocess.run(seed, env=env, cwd=BENCH_DIR, stderr=subprocess.PIPE).returncode != 0:
+            raise RuntimeError('reconcile: seeding the DMS failed')
+
+    swe3_before, dms_before = fetch_stats(servers['swe3']), fetch_stats(servers['dms'])
+    completed = subprocess.run(command, env=env, cwd=BENCH_DIR, stderr=subprocess.PIPE, text=True)
+    swe3 = stat_delta(swe3_before, fetch_stats(servers['swe3']))
+    dms = stat_delta(dms_before, fetch_stats(servers['dms']))
+
+    if completed.returncode != 0 or not os.path.exists(result_file):
+        raise RuntimeError(f'{scenario} failed:\n{completed.stderr[-2000:]}')
+    with open(result_file) as f:
+        result = json.load(f)
+
+    seconds = result['seconds']
+    listing = result['stages'].get('list_page', {})
+    payload = swe3.get('bytes_sent', 0)
+    result.update({
+        'seconds': round(seconds, 4),
+        'listing_pages': listing.get('count', 0),
+        'listing_pages_per_s': round(listing['count'] / listing['window_s'], 2) if listing.get('window_s') else None,
+        'documents_per_s': round(result['documents'] / seconds, 2) if seconds else None,
+        'mb_per_s': round(payload / (1024 * 1024) / seconds, 2) if seconds else None,
+        'swe3_server': swe3,
+        'dms_server': dms,
+    })
+    return result
+
+
+def merge_runs(runs):
+    """Median headline metrics over repeated runs; stage figures from the median run"""
+    if len(runs) == 1:
+        return runs[0]
+    ordered = sorted(runs, key=lambda run: run['seconds'])
+    merged = dict(ordered[len(ordered) // 2])
+    for metric in HEADLINE_METRICS:
+        values = [run[metric] for run in runs if run.get(metric) is not None]
+        if values:
+            merged[metric] = round(statistics.median(values), 4)
+    merged['peak_rss_mb'] = max(run['peak_rss_mb'] for run in runs)
+    merged['runs'] = len(runs)
+    return merged
+
+
+def git_revision():
+    """(commit, has uncommitted changes under the plugin) or (None, None) outside git"""
+    plugin_dir = os.path.join(BENCH_DIR, '..')
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=plugin_dir,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--', '.'], cwd=plugin_dir,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit, bool(dirty)
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def compare(previous, report):
+    """Print headline changes against an earlier report to stderr"""
+    if previous.get('config') != report['config']:
+        print('[BENCH] Warning: configurations differ, results are not directly comparable', file=sys.stderr)
+    print(f"[BENCH] {str(previous.get('commit'))[:10]} -> {str(report.get('commit'))[:10]}", file=sys.stderr)
+
+    for scenario, result in report['scenarios'].items():
+        old = previous.get('scenarios', {}).get(scenario)
+        if not old:
+            continue
+        for metric in HEADLINE_METRICS:
+            before, after = old.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            better = change < 0 if metric in LOWER_IS_BETTER else change > 0
+            print(f"[BENCH] {scenario:17} {metric:20} {before:>10} -> {after:>10} "
+                  f"({change:+.1f}%{'' if abs(change) < 5 else ', better' if better else ', worse'})",
+                  file=sys.stderr)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the SWE3 pipeline against local stand-in servers')
+    add_arguments(parser)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--runs', type=int, default=1, help='Repeat each scenario and report medians')
+    parser.add_argument('--list-workers', type=int, default=8)
+    parser.add_argument('--download-workers', type=int, default=4)
+    parser.add_argument('--upload-workers', type=int, default=2)
+    parser.add_argument('--queue-size', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=8, help='Documents per upload in the batched scenario')
+    parser.add_argument('--extract-workers', type=int, default=None,
+                        help='Text extraction processes in the indexed and versioned scenarios (default: one per CPU)')
+    parser.add_argument('--output', help='Write the JSON report here as well')
+    parser.add_argument('--compare', help='Earlier report to compare against')
+    # Internal: run one scenario in this process
+    parser.add_argument('--child', choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument('--dms-url', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        return run_child(args)
+
+    config = {
+        key: value for key, value in vars(args).items()
+        if key not in ('output', 'compare', 'child', 'dms_url', 'dms_token', 'result_file', 'scenarios', 'runs')
+    }
+
+    stand_in_args = []
+    for key in ('documents', 'non_pdf_ratio', 'size_kb', 'size_sigma', 'latency_ms', 'jitter_ms',
+                'error_rate', 'swe3_max_concurrent', 'upload_latency_ms', 'bootstrap_ms', 'upload_error_rate',
+                'batch_max_items', 'version_ratio', 'duplicate_ratio', 'seed'):
+        stand_in_args += [f"--{key.replace('_', '-')}", str(getattr(args, key))]
+    if not args.batch:
+        stand_in_args.append('--no-batch')
+    if args.dms_token:
+        stand_in_args += ['--dms-token', args.dms_token]
+    servers_process = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, 'stand_in_servers.py')] + stand_in_args,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+    )
+    try:
+        servers = json.loads(servers_process.stdout.readline())
+        commit, dirty = git_revision()
+        report = {
+            'commit': commit,
+            'dirty': dirty,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'config': config,
+            'library_bytes': servers['total_bytes'],
+            'scenarios': {},
+        }
+
+        for scenario in args.scenarios:
+            runs = []
+            for _ in range(max(1, args.runs)):
+                with tempfile.TemporaryDirectory(prefix='swe3_bench_') as state_dir:
+                    runs.append(run_scenario(scenario, servers, args, state_dir))
+            result = merge_runs(runs)
+            report['scenarios'][scenario] = result
+            print(f"[BENCH] {scenario}: {result['seconds']}s, {result['documents_per_s']} docs/s, "
+                  f"{result['mb_per_s']} MB/s, peak RSS {result['peak_rss_mb']} MB", file=sys.stderr)
+    finally:
+        servers_process.stdin.close()
+        try:
+            servers_process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            servers_process.kill()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
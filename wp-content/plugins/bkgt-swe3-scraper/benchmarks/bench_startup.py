@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Startup Benchmark
+Measures the cold-start cost of each Python entry point PHP (or cron)
+launches: module import time (from `python -X importtime`) and
+time-to-first-request, i.e. from spawning the process until its first HTTP
+request reaches a local stand-in server. Nothing leaves the machine.
+
+Usage:
+    python3 bench_startup.py [--runs 5] [--budget-ms 1500] [--output startup.json]
+
+With --budget-ms the exit status is 1 when any entry point's median
+time-to-first-request exceeds the budget, so it can gate a deploy.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+INCLUDES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'includes')
+
+PAGE_HTML = b'<html><body><a href="/wp-content/uploads/regler.pdf">Regler</a></body></html>'
+
+
+class FirstRequestHandler(BaseHTTPRequestHandler):
+    """Records when the first request of a run arrives and answers cheaply"""
+
+    def do_GET(self):
+        self.server.mark()
+        if self.path.startswith('/wp-json/wp/v2/media'):
+            body = b'[]'
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('X-WP-Total', '0')
+            self.send_header('X-WP-TotalPages', '1')
+        elif self.path == '/robots.txt':
+            body = b''
+            self.send_response(404)
+        else:
+            body = PAGE_HTML
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FirstRequestHandler)
+        self.first_request = None
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def reset(self):
+        with self._lock:
+            self.first_request = None
+
+    def mark(self):
+        with self._lock:
+            if self.first_request is None:
+                self.first_request = time.time()
+
+
+def entry_points(server_url, state_dir):
+    """(name, module, argv) for every script with a cold start worth tracking"""
+    return [
+        ('document_scraper_http', 'swe3_document_scraper',
+         ['swe3_document_scraper.py', f'{server_url}/dokument/', '--engine', 'http']),
+        ('document_scraper_auto', 'swe3_document_scraper',
+         ['swe3_document_scraper.py', f'{server_url}/dokument/']),
+        ('scraper_final', 'swe3_scraper_final', ['swe3_scraper_final.py']),
+        ('scraper_complete', 'swe3_scraper_complete', ['swe3_scraper_complete.py']),
+        ('pipeline_executor', 'swe3_pipeline_executor',
+         ['swe3_pipeline_executor.py', '--dms-url', server_url,
+          '--manifest', os.path.join(state_dir, 'manifest.json'), '--blob-quota-mb', '0']),
+        ('crawler', 'swe3_crawler',
+         ['swe3_crawler.py', f'{server_url}/', '--depth', '0', '--time-budget', '5']),
+    ]
+
+
+def import_time_ms(module):
+    """Cumulative import time of `module` in a fresh interpreter"""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=INCLUDES_DIR, capture_output=True, text=True
+    )
+    for line in completed.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(f'Could not import {module}: {completed.stderr.strip()[-300:]}')
+
+
+def first_request_ms(server, argv, env, timeout=60):
+    """Milliseconds from spawning the script until its first request arrives"""
+    server.reset()
+    started = time.time()
+    process = subprocess.Popen([sys.executable] + argv, cwd=INCLUDES_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+    if server.first_request is None:
+        return None
+    return (server.first_request - started) * 1000
+
+
+def interpreter_start_ms():
+    """Bare interpreter start and exit, for reference"""
+    started = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'pass'])
+    return (time.perf_counter() - started) * 1000
+
+
+def summarize(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    return {
+        'median_ms': round(statistics.median(values), 1),
+        'min_ms': round(min(values), 1),
+        'max_ms': round(max(values), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark entry point cold starts')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--only', nargs='*', help='Entry point names to run')
+    parser.add_argument('--budget-ms', type=float, default=None,
+                        help='Fail when a median time-to-first-request exceeds this')
+    parser.add_argument('--output', help='Also write the JSON report here')
+    args = parser.parse_args()
+
+    server = StandInServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    baseline = [interpreter_start_ms() for _ in range(args.runs)]
+    report = {
+        'python': sys.version.split()[0],
+        'interpreter_startup': summarize(baseline),
+        'entry_points': {},
+    }
+
+    over_budget = []
+    with tempfile.TemporaryDirectory() as state_dir:
+        env = dict(os.environ, SWE3_BASE_URL=server.url, SWE3_STATE_DIR=state_dir)
+        for name, module, argv in entry_points(server.url, state_dir):
+            if args.only and name not in args.only:
+                continue
+            imports = [import_time_ms(module) for _ in range(args.runs)]
+            firsts = [first_request_ms(server, argv, env) for _ in range(args.runs)]
+            entry = {
+                'import': summarize(imports),
+                'first_request': summarize(firsts),
+            }
+            report['entry_points'][name] = entry
+            print(f"[BENCH] {name}: import {entry['import']}, first request {entry['first_request']}",
+                  file=sys.stderr)
+
+            if args.budget_ms is not None and (entry['first_request'] is None
+                                               or entry['first_request']['median_ms'] > args.budget_ms):
+                over_budget.append(name)
+
+    server.shutdown()
+    report['over_budget'] = over_budget
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    return 1 if over_budget else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,728 @@
+#!/usr/bin/env python3
+"""
+Stand-in SWE3 and DMS Servers
+Local replacements for the two hosts the pipeline talks to, so it can be
+benchmarked without touching production:
+
+- SWE3: a WordPress media library at /wp-json/wp/v2/media (pagination
+  headers, mime_type / modified_after filtering, _fields projection) and the
+  PDFs it lists, with a seeded log-normal size distribution, plus a
+  robots.txt and sitemap index (plain and gzipped child sitemaps) listing
+  them. Each PDF is a well-formed one-page file (Flate text content
+  stream, /Info dictionary, xref table) padded to its size with an image
+  stream of random bytes, so text extraction and metadata probes have
+  something real to read. --version-ratio of the PDFs republish an earlier one's
+  text with a one-word edit, as SWE3 does with its yearly rulebooks, and
+  --duplicate-ratio are byte-identical copies of an earlier one under a new
+  media id and URL. PDFs are served with Range support (206)
+- DMS: an admin-ajax.php?action=swe3_upload_document sink that reads the
+  multipart body (plain or chunked) and answers like the real endpoint,
+  plus the swe3_upload_documents_batch endpoint (per-item results), the
+  swe3_upload_capabilities probe and the swe3_document_manifest listing of
+  what it holds; --no-batch plays an older DMS without them. With
+  --dms-token the batch endpoint, the probe and the manifest answer 403
+  unless the request carries that X-BKGT-SWE3-Token, as the real DMS does
+  for logged-out callers, and version_of_url is ignored. Like the real DMS
+  it hashes what it receives and rejects an upload whose file_hash /
+  file_sha256 does not match
+
+Both send an ETag with every 200 they answer to a GET (other than PDFs)
+and answer a matching If-None-Match with 304. Both inject latency and
+errors on request. SWE3 can also play a host behind a rate limiter:
+--swe3-max-concurrent answers 429 with Retry-After beyond that many
+requests in flight. GET /__stats on either server returns its counters.
+
+Usage:
+    python3 stand_in_servers.py --documents 500 --size-kb 200 --latency-ms 20
+
+Prints one JSON line with both base URLs, then serves until stdin closes or
+SIGTERM.
+"""
+
+import argparse
+import email.parser
+import email.policy
+import gzip
+import hashlib
+import html
+import json
+import math
+import random
+import signal
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+PDF_MIME_TYPE = 'application/pdf'
+
+# Random bytes PDF bodies are cut from
+BLOCK_SIZE = 1024 * 1024
+
+# Smallest PDF served (text, objects and xref need some room)
+MIN_PDF_SIZE = 4096
+
+# Media items per child sitemap
+SITEMAP_ENTRIES = 100
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+# Words the stand-in rule texts are made of
+RULE_WORDS = (
+    'spelare', 'boll', 'domare', 'linjedomare', 'straff', 'yard', 'försök', 'touchdown', 'field', 'goal',
+    'avspark', 'snap', 'quarterback', 'passning', 'tackling', 'offside', 'holding', 'tid', 'period',
+    'lag', 'match', 'plan', 'målområde', 'regel', 'signal', 'flagga', 'utrustning', 'hjälm', 'säkerhet',
+    'junior', 'senior', 'serie', 'tävling', 'licens', 'förbund', 'mästerskap', 'ändring', 'tolkning',
+)
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Threaded server with latency/error injection and counters"""
+
+    daemon_threads = True
+
+    def __init__(self, handler, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        super().__init__(('127.0.0.1', 0), handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        # Requests in flight beyond this get a 429 (0 = unlimited)
+        self.max_concurrent = 0
+        self.retry_after = 1
+        self.in_flight = 0
+        self.stats = {'requests': 0, 'errors_injected': 0, 'bytes_sent': 0, 'bytes_received': 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + amount
+
+    def delay(self, extra=0.0):
+        """Sleep for the configured latency (plus jitter)"""
+        with self._lock:
+            jitter = self._rng.uniform(0, self.jitter) if self.jitter else 0.0
+        seconds = self.latency + extra + jitter
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def enter(self):
+        """Count a request in; False if it is over max_concurrent"""
+        with self._lock:
+            if self.max_concurrent and self.in_flight >= self.max_concurrent:
+                self.stats['throttled'] = self.stats.get('throttled', 0) + 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def should_fail(self):
+        """True for the fraction of requests that get an injected error"""
+        if not self.error_rate:
+            return False
+        with self._lock:
+            failed = self._rng.random() < self.error_rate
+        if failed:
+            self.count('errors_injected')
+        return failed
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, body=b'', content_type='application/json', headers=None):
+        if status == 200 and self.command == 'GET':
+            # Validators like a caching front end adds; a matching If-None-Match gets a bodiless 304
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            headers = dict(headers or {}, ETag=etag)
+            if etag in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+                status, body = 304, b''
+                self.server.count('not_modified')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count('bytes_sent', len(body))
+
+    def send_json(self, status, value, headers=None):
+        self.send(status, json.dumps(value).encode('utf-8'), headers=headers)
+
+    def read_body(self):
+        """Request body, plain or chunked"""
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            parts = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    # Trailers end with an empty line
+                    while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                parts.append(self.rfile.read(size))
+                self.rfile.readline()
+            body = b''.join(parts)
+        else:
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.server.count('bytes_received', len(body))
+        return body
+
+    def do_GET(self):
+        self.server.count('requests')
+        path = urlparse(self.path).path
+        if path == '/__stats':
+            return self.send_json(200, self.server.stats)
+        if not self.server.enter():
+            return self.send_json(429, {'code': 'rate_limited'}, headers={'Retry-After': str(self.server.retry_after)})
+        try:
+            self.handle_get()
+        finally:
+            self.server.leave()
+
+    def do_POST(self):
+        self.server.count('requests')
+        self.handle_post()
+
+    def handle_get(self):
+        self.send(404)
+
+    def handle_post(self):
+        self.read_body()
+        self.send(404)
+
+
+class MediaLibrary:
+    """Deterministic media library contents"""
+
+    def __init__(self, base_url, documents=500, non_pdf_ratio=0.1, size_kb=200, size_sigma=0.8, seed=0,
+                 version_ratio=0.0, duplicate_ratio=0.0):
+        """
+        Build the library
+
+        Args:
+            base_url: Base URL the PDFs are served from
+            documents: Number of PDFs
+            non_pdf_ratio: Extra non-PDF items (filtered out by mime_type)
+            size_kb: Median PDF size
+            size_sigma: Log-normal spread of PDF sizes (0 = all the same)
+            seed: Seed for sizes and content
+            version_ratio: Fraction of PDFs that republish an earlier PDF's
+                text with a one-word edit (near-duplicates under a new URL)
+            duplicate_ratio: Fraction of PDFs that are exact copies of an
+                earlier PDF under a new media id and URL
+        """
+        rng = random.Random(seed)
+        self.block = rng.randbytes(BLOCK_SIZE)
+        self.items = []
+        self.sizes = {}
+        duplicates = random.Random(seed + 2)
+
+        extra = int(documents * non_pdf_ratio)
+        for item_id in range(1, documents + extra + 1):
+            is_pdf = item_id <= documents
+            size = int(size_kb * 1024 * math.exp(rng.gauss(0, size_sigma))) if size_sigma else size_kb * 1024
+            size = max(MIN_PDF_SIZE, min(size, 50 * 1024 * 1024))
+            # The bytes of item source_id are served (itself, or the original it copies)
+            source_id = item_id
+            if is_pdf and item_id > 1 and duplicates.random() < duplicate_ratio:
+                source_id, size = self.sizes[f'dokument-{duplicates.randint(1, item_id - 1)}.pdf']
+            month = item_id % 12 + 1
+            name = f'dokument-{item_id}.pdf' if is_pdf else f'bild-{item_id}.png'
+            self.items.append({
+                'id': item_id,
+                'title': {'rendered': f'Dokument {item_id} &#8211; regler'},
+                'slug': f'dokument-{item_id}',
+                'source_url': f'{base_url}/wp-content/uploads/2025/{month:02d}/{name}',
+                'mime_type': PDF_MIME_TYPE if is_pdf else 'image/png',
+                'date': f'2025-{month:02d}-01T10:00:00',
+                'modified': f'2025-{month:02d}-{item_id % 28 + 1:02d}T10:00:00',
+                'media_details': {'filesize': size},
+                # Bulk a full media object carries and _fields projects away
+                'description': {'rendered': '<p>' + 'Beskrivning. ' * 40 + '</p>'},
+                'guid': {'rendered': f'{base_url}/?attachment_id={item_id}'},
+            })
+            self.sizes[name] = (source_id, size)
+        self.total_bytes = sum(size for name, (_, size) in self.sizes.items() if name.endswith('.pdf'))
+
+        # item id -> id of the original it republishes
+        versions = random.Random(seed + 1)
+        self.version_of = {}
+        for item_id in range(2, documents + 1):
+            if versions.random() < version_ratio:
+                earlier = versions.randint(1, item_id - 1)
+                self.version_of[item_id] = self.version_of.get(earlier, earlier)
+
+        self.sitemaps = self.build_sitemaps(base_url)
+
+    def build_sitemaps(self, base_url):
+        """
+        robots.txt and a Yoast-style sitemap tree: sitemap_index.xml pointing
+        at a page sitemap and media sitemaps of SITEMAP_ENTRIES items each,
+        every other one gzipped (.xml.gz)
+
+        Returns:
+            path -> (body, content type)
+        """
+        def urlset(entries):
+            rows = ''.join(f'<url><loc>{html.escape(loc)}</loc><lastmod>{lastmod}+00:00</lastmod></url>'
+                           for loc, lastmod in entries)
+            return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="{SITEMAP_NS}">{rows}</urlset>'
+
+        pages = [(f'{base_url}/{slug}/', '2025-01-01T10:00:00') for slug in ('regler', 'domare', 'tavling')]
+        files = {'/page-sitemap.xml': (urlset(pages).encode('utf-8'), 'application/xml')}
+        children = [('/page-sitemap.xml', pages[-1][1])]
+        for number, start in enumerate(range(0, len(self.items), SITEMAP_ENTRIES), 1):
+            entries = [(item['source_url'], item['modified']) for item in self.items[start:start + SITEMAP_ENTRIES]]
+            body = urlset(entries).encode('utf-8')
+            path = f'/attachment-sitemap{number}.xml'
+            if number % 2 == 0:
+                path, body = path + '.gz', gzip.compress(body, mtime=0)
+            files[path] = (body, 'application/xml')
+            children.append((path, max(lastmod for _, lastmod in entries)))
+
+        rows = ''.join(f'<sitemap><loc>{base_url}{path}</loc><lastmod>{lastmod}+00:00</lastmod></sitemap>'
+                       for path, lastmod in children)
+        index = f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="{SITEMAP_NS}">{rows}</sitemapindex>'
+        files['/sitemap_index.xml'] = (index.encode('utf-8'), 'application/xml')
+        files['/robots.txt'] = (f'User-agent: *\nDisallow: /wp-admin/\n\nSitemap: {base_url}/sitemap_index.xml\n'
+                                .encode('utf-8'), 'text/plain')
+        return files
+
+    def document_text(self, item_id):
+        """Lines of text on one stand-in PDF (seeded by item id, or by the original it republishes)"""
+        original = self.version_of.get(item_id, item_id)
+        rng = random.Random(original)
+        lines = [f'Dokument {original} – regler', f'Spelregler {2015 + original % 10}']
+        for number in range(1, 16):
+            words = ' '.join(rng.choice(RULE_WORDS) for _ in range(rng.randint(6, 12)))
+            lines.append(f'Regel {number}. {words.capitalize()}.')
+        if original != item_id:
+            # The new version changes one word of one rule
+            edit = random.Random(item_id)
+            line = edit.randrange(2, len(lines))
+            words = lines[line].split(' ')
+            words[edit.randrange(2, len(words))] = edit.choice(RULE_WORDS)
+            lines[line] = ' '.join(words)
+        return lines
+
+    def pdf_parts(self, item_id, size):
+        """
+        One stand-in PDF as (prefix, filler length, suffix); the filler is
+        the body of the padding image stream
+        """
+        item = self.items[item_id - 1]
+        escape = lambda text: text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)').encode('cp1252')
+        content = b'BT /F1 11 Tf 14 TL 50 800 Td\n' + b''.join(
+            b'(' + escape(line) + b") '\n" for line in self.document_text(item_id)
+        ) + b'ET'
+        content = zlib.compress(content)
+        pdf_date = lambda value: 'D:' + value.replace('-', '').replace('T', '').replace(':', '') + 'Z'
+
+        objects = [
+            b'<< /Type /Catalog /Pages 2 0 R >>',
+            b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R '
+            b'/Resources << /Font << /F1 5 0 R >> /XObject << /Im1 7 0 R >> >> >>',
+            b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(content) + content + b'\nendstream',
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+            b'<< /Title (' + escape(html.unescape(item['title']['rendered'])) + b') /Producer (stand-in) '
+            b'/CreationDate (' + pdf_date(item['date']).encode('ascii') + b') '
+            b'/ModDate (' + pdf_date(item['modified']).encode('ascii') + b') >>',
+        ]
+        prefix = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(len(prefix))
+            prefix += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+
+        # Object 7: the padding image; its /Length is fixed-width so its header size does not depend on it
+        offsets.append(len(prefix))
+        image = (b'7 0 obj\n<< /Type /XObject /Subtype /Image /Width 1 /Height 1 /ColorSpace /DeviceGray '
+                 b'/BitsPerComponent 8 /Length %010d >>\nstream\n')
+        end_stream = b'\nendstream\nendobj\n'
+
+        def suffix_for(filler):
+            xref_offset = len(prefix) + len(image % 0) + filler + len(end_stream)
+            xref = b'xref\n0 %d\n0000000000 65535 f\r\n' % (len(offsets) + 1)
+            xref += b''.join(b'%010d 00000 n\r\n' % offset for offset in offsets)
+            return end_stream + xref + (b'trailer\n<< /Size %d /Root 1 0 R /Info 6 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+                                        % (len(offsets) + 1, xref_offset))
+
+        # startxref's digit count depends on the filler length, so settle it in a few rounds
+        filler = 0
+        for _ in range(3):
+            filler = max(0, size - len(prefix) - len(image % 0) - len(suffix_for(filler)))
+        return prefix + image % filler, filler, suffix_for(filler)
+
+    def pdf_chunks(self, item_id, size, chunk_size=64 * 1024):
+        """Body of one PDF: objects and text, random filler (the padding image), xref and trailer"""
+        prefix, remaining, suffix = self.pdf_parts(item_id, size)
+        yield prefix
+        offset = (item_id * 7919) % BLOCK_SIZE
+        while remaining > 0:
+            take = min(chunk_size, remaining, BLOCK_SIZE - offset)
+            yield self.block[offset:offset + take]
+            remaining -= take
+            offset = (offset + take) % BLOCK_SIZE
+        yield suffix
+
+
+class SWE3Handler(StandInHandler):
+    """Media library API and PDF downloads"""
+
+    def handle_get(self):
+        self.server.delay()
+        if self.server.should_fail():
+            return self.send_json(503, {'code': 'stand_in_error', 'message': 'Injected error'})
+
+        parsed = urlparse(self.path)
+        if parsed.path.rstrip('/') == '/wp-json/wp/v2/media':
+            return self.media_page(parse_qs(parsed.query))
+        if parsed.path in self.server.library.sitemaps:
+            body, content_type = self.server.library.sitemaps[parsed.path]
+            self.server.count('sitemaps_served')
+            return self.send(200, body, content_type=content_type)
+
+        name = parsed.path.rsplit('/', 1)[-1]
+        entry = self.server.library.sizes.get(name)
+        if entry is None or not parsed.path.startswith('/wp-content/uploads/'):
+            return self.send(404, b'Not Found', content_type='text/html')
+
+        item_id, size = entry
+        byte_range = parse_range(self.headers.get('Range'), size)
+        if byte_range:
+            return self.send_pdf_range(item_id, size, *byte_range)
+        self.send_response(200)
+        self.send_header('Content-Type', PDF_MIME_TYPE)
+        self.send_header('Content-Length', str(size))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        for chunk in self.server.library.pdf_chunks(item_id, size):
+            self.wfile.write(chunk)
+        self.server.count('bytes_sent', size)
+        self.server.count('pdfs_served')
+
+    def send_pdf_range(self, item_id, size, start, end):
+        """206 with bytes start-end (inclusive) of one PDF"""
+        self.send_response(206)
+        self.send_header('Content-Type', PDF_MIME_TYPE)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        self.end_headers()
+        offset = 0
+        for chunk in self.server.library.pdf_chunks(item_id, size):
+            if offset + len(chunk) > start and offset <= end:
+                self.wfile.write(chunk[max(0, start - offset):end - offset + 1])
+            offset += len(chunk)
+        self.server.count('bytes_sent', end - start + 1)
+        self.server.count('ranges_served')
+
+    def media_page(self, query):
+        items = self.server.library.items
+        if 'mime_type' in query:
+            items = [item for item in items if item['mime_type'] == query['mime_type'][0]]
+        if 'modified_after' in query:
+            items = [item for item in items if item['modified'] > query['modified_after'][0]]
+
+        per_page = min(100, int(query.get('per_page', ['10'])[0]))
+        page = int(query.get('page', ['1'])[0])
+        total_pages = max(1, math.ceil(len(items) / per_page))
+        if page > total_pages:
+            return self.send_json(400, {'code': 'rest_post_invalid_page_number'})
+
+        chunk = items[(page - 1) * per_page:page * per_page]
+        if '_fields' in query:
+            fields = {field.split('.')[0] for field in query['_fields'][0].split(',')}
+            chunk = [{key: value for key, value in item.items() if key in fields} for item in chunk]
+
+        self.server.count('media_pages')
+        self.send_json(200, chunk, headers={
+            'X-WP-Total': str(len(items)),
+            'X-WP-TotalPages': str(total_pages),
+        })
+
+
+def parse_range(header, size):
+    """(start, end) of a single-range "bytes=a-b" / "bytes=a-" / "bytes=-n" header, or None"""
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[6:].strip().partition('-')
+    try:
+        if not first:
+            start, end = max(0, size - int(last)), size - 1
+        else:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    return (start, end) if start <= end else None
+
+
+def parse_multipart(content_type, body):
+    """(form fields, {field name: file bytes}) of a multipart/form-data body"""
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body
+    )
+    fields, files = {}, {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        payload = part.get_payload(decode=True) or b''
+        if part.get_filename() is not None:
+            files[name] = payload
+        else:
+            fields[name] = payload.decode('utf-8')
+    return fields, files
+
+
+class DMSHandler(StandInHandler):
+    """admin-ajax.php upload sink"""
+
+    def ajax_action(self):
+        parsed = urlparse(self.path)
+        if parsed.path != '/wp-admin/admin-ajax.php':
+            return None
+        return parse_qs(parsed.query).get('action', [''])[0]
+
+    def unknown_action(self):
+        # What WordPress answers for an unknown ajax action
+        self.send(400, b'0', content_type='text/html')
+
+    def authorized(self):
+        """Whether the request may use the token-protected endpoints"""
+        token = self.server.token
+        return not token or self.headers.get('X-BKGT-SWE3-Token') == token
+
+    def forbidden(self):
+        self.send_json(403, {'success': False, 'data': 'Not authorized'})
+
+    def handle_get(self):
+        action = self.ajax_action()
+        if not self.server.batch or action not in ('swe3_upload_capabilities', 'swe3_document_manifest'):
+            return self.unknown_action()
+        self.server.delay(self.server.bootstrap)
+        if not self.authorized():
+            return self.forbidden()
+        if action == 'swe3_document_manifest':
+            with self.server._lock:
+                documents = dict(self.server.documents)
+            return self.send_json(200, {'success': True, 'data': {
+                'count': len(documents), 'documents': documents
+            }})
+        self.send_json(200, {'success': True, 'data': {
+            'version': 1,
+            'batch': True,
+            'batch_action': 'swe3_upload_documents_batch',
+            'max_items': self.server.batch_max_items,
+            'max_bytes': self.server.batch_max_bytes,
+            'manifest': True,
+            'manifest_action': 'swe3_document_manifest',
+        }})
+
+    def handle_post(self):
+        action = self.ajax_action()
+        body = self.read_body()
+
+        if action == 'swe3_upload_documents_batch' and self.server.batch:
+            return self.handle_batch(body)
+        if action != 'swe3_upload_document':
+            return self.unknown_action()
+
+        # Every admin-ajax call pays a WordPress bootstrap
+        self.server.delay(self.server.bootstrap)
+        if self.server.should_fail():
+            return self.send_json(500, {'success': False, 'data': {'message': 'Injected error'}})
+
+        fields, files = parse_multipart(self.headers.get('Content-Type', ''), body)
+        if hash_mismatch(fields, files.get('file', b'')):
+            return self.send_json(400, {'success': False, 'data': 'Uploaded file does not match its hash'})
+        self.server.count('uploads')
+        self.server.count('upload_bytes', len(body))
+        post_id = self.store(fields, files.get('file', b''))
+        self.send_json(200, {'success': True, 'data': {'post_id': post_id, 'message': 'Document uploaded'}})
+
+    def handle_batch(self, body):
+        """One bootstrap for the request, then a result per item"""
+        self.server.delay(self.server.bootstrap)
+        if not self.authorized():
+            return self.forbidden()
+        if len(body) > self.server.batch_max_bytes:
+            return self.send_json(413, {'success': False, 'data': 'Request too large'})
+
+        fields, files = parse_multipart(self.headers.get('Content-Type', ''), body)
+        try:
+            items = json.loads(fields.get('items', ''))
+        except ValueError:
+            items = None
+        if not isinstance(items, list) or not items:
+            return self.send_json(400, {'success': False, 'data': 'No items provided'})
+        if len(items) > self.server.batch_max_items:
+            return self.send_json(413, {'success': False, 'data': 'Too many items'})
+
+        self.server.count('batches')
+        results = []
+        for position, item in enumerate(items):
+            index = item.get('index', position)
+            content = files.get(f'file_{index}')
+            if content is None:
+                results.append({'index': index, 'success': False, 'error': 'No file provided'})
+            elif hash_mismatch(item, content):
+                results.append({'index': index, 'success': False, 'error': 'Uploaded file does not match its hash'})
+            elif self.server.should_fail():
+                results.append({'index': index, 'success': False, 'error': 'Injected error'})
+            else:
+                # Per-document work (attachment, post, meta) still costs something
+                self.server.delay(self.server.per_item)
+                self.server.count('uploads')
+                self.server.count('upload_bytes', len(content))
+                results.append({'index': index, 'success': True, 'post_id': self.store(item, content)})
+
+        succeeded = sum(1 for result in results if result['success'])
+        self.send_json(200, {'success': True, 'data': {
+            'results': results, 'succeeded': succeeded, 'failed': len(results) - succeeded
+        }})
+
+    def store(self, fields, content):
+        """
+        Remember an upload for the manifest and return its post id (the
+        earlier version's post when the upload names one)
+        """
+        url = fields.get('url')
+        # Versioning replaces a document's file, so it needs the token too
+        version_of_url = fields.get('version_of_url') if self.authorized() else None
+        with self.server._lock:
+            parent = self.server.documents.get(version_of_url or '')
+            if parent:
+                post_id = parent['post_id']
+                self.server.stats['versions'] = self.server.stats.get('versions', 0) + 1
+            else:
+                self.server.next_post_id += 1
+                post_id = self.server.next_post_id
+            if url:
+                self.server.documents[url] = {
+                    'md5': hashlib.md5(content).hexdigest(),
+                    'sha256': hashlib.sha256(content).hexdigest(),
+                    'post_id': post_id,
+                }
+            return post_id
+
+
+def hash_mismatch(fields, content):
+    """Whether a hash the client sent disagrees with the bytes that arrived"""
+    for field, algorithm in (('file_hash', 'md5'), ('file_sha256', 'sha256')):
+        sent = (fields.get(field) or '').lower()
+        if sent and sent != hashlib.new(algorithm, content).hexdigest():
+            return True
+    return False
+
+
+def start_stand_ins(documents=500, non_pdf_ratio=0.1, size_kb=200, size_sigma=0.8,
+                    latency=0.0, jitter=0.0, error_rate=0.0, swe3_max_concurrent=0, upload_latency=0.0,
+                    bootstrap=0.0, upload_error_rate=0.0, batch=True, batch_max_items=20,
+                    batch_max_bytes=64 * 1024 * 1024, per_item=0.005, seed=0, version_ratio=0.0,
+                    duplicate_ratio=0.0, dms_token=None):
+    """
+    Start both servers on ephemeral ports in background threads
+
+    Returns:
+        (swe3_server, dms_server)
+    """
+    swe3 = StandInServer(SWE3Handler, latency, jitter, error_rate, seed)
+    swe3.library = MediaLibrary(swe3.url, documents, non_pdf_ratio, size_kb, size_sigma, seed, version_ratio,
+                                duplicate_ratio)
+    swe3.max_concurrent = swe3_max_concurrent
+
+    dms = StandInServer(DMSHandler, upload_latency, jitter, upload_error_rate, seed + 1)
+    dms.bootstrap = bootstrap
+    dms.batch = batch
+    dms.batch_max_items = batch_max_items
+    dms.batch_max_bytes = batch_max_bytes
+    dms.per_item = per_item
+    dms.token = dms_token
+    dms.next_post_id = 1000
+    # SWE3 URL -> {'md5', 'sha256', 'post_id'} of every stored upload
+    dms.documents = {}
+
+    for server in (swe3, dms):
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    return swe3, dms
+
+
+def add_arguments(parser):
+    """Stand-in options, shared with the benchmark runner"""
+    parser.add_argument('--documents', type=int, default=500, help='PDFs in the media library')
+    parser.add_argument('--non-pdf-ratio', type=float, default=0.1, help='Extra non-PDF items per PDF')
+    parser.add_argument('--size-kb', type=float, default=200, help='Median PDF size (KB)')
+    parser.add_argument('--size-sigma', type=float, default=0.8, help='Log-normal PDF size spread')
+    parser.add_argument('--latency-ms', type=float, default=20, help='SWE3 response latency')
+    parser.add_argument('--jitter-ms', type=float, default=10, help='Random extra latency, both servers')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of SWE3 GETs answered 503')
+    parser.add_argument('--swe3-max-concurrent', type=int, default=0,
+                        help='SWE3 requests in flight before it answers 429 + Retry-After (0 = unlimited)')
+    parser.add_argument('--upload-latency-ms', type=float, default=20, help='DMS network latency')
+    parser.add_argument('--bootstrap-ms', type=float, default=80, help='DMS WordPress bootstrap per admin-ajax call')
+    parser.add_argument('--upload-error-rate', type=float, default=0.0,
+                        help='Fraction of uploads (or batch items) that fail')
+    parser.add_argument('--no-batch', dest='batch', action='store_false',
+                        help='Play an older DMS without batch uploads or the capabilities probe')
+    parser.add_argument('--batch-max-items', type=int, default=20, help='Documents the DMS accepts per batch')
+    parser.add_argument('--version-ratio', type=float, default=0.2,
+                        help='Fraction of PDFs that republish an earlier one with a minor edit')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.0,
+                        help='Fraction of PDFs that are byte-identical copies of an earlier one under a new URL')
+    parser.add_argument('--dms-token', default=None,
+                        help='Shared secret the DMS requires on its protected endpoints (default: none)')
+    parser.add_argument('--seed', type=int, default=1)
+
+
+def start_from_args(args):
+    return start_stand_ins(
+        documents=args.documents, non_pdf_ratio=args.non_pdf_ratio, size_kb=args.size_kb,
+        size_sigma=args.size_sigma, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+        error_rate=args.error_rate, swe3_max_concurrent=args.swe3_max_concurrent, upload_latency=args.upload_latency_ms / 1000,
+        bootstrap=args.bootstrap_ms / 1000, upload_error_rate=args.upload_error_rate,
+        batch=args.batch, batch_max_items=args.batch_max_items, seed=args.seed, version_ratio=args.version_ratio,
+        duplicate_ratio=args.duplicate_ratio, dms_token=args.dms_token
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run local SWE3 and DMS stand-in servers')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    swe3, dms = start_from_args(args)
+    print(json.dumps({
+        'swe3': swe3.url,
+        'dms': dms.url,
+        'documents': args.documents,
+        'total_bytes': swe3.library.total_bytes,
+    }), flush=True)
+
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+    # The runner closes our stdin when it is done with us
+    threading.Thread(target=lambda: (sys.stdin.read(), stopped.set()), daemon=True).start()
+    try:
+        stopped.wait()
+    except KeyboardInterrupt:
+        pass
+    swe3.shutdown()
+    dms.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,6 +8,33 @@ if (!defined('ABSPATH')) {
     exit;
 }
 
+/**
+ * Most documents one batch request may carry
+ */
+if (!defined('BKGT_SWE3_BATCH_MAX_ITEMS')) {
+    define('BKGT_SWE3_BATCH_MAX_ITEMS', 20);
+}
+
+/**
+ * Whether the request may use the sync client endpoints
+ * 
+ * Allowed for a logged-in user who can upload files, or for a client
+ * sending the shared secret from the BKGT_SWE3_UPLOAD_TOKEN constant (or
+ * environment variable) in an X-BKGT-SWE3-Token header, as the pipeline
+ * does from cron. Without a configured token only logged-in users qualify.
+ * 
+ * @return bool
+ */
+function bkgt_swe3_upload_authorized() {
+    if (is_user_logged_in() && current_user_can('upload_files')) {
+        return true;
+    }
+    
+    $token = defined('BKGT_SWE3_UPLOAD_TOKEN') ? BKGT_SWE3_UPLOAD_TOKEN : getenv('BKGT_SWE3_UPLOAD_TOKEN');
+    $sent = isset($_SERVER['HTTP_X_BKGT_SWE3_TOKEN']) ? wp_unslash($_SERVER['HTTP_X_BKGT_SWE3_TOKEN']) : '';
+    return is_string($token) && $token !== '' && is_string($sent) && hash_equals($token, $sent);
+}
+
 /**
  * Handle file upload via admin-ajax
  */
@@ -22,25 +49,228 @@ function bkgt_swe3_ajax_upload_document() {
         wp_send_json_error('No file provided', 400);
     }
     
-    $file = $_FILES['file'];
-    $title = isset($_POST['title']) ? sanitize_text_field($_POST['title']) : 'Untitled';
-    $url = isset($_POST['url']) ? esc_url($_POST['url']) : '';
-    $date = isset($_POST['date']) ? sanitize_text_field($_POST['date']) : '';
-    $size = isset($_POST['size']) ? intval($_POST['size']) : 0;
+    $result = bkgt_swe3_store_uploaded_document($_FILES['file'], $_POST);
+    if (is_wp_error($result)) {
+        $error_data = $result->get_error_data();
+        wp_send_json_error($result->get_error_message(), isset($error_data['status']) ? $error_data['status'] : 400);
+    }
+    
+    wp_send_json_success($result);
+}
+
+/**
+ * Handle several documents in one request
+ * 
+ * Expects an `items` field holding a JSON array of per-document fields
+ * (title, url, date, size, file_hash, file_sha256, pdf_*, version_of*)
+ * and one file part per item named `file_<index>`. Every item gets its own
+ * result, so a client only has to resend the ones that failed.
+ */
+function bkgt_swe3_ajax_upload_documents_batch() {
+    if ($_SERVER['REQUEST_METHOD'] !== 'POST') {
+        wp_send_json_error('Invalid request method', 400);
+    }
+    if (!bkgt_swe3_upload_authorized()) {
+        wp_send_json_error('Not authorized', 403);
+    }
+    
+    $items = isset($_POST['items']) ? json_decode(wp_unslash($_POST['items']), true) : null;
+    if (!is_array($items) || empty($items)) {
+        wp_send_json_error('No items provided', 400);
+    }
+    if (count($items) > BKGT_SWE3_BATCH_MAX_ITEMS) {
+        wp_send_json_error('Too many items (max ' . BKGT_SWE3_BATCH_MAX_ITEMS . ')', 413);
+    }
+    
+    $results = array();
+    $succeeded = 0;
+    
+    foreach (array_values($items) as $position => $item) {
+        $index = isset($item['index']) ? intval($item['index']) : $position;
+        $field = 'file_' . $index;
+        
+        if (!is_array($item) || empty($_FILES[$field])) {
+            $results[] = array('index' => $index, 'success' => false, 'error' => 'No file provided');
+            continue;
+        }
+        
+        $result = bkgt_swe3_store_uploaded_document($_FILES[$field], $item);
+        if (is_wp_error($result)) {
+            $results[] = array('index' => $index, 'success' => false, 'error' => $result->get_error_message());
+            continue;
+        }
+        
+        $succeeded++;
+        $results[] = array_merge(array('index' => $index, 'success' => true), $result);
+    }
+    
+    wp_send_json_success(array(
+        'results' => $results,
+        'succeeded' => $succeeded,
+        'failed' => count($results) - $succeeded,
+    ));
+}
+
+/**
+ * Advertise what the upload endpoints accept
+ * 
+ * Clients only send batches when this answers with batch support, so an
+ * unauthorized client falls back to single uploads.
+ */
+function bkgt_swe3_ajax_upload_capabilities() {
+    if (!bkgt_swe3_upload_authorized()) {
+        wp_send_json_error('Not authorized', 403);
+    }
+    
+    $post_max = wp_convert_hr_to_bytes(ini_get('post_max_size'));
+    $max_files = intval(ini_get('max_file_uploads'));
+    
+    wp_send_json_success(array(
+        'version' => 1,
+        'batch' => true,
+        'batch_action' => 'swe3_upload_documents_batch',
+        'max_items' => $max_files > 0 ? min(BKGT_SWE3_BATCH_MAX_ITEMS, $max_files) : BKGT_SWE3_BATCH_MAX_ITEMS,
+        'max_bytes' => $post_max > 0 ? $post_max : null,
+        'max_file_bytes' => min(100 * 1024 * 1024, wp_max_upload_size()),
+        'manifest' => true,
+        'manifest_action' => 'swe3_document_manifest',
+    ));
+}
+
+/**
+ * Compact manifest of every SWE3 document the DMS holds
+ * 
+ * One request tells a sync client which files it does not need to upload:
+ * documents maps each SWE3 URL to its md5 / sha256 and DMS post id.
+ * Uploaded posts carry the hashes as meta; documents the PHP scraper
+ * imported are covered by the bkgt_swe3_documents table (md5 only).
+ */
+function bkgt_swe3_ajax_document_manifest() {
+    global $wpdb;
+    
+    if (!bkgt_swe3_upload_authorized()) {
+        wp_send_json_error('Not authorized', 403);
+    }
+    
+    $documents = array();
+    
+    $rows = $wpdb->get_results(
+        "SELECT p.ID AS post_id, url.meta_value AS url, md5.meta_value AS md5, sha.meta_value AS sha256
+         FROM {$wpdb->posts} p
+         INNER JOIN {$wpdb->postmeta} url ON url.post_id = p.ID AND url.meta_key = '_bkgt_swe3_url'
+         LEFT JOIN {$wpdb->postmeta} md5 ON md5.post_id = p.ID AND md5.meta_key = '_bkgt_swe3_file_hash'
+         LEFT JOIN {$wpdb->postmeta} sha ON sha.post_id = p.ID AND sha.meta_key = '_bkgt_swe3_file_sha256'
+         WHERE p.post_status NOT IN ('trash', 'auto-draft')
+         ORDER BY p.ID ASC"
+    );
+    foreach ((array) $rows as $row) {
+        // Stored through esc_url(), which encodes ampersands
+        $url = html_entity_decode($row->url, ENT_QUOTES, 'UTF-8');
+        if ($url === '' || (empty($row->md5) && empty($row->sha256))) {
+            continue;
+        }
+        // Newest post wins when a URL was uploaded more than once
+        $documents[$url] = array(
+            'md5' => $row->md5 ? $row->md5 : null,
+            'sha256' => $row->sha256 ? $row->sha256 : null,
+            'post_id' => intval($row->post_id),
+        );
+    }
+    
+    // URLs a document was published under before a newer version replaced it
+    $rows = $wpdb->get_results(
+        "SELECT pm.post_id, pm.meta_value
+         FROM {$wpdb->postmeta} pm
+         INNER JOIN {$wpdb->posts} p ON p.ID = pm.post_id
+         WHERE pm.meta_key = '_bkgt_swe3_versions' AND p.post_status NOT IN ('trash', 'auto-draft')"
+    );
+    foreach ((array) $rows as $row) {
+        foreach ((array) maybe_unserialize($row->meta_value) as $version) {
+            if (!is_array($version) || empty($version['url'])) {
+                continue;
+            }
+            $url = html_entity_decode($version['url'], ENT_QUOTES, 'UTF-8');
+            if (isset($documents[$url]) || (empty($version['file_hash']) && empty($version['file_sha256']))) {
+                continue;
+            }
+            $documents[$url] = array(
+                'md5' => !empty($version['file_hash']) ? $version['file_hash'] : null,
+                'sha256' => !empty($version['file_sha256']) ? $version['file_sha256'] : null,
+                'post_id' => intval($row->post_id),
+            );
+        }
+    }
+    
+    $table_name = $wpdb->prefix . 'bkgt_swe3_documents';
+    if ($wpdb->get_var($wpdb->prepare('SHOW TABLES LIKE %s', $table_name)) === $table_name) {
+        $rows = $wpdb->get_results(
+            "SELECT swe3_url, file_hash, dms_document_id FROM $table_name WHERE status = 'active' AND file_hash IS NOT NULL"
+        );
+        foreach ((array) $rows as $row) {
+            if (!isset($documents[$row->swe3_url]) && strlen($row->file_hash) === 32) {
+                $documents[$row->swe3_url] = array(
+                    'md5' => $row->file_hash,
+                    'sha256' => null,
+                    'post_id' => intval($row->dms_document_id),
+                );
+            }
+        }
+    }
+    
+    // Let sync clients revalidate instead of downloading an unchanged manifest
+    // (weak: generated_at differs between otherwise identical responses)
+    $etag = 'W/"' . md5(serialize($documents)) . '"';
+    header('ETag: ' . $etag);
+    header('Cache-Control: private, no-cache');
+    $if_none_match = isset($_SERVER['HTTP_IF_NONE_MATCH']) ? wp_unslash($_SERVER['HTTP_IF_NONE_MATCH']) : '';
+    if ($if_none_match !== '' && in_array($etag, array_map('trim', explode(',', $if_none_match)), true)) {
+        status_header(304);
+        exit;
+    }
+    
+    wp_send_json_success(array(
+        'count' => count($documents),
+        'generated_at' => gmdate('c'),
+        'documents' => (object) $documents,
+    ));
+}
+
+/**
+ * Store one uploaded PDF as an attachment and a DMS document post
+ * 
+ * The stored hashes are always computed here; file_hash / file_sha256 from
+ * the client are only checked against them to catch a damaged transfer.
+ * 
+ * @param array $file   Entry from $_FILES
+ * @param array $fields title, url, date, size and optional file_hash/file_sha256
+ * @return array|WP_Error post_id, attachment_id and file_hash on success
+ */
+function bkgt_swe3_store_uploaded_document($file, $fields) {
+    $title = isset($fields['title']) ? sanitize_text_field($fields['title']) : 'Untitled';
+    $url = isset($fields['url']) ? esc_url($fields['url']) : '';
+    $date = isset($fields['date']) ? sanitize_text_field($fields['date']) : '';
+    $size = isset($fields['size']) ? intval($fields['size']) : 0;
+    // What the client hashed on its side, checked against the file below
+    $client_hash = isset($fields['file_hash']) ? strtolower(sanitize_text_field($fields['file_hash'])) : '';
+    $client_sha256 = isset($fields['file_sha256']) ? strtolower(sanitize_text_field($fields['file_sha256'])) : '';
     
     if (empty($title) || empty($url)) {
-        wp_send_json_error('Title and URL are required', 400);
+        return new WP_Error('bkgt_swe3_missing_fields', 'Title and URL are required', array('status' => 400));
+    }
+    
+    if (!empty($file['error'])) {
+        return new WP_Error('bkgt_swe3_upload_error', 'Upload error (code ' . intval($file['error']) . ')', array('status' => 400));
     }
     
     // Validate file size
     if ($file['size'] > 100 * 1024 * 1024) {
-        wp_send_json_error('File is too large (max 100MB)', 400);
+        return new WP_Error('bkgt_swe3_too_large', 'File is too large (max 100MB)', array('status' => 400));
     }
     
     // Validate file is PDF by extension and mime type
     $filename = strtolower($file['name']);
     if (!preg_match('/\.pdf$/', $filename)) {
-        wp_send_json_error('Only PDF files are allowed', 400);
+        return new WP_Error('bkgt_swe3_not_pdf', 'Only PDF files are allowed', array('status' => 400));
     }
     
     // Also check mime type if provided (but be lenient as content-type might vary)
@@ -50,6 +280,17 @@ function bkgt_swe3_ajax_upload_document() {
         error_log("Warning: Unexpected MIME type for {$filename}: {$file['type']}");
     }
     
+    // Hash what actually arrived; the manifest and dedup rely on these
+    $file_hash = md5_file($file['tmp_name']);
+    $file_sha256 = hash_file('sha256', $file['tmp_name']);
+    if (!$file_hash || !$file_sha256) {
+        return new WP_Error('bkgt_swe3_upload_error', 'Uploaded file could not be read', array('status' => 400));
+    }
+    if (($client_hash !== '' && !hash_equals($file_hash, $client_hash)) ||
+        ($client_sha256 !== '' && !hash_equals($file_sha256, $client_sha256))) {
+        return new WP_Error('bkgt_swe3_hash_mismatch', 'Uploaded file does not match its hash', array('status' => 400));
+    }
+    
     try {
         // Get upload directory
         $upload_dir = wp_upload_dir();
@@ -74,7 +315,7 @@ function bkgt_swe3_ajax_upload_document() {
         
         // Move uploaded file
         if (!move_uploaded_file($file['tmp_name'], $file_path)) {
-            wp_send_json_error('Failed to move uploaded file', 500);
+            return new WP_Error('bkgt_swe3_move_failed', 'Failed to move uploaded file', array('status' => 500));
         }
         
         // Create WordPress attachment
@@ -90,7 +331,7 @@ function bkgt_swe3_ajax_upload_document() {
         
         if (is_wp_error($attachment_id)) {
             @unlink($file_path);
-            wp_send_json_error('Failed to create attachment', 400);
+            return new WP_Error('bkgt_swe3_attachment_failed', 'Failed to create attachment', array('status' => 400));
         }
         
         // Generate attachment metadata
@@ -98,6 +339,21 @@ function bkgt_swe3_ajax_upload_document() {
         $attach_data = wp_generate_attachment_metadata($attachment_id, $file_path);
         wp_update_attachment_metadata($attachment_id, $attach_data);
         
+        // A near-duplicate of a document already in the DMS (the client
+        // compares text fingerprints) becomes a new version of it
+        $parent_id = bkgt_swe3_version_parent($fields);
+        if ($parent_id) {
+            return bkgt_swe3_store_document_version($parent_id, $attachment_id, array(
+                'title' => $title,
+                'url' => $url,
+                'date' => $date,
+                'size' => $size,
+                'file_hash' => $file_hash,
+                'file_sha256' => $file_sha256,
+                'similarity' => isset($fields['similarity']) ? floatval($fields['similarity']) : null,
+            ), $fields);
+        }
+        
         // Create DMS document post
         $post_id = wp_insert_post(array(
             'post_type' => 'bkgt_document',
@@ -114,7 +370,7 @@ function bkgt_swe3_ajax_upload_document() {
         if (is_wp_error($post_id)) {
             wp_delete_attachment($attachment_id, true);
             @unlink($file_path);
-            wp_send_json_error('Failed to create document post', 400);
+            return new WP_Error('bkgt_swe3_post_failed', 'Failed to create document post', array('status' => 400));
         }
         
         // Set metadata
@@ -125,6 +381,13 @@ function bkgt_swe3_ajax_upload_document() {
         update_post_meta($post_id, '_bkgt_swe3_date', $date);
         update_post_meta($post_id, '_bkgt_file_size', $size);
         
+        foreach (bkgt_swe3_pdf_details($title, $fields) as $key => $value) {
+            update_post_meta($post_id, '_bkgt_swe3_' . $key, $value);
+        }
+        
+        update_post_meta($post_id, '_bkgt_swe3_file_hash', $file_hash);
+        update_post_meta($post_id, '_bkgt_swe3_file_sha256', $file_sha256);
+        
         // Set category
         $category = get_term_by('name', 'SWE3 Official Documents', 'bkgt_doc_category');
         if (!$category) {
@@ -135,17 +398,197 @@ function bkgt_swe3_ajax_upload_document() {
         }
         wp_set_object_terms($post_id, $category_id, 'bkgt_doc_category');
         
-        wp_send_json_success(array(
+        return array(
             'post_id' => $post_id,
             'attachment_id' => $attachment_id,
+            'file_hash' => $file_hash,
             'message' => 'Document uploaded successfully'
-        ));
+        );
         
     } catch (Exception $e) {
-        wp_send_json_error('Upload failed: ' . $e->getMessage(), 500);
+        return new WP_Error('bkgt_swe3_upload_failed', 'Upload failed: ' . $e->getMessage(), array('status' => 500));
+    }
+}
+
+/**
+ * Document an upload is a new version of
+ * 
+ * Clients that detect versions send version_of (the DMS post, when they
+ * know it) and version_of_url (the SWE3 URL of the earlier version, which
+ * may itself have been superseded since).
+ * 
+ * A version replaces the document's file, so this is only honoured for
+ * authorized callers (see bkgt_swe3_upload_authorized) and only for a
+ * document that came from SWE3.
+ * 
+ * @param array $fields Upload form fields
+ * @return int Post ID, or 0 when the upload is a new document
+ */
+function bkgt_swe3_version_parent($fields) {
+    if (empty($fields['version_of']) && empty($fields['version_of_url'])) {
+        return 0;
+    }
+    if (!bkgt_swe3_upload_authorized()) {
+        error_log('BKGT SWE3: ignoring version_of from an unauthorized upload');
+        return 0;
+    }
+    
+    $post_id = isset($fields['version_of']) ? intval($fields['version_of']) : 0;
+    
+    if (!$post_id && !empty($fields['version_of_url'])) {
+        $version_of_url = esc_url($fields['version_of_url']);
+        $posts = get_posts(array(
+            'post_type' => 'bkgt_document',
+            'post_status' => 'any',
+            'posts_per_page' => 1,
+            'orderby' => 'ID',
+            'order' => 'DESC',
+            'fields' => 'ids',
+            'meta_query' => array(
+                'relation' => 'OR',
+                array('key' => '_bkgt_swe3_url', 'value' => $version_of_url),
+                array('key' => '_bkgt_swe3_version_url', 'value' => $version_of_url),
+            ),
+        ));
+        $post_id = $posts ? intval($posts[0]) : 0;
+    }
+    
+    if (!$post_id || get_post_type($post_id) !== 'bkgt_document'
+        || get_post_meta($post_id, '_bkgt_is_swe3_document', true) !== '1'
+        || get_post_meta($post_id, '_bkgt_swe3_url', true) === '') {
+        return 0;
+    }
+    return $post_id;
+}
+
+/**
+ * Add an uploaded file to an existing document as a new version
+ * 
+ * The newest version (by SWE3 date) is the document's file; the others
+ * are kept in its _bkgt_swe3_versions history, and every URL the document
+ * was published under is kept in _bkgt_swe3_version_url.
+ * 
+ * @param int $post_id Document post
+ * @param int $attachment_id Attachment of the uploaded file
+ * @param array $version title, url, date, size, file_hash, file_sha256, similarity
+ * @param array $fields Upload form fields
+ * @return array Upload result
+ */
+function bkgt_swe3_store_document_version($post_id, $attachment_id, $version, $fields) {
+    $versions = get_post_meta($post_id, '_bkgt_swe3_versions', true);
+    if (!is_array($versions)) {
+        $versions = array();
+    }
+    
+    $current = array(
+        'title' => preg_replace('/^SWE3 - /', '', get_the_title($post_id)),
+        'url' => get_post_meta($post_id, '_bkgt_swe3_url', true),
+        'date' => get_post_meta($post_id, '_bkgt_swe3_date', true),
+        'size' => intval(get_post_meta($post_id, '_bkgt_file_size', true)),
+        'file_hash' => get_post_meta($post_id, '_bkgt_swe3_file_hash', true),
+        'file_sha256' => get_post_meta($post_id, '_bkgt_swe3_file_sha256', true),
+        'attachment_id' => intval(get_post_meta($post_id, '_bkgt_file_id', true)),
+    );
+    $version['attachment_id'] = $attachment_id;
+    $version['added_at'] = current_time('mysql');
+    
+    $known_urls = get_post_meta($post_id, '_bkgt_swe3_version_url');
+    foreach (array($current['url'], $version['url']) as $version_url) {
+        if ($version_url && !in_array($version_url, $known_urls, true)) {
+            add_post_meta($post_id, '_bkgt_swe3_version_url', $version_url);
+            $known_urls[] = $version_url;
+        }
+    }
+    
+    // SWE3 dates are ISO 8601 and compare as strings; an older upload only joins the history
+    $is_current = $current['date'] === '' || strcmp($version['date'], $current['date']) >= 0;
+    if ($is_current) {
+        $versions[] = $current;
+        
+        wp_update_post(array(
+            'ID' => $post_id,
+            'post_title' => 'SWE3 - ' . wp_strip_all_tags($version['title']),
+            'post_excerpt' => 'SWE3 Official Document: ' . $version['title'],
+        ));
+        update_post_meta($post_id, '_bkgt_file_url', wp_get_attachment_url($attachment_id));
+        update_post_meta($post_id, '_bkgt_file_id', $attachment_id);
+        update_post_meta($post_id, '_bkgt_swe3_url', $version['url']);
+        update_post_meta($post_id, '_bkgt_swe3_date', $version['date']);
+        update_post_meta($post_id, '_bkgt_file_size', $version['size']);
+        update_post_meta($post_id, '_bkgt_swe3_file_hash', $version['file_hash']);
+        if ($version['file_sha256']) {
+            update_post_meta($post_id, '_bkgt_swe3_file_sha256', $version['file_sha256']);
+        } else {
+            delete_post_meta($post_id, '_bkgt_swe3_file_sha256');
+        }
+        foreach (bkgt_swe3_pdf_details($version['title'], $fields) as $key => $value) {
+            update_post_meta($post_id, '_bkgt_swe3_' . $key, $value);
+        }
+    } else {
+        $versions[] = $version;
     }
+    update_post_meta($post_id, '_bkgt_swe3_versions', $versions);
+    
+    return array(
+        'post_id' => $post_id,
+        'attachment_id' => $attachment_id,
+        'file_hash' => $version['file_hash'],
+        'version_of' => $post_id,
+        'versions' => count($versions) + 1,
+        'current' => $is_current,
+        'message' => 'Document stored as a new version of post ' . $post_id
+    );
+}
+
+/**
+ * Version, publication date and page count of an uploaded document
+ * 
+ * The pipeline reads the PDF's Info dictionary and page tree before
+ * uploading and sends what it found as pdf_title, pdf_created,
+ * pdf_modified and pdf_pages. The version (a year) comes from the title
+ * embedded in the PDF, else from the SWE3 title. Fields an older client
+ * does not send are left out.
+ * 
+ * @param string $title SWE3 title
+ * @param array $fields Upload form fields
+ * @return array Meta key suffix => value
+ */
+function bkgt_swe3_pdf_details($title, $fields) {
+    $details = array();
+    
+    $pdf_title = isset($fields['pdf_title']) ? sanitize_text_field($fields['pdf_title']) : '';
+    if ($pdf_title !== '') {
+        $details['pdf_title'] = $pdf_title;
+    }
+    
+    foreach (array($pdf_title, $title) as $candidate) {
+        if (preg_match('/\b(20\d{2})\b/', $candidate, $matches)) {
+            $details['version'] = $matches[1];
+            break;
+        }
+    }
+    
+    foreach (array('pdf_created', 'pdf_modified') as $field) {
+        $timestamp = isset($fields[$field]) ? strtotime(sanitize_text_field($fields[$field])) : false;
+        if ($timestamp) {
+            $details['publication_date'] = gmdate('Y-m-d', $timestamp);
+            break;
+        }
+    }
+    
+    if (isset($fields['pdf_pages']) && intval($fields['pdf_pages']) > 0) {
+        $details['page_count'] = intval($fields['pdf_pages']);
+    }
+    
+    return $details;
 }
 
-// Register the AJAX action
+// Register the AJAX actions (logged-out clients authenticate with the upload token)
 add_action('wp_ajax_nopriv_swe3_upload_document', 'bkgt_swe3_ajax_upload_document');
 add_action('wp_ajax_swe3_upload_document', 'bkgt_swe3_ajax_upload_document');
+add_action('wp_ajax_nopriv_swe3_upload_documents_batch', 'bkgt_swe3_ajax_upload_documents_batch');
+add_action('wp_ajax_swe3_upload_documents_batch', 'bkgt_swe3_ajax_upload_documents_batch');
+add_action('wp_ajax_nopriv_swe3_upload_capabilities', 'bkgt_swe3_ajax_upload_capabilities');
+add_action('wp_ajax_swe3_upload_capabilities', 'bkgt_swe3_ajax_upload_capabilities');
+add_action('wp_ajax_nopriv_swe3_document_manifest', 'bkgt_swe3_ajax_document_manifest');
+add_action('wp_ajax_swe3_document_manifest', 'bkgt_swe3_ajax_document_manifest');
@@ -4,16 +4,17 @@ SWE3 Page Analysis - Find how PDFs are loaded
 Examine page source for API calls, data attributes, or JavaScript patterns
 """
 
-import requests
 import re
 import json
 
+from swe3_http import get_session
+
 def analyze_page():
     """Analyze SWE3 page to find PDF loading mechanism"""
     url = 'https://amerikanskfotboll.swe3.se/information-verktyg/spelregler-tavlingsbestammelser/'
     
     print(f'Fetching {url}...')
-    response = requests.get(url, timeout=10)
+    response = get_session().get(url, timeout=10)
     html = response.text
     
     # Look for API endpoints
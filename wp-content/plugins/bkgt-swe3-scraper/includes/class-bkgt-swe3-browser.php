@@ -23,12 +23,32 @@ class BKGT_SWE3_Browser {
      */
     private $timeout = 30;
     
+    /**
+     * Unix socket of the long-running scraper worker
+     * (python3 swe3_document_scraper.py --daemon)
+     */
+    private $worker_socket;
+    
+    /**
+     * Seconds to wait for the worker to accept a connection
+     */
+    private $worker_connect_timeout = 1;
+    
     /**
      * Initialize scraper
      */
     public function __construct() {
         $this->scraper_script = dirname( __FILE__ ) . '/swe3_scraper_final.py';
         
+        if ( defined( 'BKGT_SWE3_WORKER_SOCKET' ) ) {
+            $this->worker_socket = BKGT_SWE3_WORKER_SOCKET;
+        } elseif ( getenv( 'BKGT_SWE3_WORKER_SOCKET' ) ) {
+            $this->worker_socket = getenv( 'BKGT_SWE3_WORKER_SOCKET' );
+        } else {
+            // The worker's default: the plugin's own run/ directory
+            $this->worker_socket = dirname( dirname( __FILE__ ) ) . '/run/worker.sock';
+        }
+        
         // Verify Python is available
         if ( ! $this->verify_python() ) {
             // Python not available, will use pure PHP/HTTP fallback
@@ -82,33 +102,204 @@ class BKGT_SWE3_Browser {
     }
     
     /**
-     * Scrape using Python script
+     * Scrape using Python
+     * 
+     * Asks the long-running worker first; starts a one-shot script only
+     * when no worker is listening
      * 
      * @return array
      */
     private function scrape_via_python() {
+        $response = $this->worker_request( 'media_documents' );
+        if ( is_array( $response ) && ! empty( $response['ok'] ) && is_array( $response['result'] ) ) {
+            $result = $response['result'];
+            $result['method'] = 'python-worker';
+            return $result;
+        }
+        
+        return $this->scrape_via_python_exec();
+    }
+    
+    /**
+     * Scrape a page through the worker (tiered HTTP / embedded JSON / browser)
+     * 
+     * @param string $url Page URL
+     * @return array Array with 'success', 'documents', and optional 'error' keys
+     */
+    public function scrape_page( $url ) {
+        $response = $this->worker_request( 'scrape', array( 'url' => $url ) );
+        if ( is_array( $response ) && ! empty( $response['ok'] ) && is_array( $response['result'] ) ) {
+            return $response['result'];
+        }
+        
+        return array(
+            'success' => false,
+            'documents' => array(),
+            'error' => is_array( $response ) && isset( $response['error'] ) ? $response['error'] : 'Scraper worker not available',
+        );
+    }
+    
+    /**
+     * Worker health (null when no worker is listening)
+     * 
+     * @return array|null
+     */
+    public function get_worker_health() {
+        $response = $this->worker_request( 'health' );
+        return is_array( $response ) && ! empty( $response['ok'] ) ? $response['result'] : null;
+    }
+    
+    /**
+     * Worker request/browser counters (null when no worker is listening)
+     * 
+     * @return array|null
+     */
+    public function get_worker_stats() {
+        $response = $this->worker_request( 'stats' );
+        return is_array( $response ) && ! empty( $response['ok'] ) ? $response['result'] : null;
+    }
+    
+    /**
+     * Whether the worker socket may be trusted: a socket owned by the owner
+     * of its directory, which neither group nor others can write to (in a
+     * directory like /tmp anyone could have bound it first)
+     * 
+     * @return bool
+     */
+    private function worker_socket_trusted() {
+        clearstatcache();
+        if ( @filetype( $this->worker_socket ) !== 'socket' ) {
+            return false;
+        }
+        $socket_stat = @stat( $this->worker_socket );
+        $dir_stat = @stat( dirname( $this->worker_socket ) );
+        if ( ! $socket_stat || ! $dir_stat ) {
+            return false;
+        }
+        return ( $dir_stat['mode'] & 0022 ) === 0 && $socket_stat['uid'] === $dir_stat['uid'];
+    }
+    
+    /**
+     * Send one request to the worker socket
+     * 
+     * Protocol: one JSON object per line each way, e.g.
+     * {"id":1,"command":"scrape","url":"..."} -> {"id":1,"ok":true,"result":{...}}
+     * 
+     * @param string $command Worker command
+     * @param array  $params  Extra request fields
+     * @return array|null Decoded response, or null if the worker is unreachable
+     */
+    private function worker_request( $command, $params = array() ) {
+        if ( ! function_exists( 'stream_socket_client' ) || ! $this->worker_socket_trusted() ) {
+            return null;
+        }
+        
+        $errno = 0;
+        $errstr = '';
+        $socket = @stream_socket_client(
+            'unix://' . $this->worker_socket,
+            $errno,
+            $errstr,
+            $this->worker_connect_timeout
+        );
+        if ( ! $socket ) {
+            return null;
+        }
+        
+        stream_set_timeout( $socket, $this->timeout * 4 );
+        $request = array_merge( $params, array(
+            'id' => uniqid( '', true ),
+            'command' => $command,
+        ) );
+        fwrite( $socket, json_encode( $request ) . "\n" );
+        
+        $line = fgets( $socket );
+        $meta = stream_get_meta_data( $socket );
+        fclose( $socket );
+        
+        if ( $line === false || ! empty( $meta['timed_out'] ) ) {
+            return null;
+        }
+        
+        $response = json_decode( $line, true );
+        return is_array( $response ) ? $response : null;
+    }
+    
+    /**
+     * Scrape by starting the Python script (one process per call)
+     * 
+     * The script runs with --output=ndjson: one document per line as it is
+     * parsed, then a summary record. Lines are decoded as they arrive, so the
+     * whole output is never held as one string. Progress text goes to the
+     * script's stderr and is discarded.
+     * 
+     * @return array
+     */
+    private function scrape_via_python_exec() {
         $cmd = sprintf(
-            '%s %s 2>&1',
+            '%s %s --output=ndjson 2>/dev/null',
             escapeshellcmd( $this->python_executable ),
             escapeshellarg( $this->scraper_script )
         );
         
-        $output = array();
-        $return_code = 0;
-        exec( $cmd, $output, $return_code );
+        $documents = array();
+        $summary = null;
         
-        $json_output = implode( "\n", $output );
-        $result = json_decode( $json_output, true );
+        $handle = function_exists( 'popen' ) ? @popen( $cmd, 'r' ) : false;
+        if ( $handle ) {
+            while ( ( $line = fgets( $handle ) ) !== false ) {
+                $this->read_ndjson_record( $line, $documents, $summary );
+            }
+            pclose( $handle );
+        } else {
+            $output = array();
+            $return_code = 0;
+            exec( $cmd, $output, $return_code );
+            foreach ( $output as $line ) {
+                $this->read_ndjson_record( $line, $documents, $summary );
+            }
+        }
         
-        if ( ! is_array( $result ) ) {
+        if ( ! is_array( $summary ) ) {
+            // No summary record: the script died part way (or printed nothing usable)
             return array(
                 'success' => false,
-                'documents' => array(),
-                'error' => 'Invalid Python output',
+                'documents' => $documents,
+                'error' => empty( $documents ) ? 'Invalid Python output' : 'Python scraper stopped before finishing',
             );
         }
         
-        return $result;
+        // Documents stream in media library order; keep the newest-modified-first order callers expect
+        usort( $documents, function( $a, $b ) {
+            $a_date = isset( $a['modified'] ) ? $a['modified'] : ( isset( $a['date'] ) ? $a['date'] : '' );
+            $b_date = isset( $b['modified'] ) ? $b['modified'] : ( isset( $b['date'] ) ? $b['date'] : '' );
+            return strcmp( $b_date, $a_date );
+        });
+        
+        unset( $summary['type'] );
+        $summary['documents'] = $documents;
+        $summary['count'] = count( $documents );
+        return $summary;
+    }
+    
+    /**
+     * Decode one NDJSON line from the Python scraper
+     * 
+     * @param string     $line      Raw output line
+     * @param array      $documents Collected documents (appended to)
+     * @param array|null $summary   Set when the summary record arrives
+     */
+    private function read_ndjson_record( $line, &$documents, &$summary ) {
+        $record = json_decode( trim( $line ), true );
+        if ( ! is_array( $record ) || ! isset( $record['type'] ) ) {
+            return;
+        }
+        
+        if ( $record['type'] === 'document' && isset( $record['document'] ) && is_array( $record['document'] ) ) {
+            $documents[] = $record['document'];
+        } elseif ( $record['type'] === 'summary' ) {
+            $summary = $record;
+        }
     }
     
     /**
@@ -203,9 +394,12 @@ class BKGT_SWE3_Browser {
     /**
      * Get scraper method info
      * 
-     * @return string 'python' or 'http'
+     * @return string 'python-worker', 'python' or 'http'
      */
     public function get_method() {
+        if ( $this->get_worker_health() !== null ) {
+            return 'python-worker';
+        }
         if ( $this->verify_python() && file_exists( $this->scraper_script ) ) {
             return 'python';
         }
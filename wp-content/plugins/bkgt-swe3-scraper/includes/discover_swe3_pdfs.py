@@ -4,19 +4,20 @@ SWE3 Document Discovery - Direct approach
 Finds all PDF URLs in the SWE3 page HTML
 """
 
-import requests
 import re
 import json
 from urllib.parse import urlparse
 from collections import defaultdict
 
+from swe3_http import get_session
+
 def discover_pdfs():
     """Find all PDF URLs in SWE3 page"""
     url = 'https://amerikanskfotboll.swe3.se/information-verktyg/spelregler-tavlingsbestammelser/'
     
     try:
         print(f'Fetching {url}...')
-        response = requests.get(url, timeout=10)
+        response = get_session().get(url, timeout=10)
         response.raise_for_status()
         html = response.text
         
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+SWE3 Blob Store
+Content-addressed local store for downloaded PDFs, keyed by SHA-256.
+Identical files are kept once and shared by every key (source URL +
+modified timestamp) that resolved to them; a disk quota is enforced by
+evicting the least recently used blobs. Blobs a run is still working on
+(queued for upload or text extraction) are pinned and never evicted.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+INDEX_VERSION = 1
+
+
+class SWE3BlobStore:
+    """Size-capped, refcounted PDF store"""
+
+    def __init__(self, root, max_bytes=1024 * 1024 * 1024):
+        """
+        Initialize store
+
+        Args:
+            root: Store directory (created if missing)
+            max_bytes: Disk quota for blobs; 0 disables eviction
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(root, 'objects')
+        self.tmp_dir = os.path.join(root, 'tmp')
+        self.index_path = os.path.join(root, 'index.json')
+        # digest -> {'size', 'last_used', 'refs': [keys]}
+        self.blobs = {}
+        # key -> digest
+        self.keys = {}
+        # digest -> pin count (in memory only: pins last as long as the run)
+        self.pins = {}
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0, 'deduplicated': 0, 'evicted': 0}
+        self._lock = threading.Lock()
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        """Load the index, dropping entries whose blob file is gone"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if data.get('version') != INDEX_VERSION:
+            return
+
+        self.blobs = {
+            digest: blob for digest, blob in data.get('blobs', {}).items()
+            if os.path.exists(self.path(digest))
+        }
+        self.keys = {
+            key: digest for key, digest in data.get('keys', {}).items()
+            if digest in self.blobs
+        }
+
+    def save(self):
+        """Persist the index atomically"""
+        with self._lock:
+            data = {'version': INDEX_VERSION, 'blobs': self.blobs, 'keys': self.keys}
+            fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir, suffix='.json')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+        os.replace(tmp_path, self.index_path)
+
+    def path(self, digest):
+        """Filesystem path of a blob"""
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def has(self, digest):
+        """True if the blob is present"""
+        with self._lock:
+            return digest in self.blobs
+
+    def lookup(self, key, pin=False):
+        """
+        Find the blob previously stored under key
+
+        Args:
+            key: Name the blob was stored under
+            pin: Pin the blob found (see pin())
+
+        Returns:
+            (path, digest) or (None, None)
+        """
+        with self._lock:
+            digest = self.keys.get(key)
+            if not digest:
+                self.stats['misses'] += 1
+                return None, None
+            self.blobs[digest]['last_used'] = time.time()
+            self.stats['hits'] += 1
+            if pin:
+                self._pin(digest)
+        return self.path(digest), digest
+
+    def digests_of_size(self, size):
+        """Digests of the stored blobs that are exactly size bytes long"""
+        with self._lock:
+            return [digest for digest, blob in self.blobs.items() if blob['size'] == size]
+
+    def link(self, key, digest, pin=False):
+        """
+        Reference an already stored blob under another key (the same bytes
+        found under a new name without downloading them again)
+
+        Returns:
+            Path of the blob, or None if it is no longer stored
+        """
+        with self._lock:
+            if digest not in self.blobs:
+                return None
+            self.blobs[digest]['last_used'] = time.time()
+            self._add_ref(key, digest)
+            self.stats['deduplicated'] += 1
+            if pin:
+                self._pin(digest)
+        return self.path(digest)
+
+    def pin(self, digest):
+        """Keep a blob from being evicted or deleted until it is unpinned"""
+        with self._lock:
+            if digest in self.blobs:
+                self._pin(digest)
+
+    def _pin(self, digest):
+        """(caller holds the lock)"""
+        self.pins[digest] = self.pins.get(digest, 0) + 1
+
+    def unpin(self, digest):
+        """Undo one pin(); a blob released while pinned is deleted now"""
+        with self._lock:
+            count = self.pins.get(digest, 0) - 1
+            if count > 0:
+                self.pins[digest] = count
+                return
+            self.pins.pop(digest, None)
+            blob = self.blobs.get(digest)
+            if blob is not None and not blob['refs']:
+                self._delete(digest)
+
+    def new_temp_file(self):
+        """Open a temp file on the store's filesystem (so put() can rename it)"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir, suffix='.part')
+        return os.fdopen(fd, 'wb'), tmp_path
+
+    def put(self, tmp_path, digest=None, key=None, pin=False):
+        """
+        Move a finished file into the store
+
+        The blob just stored is never evicted by this call, even when it
+        alone exceeds the quota; it goes once something newer is stored.
+
+        Args:
+            tmp_path: File to adopt (removed if the content is already stored)
+            digest: SHA-256 hex digest if the caller already computed it
+            key: Name to reference the blob by (e.g. source URL + modified)
+            pin: Pin the stored blob (see pin())
+
+        Returns:
+            (path, digest) of the stored blob
+        """
+        if digest is None:
+            digest = hash_file(tmp_path)
+        blob_path = self.path(digest)
+        size = os.path.getsize(tmp_path)
+
+        with self._lock:
+            if digest in self.blobs:
+                os.remove(tmp_path)
+                self.stats['deduplicated'] += 1
+            else:
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                os.replace(tmp_path, blob_path)
+                self.blobs[digest] = {'size': size, 'last_used': time.time(), 'refs': []}
+                self.stats['stored'] += 1
+
+            self.blobs[digest]['last_used'] = time.time()
+            if key is not None:
+                self._add_ref(key, digest)
+            if pin:
+                self._pin(digest)
+
+        self.evict(keep=digest)
+        return blob_path, digest
+
+    def _add_ref(self, key, digest):
+        """Point key at digest (caller holds the lock)"""
+        previous = self.keys.get(key)
+        if previous == digest:
+            return
+        if previous:
+            self._drop_ref(key, previous)
+        self.keys[key] = digest
+        self.blobs[digest]['refs'].append(key)
+
+    def _drop_ref(self, key, digest):
+        """Remove key from digest's refs, deleting the blob once unreferenced (and unpinned)"""
+        blob = self.blobs.get(digest)
+        if not blob:
+            return
+        if key in blob['refs']:
+            blob['refs'].remove(key)
+        if not blob['refs'] and digest not in self.pins:
+            self._delete(digest)
+
+    def release(self, key):
+        """Forget a key (e.g. a document removed upstream)"""
+        with self._lock:
+            digest = self.keys.pop(key, None)
+            if digest:
+                self._drop_ref(key, digest)
+
+    def _delete(self, digest):
+        """Remove a blob and every key pointing at it (caller holds the lock)"""
+        blob = self.blobs.pop(digest, None)
+        if not blob:
+            return
+        for key in blob['refs']:
+            self.keys.pop(key, None)
+        try:
+            os.remove(self.path(digest))
+        except OSError:
+            pass
+
+    def total_bytes(self):
+        """Bytes currently held by blobs"""
+        with self._lock:
+            return sum(blob['size'] for blob in self.blobs.values())
+
+    def evict(self, keep=None):
+        """
+        Drop least recently used blobs until the store fits its quota
+
+        Args:
+            keep: Digest to spare as well as the pinned ones
+        """
+        if not self.max_bytes:
+            return
+
+        with self._lock:
+            total = sum(blob['size'] for blob in self.blobs.values())
+            if total <= self.max_bytes:
+                return
+
+            for digest in sorted(self.blobs, key=lambda d: self.blobs[d]['last_used']):
+                if total <= self.max_bytes:
+                    break
+                if digest == keep or digest in self.pins:
+                    continue
+                total -= self.blobs[digest]['size']
+                self._delete(digest)
+                self.stats['evicted'] += 1
+
+
+def hash_file(path, chunk_size=65536, algorithm='sha256'):
+    """Hex digest of a file (SHA-256 unless another hashlib algorithm is named)"""
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+SWE3 Site Crawler
+Breadth-first, bounded-concurrency crawl of the public SWE3 site that
+streams out PDF links as they are discovered. Stays on the SWE3 domain,
+honours robots.txt (including Crawl-delay) and stops at a depth limit or
+time budget, whichever comes first.
+"""
+
+import argparse
+import hashlib
+import math
+import re
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Iterator, List, Optional, Tuple
+from urllib.parse import urljoin, urldefrag, urlparse
+from urllib.robotparser import RobotFileParser
+
+from swe3_http import USER_AGENT, get_session
+
+SWE3_BASE_URL = 'https://amerikanskfotboll.swe3.se/'
+
+HREF_PATTERN = re.compile(r'''href\s*=\s*["']?([^"'\s>]+)''', re.IGNORECASE)
+
+# Links that are never HTML pages
+SKIP_EXTENSIONS = (
+    '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.ico', '.css', '.js',
+    '.zip', '.doc', '.docx', '.xls', '.xlsx', '.mp4', '.mp3', '.woff', '.woff2', '.xml'
+)
+
+# Pages larger than this are not parsed for links
+MAX_PAGE_BYTES = 5 * 1024 * 1024
+
+
+class BloomFilter:
+    """Fixed-size probabilistic set; a false positive only skips one page"""
+
+    def __init__(self, capacity: int = 100000, error_rate: float = 0.001):
+        bits = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.size = max(8, bits)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value: str) -> bool:
+        """Add value; returns False if it was (probably) already present"""
+        added = False
+        for pos in self._positions(value):
+            byte, bit = divmod(pos, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        return added
+
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[pos // 8] & (1 << (pos % 8)) for pos in self._positions(value))
+
+
+class SWE3Crawler:
+    """Concurrent breadth-first crawler emitting PDF URLs"""
+
+    def __init__(self, start_url: str = SWE3_BASE_URL, max_depth: int = 3, workers: int = 4,
+                 time_budget: float = 120, delay: Optional[float] = None, max_pages: int = 5000,
+                 session=None, timeout: int = 10):
+        """
+        Initialize crawler
+
+        Args:
+            start_url: Where to start; only its host (and www. variant) is crawled
+            max_depth: Link hops from start_url
+            workers: Pages fetched concurrently
+            time_budget: Seconds before the crawl stops submitting new pages
+            delay: Minimum seconds between requests (default: robots Crawl-delay or 0.25)
+            max_pages: Hard cap on pages fetched
+            session: requests session (defaults to the shared swe3_http one)
+            timeout: Per-request timeout (seconds)
+        """
+        self.start_url = start_url
+        self.max_depth = max_depth
+        self.workers = max(1, workers)
+        self.time_budget = time_budget
+        self.delay = delay
+        self.max_pages = max_pages
+        self.session = session or get_session()
+        self.timeout = timeout
+
+        host = urlparse(start_url).netloc.lower()
+        self.hosts = {host, host[4:] if host.startswith('www.') else f'www.{host}'}
+        self.robots = None
+        self.seen_pages = BloomFilter(capacity=max(1000, max_pages * 4))
+        self.seen_pdfs = set()
+        self.stats = {'pages': 0, 'errors': 0, 'skipped_robots': 0, 'pdfs': 0, 'bytes': 0}
+        self._next_request = 0.0
+        self._politeness_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key, amount=1):
+        """Increment a stats counter (shared by all fetch workers)"""
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def load_robots(self):
+        """Fetch robots.txt (a missing or unreadable file allows everything)"""
+        robots_url = urljoin(self.start_url, '/robots.txt')
+        self.robots = RobotFileParser(robots_url)
+        try:
+            response = self.session.get(robots_url, timeout=self.timeout)
+            if response.status_code == 200:
+                self.robots.parse(response.text.splitlines())
+            else:
+                self.robots.allow_all = True
+        except Exception:
+            self.robots.allow_all = True
+
+        if self.delay is None:
+            crawl_delay = self.robots.crawl_delay(USER_AGENT) if not self.robots.allow_all else None
+            self.delay = float(crawl_delay) if crawl_delay else 0.25
+
+    def _wait_turn(self):
+        """Space requests at least self.delay apart across all workers"""
+        with self._politeness_lock:
+            now = time.monotonic()
+            start = max(now, self._next_request)
+            self._next_request = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+    def normalize(self, url: str, base: str, any_host: bool = False) -> Optional[str]:
+        """Absolute, fragment-free http(s) URL on the SWE3 domain (any domain if any_host), or None"""
+        url, _ = urldefrag(urljoin(base, url.strip()))
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https') or not (any_host or parsed.netloc.lower() in self.hosts):
+            return None
+        return url
+
+    def fetch(self, url: str) -> Tuple[str, List[str]]:
+        """Fetch one page and return (url, links found on it)"""
+        if self.robots and not self.robots.can_fetch(USER_AGENT, url):
+            self._count('skipped_robots')
+            return url, []
+
+        self._wait_turn()
+        try:
+            response = self.session.get(url, timeout=self.timeout, stream=True)
+            with response:
+                content_type = response.headers.get('Content-Type', '')
+                if response.status_code != 200 or 'html' not in content_type:
+                    return url, []
+                body = response.raw.read(MAX_PAGE_BYTES, decode_content=True)
+        except Exception as e:
+            self._count('errors')
+            print(f"[CRAWL] {url}: {e}", file=sys.stderr)
+            return url, []
+
+        self._count('pages')
+        self._count('bytes', len(body))
+        html = body.decode(response.encoding or 'utf-8', errors='replace')
+        return url, [match.group(1) for match in HREF_PATTERN.finditer(html)]
+
+    def crawl(self) -> Iterator[str]:
+        """Yield PDF URLs as they are discovered"""
+        if self.robots is None:
+            self.load_robots()
+
+        deadline = time.monotonic() + self.time_budget
+        frontier = deque([(self.start_url, 0)])
+        self.seen_pages.add(self.start_url)
+        submitted = 0
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            in_flight = {}
+            while frontier or in_flight:
+                while frontier and len(in_flight) < self.workers and submitted < self.max_pages \
+                        and time.monotonic() < deadline:
+                    url, depth = frontier.popleft()
+                    in_flight[executor.submit(self.fetch, url)] = depth
+                    submitted += 1
+
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, timeout=max(0.1, deadline - time.monotonic()),
+                               return_when=FIRST_COMPLETED)
+                if not done and time.monotonic() >= deadline:
+                    # Out of time: let in-flight pages finish, queue nothing new
+                    frontier.clear()
+                    continue
+
+                for future in done:
+                    depth = in_flight.pop(future)
+                    page_url, links = future.result()
+                    for link in links:
+                        # PDFs linked from SWE3 count wherever they are hosted; only SWE3 pages are crawled
+                        url = self.normalize(link, page_url, any_host=True)
+                        if not url:
+                            continue
+                        parsed = urlparse(url)
+                        path = parsed.path.lower()
+                        if path.endswith('.pdf'):
+                            if url not in self.seen_pdfs:
+                                self.seen_pdfs.add(url)
+                                self._count('pdfs')
+                                yield url
+                        elif parsed.netloc.lower() in self.hosts and depth < self.max_depth \
+                                and not path.endswith(SKIP_EXTENSIONS) and self.seen_pages.add(url):
+                            frontier.append((url, depth + 1))
+
+
+def main():
+    """Command-line interface: print PDF URLs one per line as they are found"""
+    parser = argparse.ArgumentParser(description='Crawl the SWE3 site for PDF links')
+    parser.add_argument('start_url', nargs='?', default=SWE3_BASE_URL)
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--time-budget', type=float, default=120)
+    parser.add_argument('--delay', type=float, default=None)
+    args = parser.parse_args()
+
+    crawler = SWE3Crawler(args.start_url, max_depth=args.depth, workers=args.workers,
+                          time_budget=args.time_budget, delay=args.delay)
+    for url in crawler.crawl():
+        print(url, flush=True)
+
+    print(f"[CRAWL] {crawler.stats}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
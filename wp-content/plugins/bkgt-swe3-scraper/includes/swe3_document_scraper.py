@@ -3,69 +3,249 @@
 SWE3 Document Scraper
 Fetches and parses JavaScript-heavy SWE3 pages for document links
 Falls back to requests library if Selenium/browser drivers unavailable
+Browsers are pooled and reused across URLs; many URLs can be scraped
+concurrently in one run
+Can also run as a long-lived worker (--daemon) answering newline-delimited
+JSON requests on a Unix domain socket, keeping sessions and browsers warm
 """
 
+import argparse
+import importlib.util
+import os
+import signal
+import socket
+import socketserver
 import sys
 import json
+import queue
+import threading
 import time
 import re
 import urllib.parse
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Callable, List, Dict, Optional
 
-# Try Selenium first
-HAS_SELENIUM = False
-try:
-    from selenium import webdriver
-    from selenium.webdriver.common.by import By
-    from selenium.webdriver.support.ui import WebDriverWait
-    from selenium.webdriver.support import expected_conditions as EC
-    from selenium.common.exceptions import TimeoutException, NoSuchElementException
-    HAS_SELENIUM = True
-except ImportError:
-    pass
+from swe3_link_extractor import extract_pdf_links, title_from_url
+from swe3_output import NDJSONWriter, add_output_argument
 
-# Try webdriver-manager
-HAS_DRIVER_MANAGER = False
-if HAS_SELENIUM:
+# Backends are imported on first use: a plain HTTP scrape never pays for
+# selenium/webdriver-manager, and --engine=http never even looks for them.
+# Availability is checked with find_spec, which does not import anything.
+def _installed(*modules: str) -> bool:
     try:
-        from webdriver_manager.chrome import ChromeDriverManager
-        from webdriver_manager.firefox import GeckoDriverManager
-        from selenium.webdriver.chrome.service import Service as ChromeService
-        from selenium.webdriver.firefox.service import Service as FirefoxService
-        HAS_DRIVER_MANAGER = True
-    except ImportError:
-        pass
+        return all(importlib.util.find_spec(name) is not None for name in modules)
+    except (ImportError, ValueError):
+        return False
 
-# Always available
-try:
-    import requests
-    HAS_REQUESTS = True
-except ImportError:
-    HAS_REQUESTS = False
+HAS_REQUESTS = _installed('requests')
+
+ENGINES = ('auto', 'http', 'browser')
+
+_browser_backend = None
+_browser_backend_lock = threading.Lock()
+
+def browser_backend_available() -> bool:
+    """Selenium and webdriver-manager are installed (nothing is imported)"""
+    return _installed('selenium', 'webdriver_manager')
+
+def load_browser_backend() -> Optional[SimpleNamespace]:
+    """Import the Selenium backend once; None if it cannot be imported"""
+    global _browser_backend
+    with _browser_backend_lock:
+        if _browser_backend is None:
+            try:
+                from selenium import webdriver
+                from selenium.webdriver.common.by import By
+                from selenium.webdriver.support.ui import WebDriverWait
+                from selenium.webdriver.support import expected_conditions as EC
+                from selenium.common.exceptions import TimeoutException
+                from selenium.webdriver.chrome.service import Service as ChromeService
+                from selenium.webdriver.firefox.service import Service as FirefoxService
+                from webdriver_manager.chrome import ChromeDriverManager
+                from webdriver_manager.firefox import GeckoDriverManager
+                _browser_backend = SimpleNamespace(
+                    webdriver=webdriver, By=By, WebDriverWait=WebDriverWait, EC=EC,
+                    TimeoutException=TimeoutException, ChromeService=ChromeService,
+                    FirefoxService=FirefoxService, ChromeDriverManager=ChromeDriverManager,
+                    GeckoDriverManager=GeckoDriverManager
+                )
+            except ImportError:
+                _browser_backend = False
+        return _browser_backend or None
+
+# <script type="application/json"> and JSON-LD blocks
+EMBEDDED_JSON_PATTERN = re.compile(
+    r'<script[^>]*type=["\']application/(?:ld\+)?json["\'][^>]*>(.*?)</script>',
+    re.IGNORECASE | re.DOTALL
+)
+
+# window.foo = ... / var foo = ... (value decoded from the match end)
+JS_ASSIGNMENT_PATTERN = re.compile(r'(?:window\.[\w$]+|(?:var|let|const)\s+[\w$]+)\s*=\s*(?=[\[{])')
+
+PDF_URL_PATTERN = re.compile(r'(?:https?://|/)?[^\s"\'<>]+\.pdf(?:\?[^\s"\'<>]*)?', re.IGNORECASE)
+
+class BrowserPool:
+    """
+    Pool of live WebDriver instances shared across URLs
+    
+    Browsers are started lazily up to `size`, handed out one caller at a
+    time, and restarted after `max_pages` page loads to shed the memory a
+    long-lived browser accumulates.
+    """
+    
+    def __init__(self, factory: Callable, size: int = 1, max_pages: int = 50):
+        """
+        Initialize pool
+        
+        Args:
+            factory: Callable returning a new WebDriver, or None on failure
+            size: Maximum concurrent browsers
+            max_pages: Page loads before a browser is restarted
+        """
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_pages = max(1, max_pages)
+        self.idle = queue.Queue()
+        self.stats = {'started': 0, 'restarted': 0, 'pages': 0}
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._lock = threading.Lock()
+        self._all = []
+        # Set once a launch fails so we stop paying for doomed launches
+        self.unavailable = False
+    
+    @contextmanager
+    def browser(self):
+        """Borrow a browser (None if one could not be started)"""
+        with self._slots:
+            try:
+                driver, pages = self.idle.get_nowait()
+            except queue.Empty:
+                driver, pages = self._start(), 0
+            
+            try:
+                yield driver
+            except Exception:
+                # A browser that failed mid-page is not trusted again
+                self._quit(driver)
+                raise
+            
+            if driver is None:
+                return
+            pages += 1
+            with self._lock:
+                self.stats['pages'] += 1
+            if pages >= self.max_pages or not self._recycle_tab(driver):
+                self._quit(driver)
+                with self._lock:
+                    self.stats['restarted'] += 1
+            else:
+                self.idle.put((driver, pages))
+    
+    def _start(self):
+        """Launch a new browser"""
+        if self.unavailable:
+            return None
+        driver = self.factory()
+        if driver is None:
+            self.unavailable = True
+        else:
+            with self._lock:
+                self.stats['started'] += 1
+                self._all.append(driver)
+        return driver
+    
+    def _recycle_tab(self, driver) -> bool:
+        """Close extra windows and blank the main tab so the next page starts clean"""
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.get('about:blank')
+            return True
+        except Exception:
+            return False
+    
+    def _quit(self, driver):
+        """Shut a browser down"""
+        if driver is None:
+            return
+        with self._lock:
+            if driver in self._all:
+                self._all.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+    
+    def close(self):
+        """Quit every browser the pool started"""
+        with self._lock:
+            drivers, self._all = self._all, []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        while not self.idle.empty():
+            self.idle.get_nowait()
 
 class SWE3DocumentScraper:
     """Scrapes documents from SWE3 website"""
     
-    def __init__(self, headless: bool = True, timeout: int = 10):
+    def __init__(self, headless: bool = True, timeout: int = 10, browsers: int = 1,
+                 max_pages_per_browser: int = 50, engine: str = 'auto'):
         """
         Initialize Scraper
         
         Args:
             headless: Run browser in headless mode (if available)
             timeout: Wait timeout (seconds)
+            browsers: Browser instances kept alive for concurrent scraping
+            max_pages_per_browser: Page loads before a browser is restarted
+            engine: 'auto' (HTTP tiers, browser as last resort), 'http'
+                (never touch the browser backend) or 'browser' (render only)
         """
+        if engine not in ENGINES:
+            raise ValueError(f'Unknown engine: {engine}')
         self.timeout = timeout
         self.driver = None
         self.headless = headless
-        self.use_selenium = HAS_SELENIUM and HAS_DRIVER_MANAGER
-        
+        self.engine = engine
+        self.use_selenium = engine != 'http' and browser_backend_available()
+        self.browsers = max(1, browsers)
+        self.pool = BrowserPool(self.create_driver, size=self.browsers, max_pages=max_pages_per_browser)
+    
+    def close(self):
+        """Shut down pooled browsers"""
+        self.pool.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
     def setup_driver(self) -> bool:
         """
-        Setup Chrome/Firefox WebDriver
+        Setup Chrome/Firefox WebDriver on self.driver
         Returns True if successful, False otherwise
         """
-        if not HAS_SELENIUM or not HAS_DRIVER_MANAGER:
-            return False
+        self.driver = self.create_driver()
+        return self.driver is not None
+    
+    def create_driver(self):
+        """
+        Start a Chrome/Firefox WebDriver
+        Returns the driver, or None if no browser could be started
+        """
+        backend = load_browser_backend() if self.use_selenium else None
+        if backend is None:
+            return None
+        webdriver = backend.webdriver
             
         try:
             # Try Chrome with webdriver-manager
@@ -79,9 +259,8 @@ class SWE3DocumentScraper:
                 options.add_argument('--disable-extensions')
                 options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
                 
-                service = ChromeService(ChromeDriverManager().install())
-                self.driver = webdriver.Chrome(service=service, options=options)
-                return True
+                service = backend.ChromeService(backend.ChromeDriverManager().install())
+                return webdriver.Chrome(service=service, options=options)
             except Exception as e:
                 # Try Firefox
                 options = webdriver.FirefoxOptions()
@@ -89,11 +268,10 @@ class SWE3DocumentScraper:
                     options.add_argument('--headless')
                 options.add_argument('--disable-gpu')
                 
-                service = FirefoxService(GeckoDriverManager().install())
-                self.driver = webdriver.Firefox(service=service, options=options)
-                return True
+                service = backend.FirefoxService(backend.GeckoDriverManager().install())
+                return webdriver.Firefox(service=service, options=options)
         except Exception as e:
-            return False
+            return None
     
     def fetch_url(self, url: str) -> Optional[str]:
         """
@@ -105,146 +283,574 @@ class SWE3DocumentScraper:
         Returns:
             Page source HTML or None if error
         """
-        if self.use_selenium and self.setup_driver():
+        if self.use_selenium:
+            html = self.fetch_with_browser(url)
+            if html:
+                return html
+        return self.fetch_with_http(url)
+    
+    def fetch_with_http(self, url: str) -> Optional[str]:
+        """Plain HTTP GET (tier 1)"""
+        if not HAS_REQUESTS:
+            return None
+        try:
+            from swe3_http import get_session
+            
+            # Shared session sends the browser User-Agent and keeps connections alive
+            response = get_session().get(url, timeout=self.timeout)
+            response.raise_for_status()
+            return response.text
+        except Exception as e:
+            return None
+    
+    def fetch_with_browser(self, url: str) -> Optional[str]:
+        """Render the page in a pooled browser (tier 3)"""
+        backend = load_browser_backend() if self.use_selenium else None
+        if backend is None:
+            return None
+        with self.pool.browser() as driver:
+            if driver is None:
+                return None
             try:
-                self.driver.get(url)
+                driver.get(url)
                 
                 # Wait for content
-                wait = WebDriverWait(self.driver, self.timeout)
+                wait = backend.WebDriverWait(driver, self.timeout)
                 try:
-                    wait.until(EC.presence_of_all_elements_located((By.TAG_NAME, "a")))
-                except TimeoutException:
+                    wait.until(backend.EC.presence_of_all_elements_located((backend.By.TAG_NAME, "a")))
+                except backend.TimeoutException:
                     pass
                 
                 time.sleep(1)
-                return self.driver.page_source
+                return driver.page_source
             except Exception as e:
                 return None
-            finally:
-                if self.driver:
-                    self.driver.quit()
+    
+    def extract_embedded_documents(self, html: str, base_url: str = '') -> List[Dict[str, str]]:
+        """
+        Extract PDF links from data embedded in the page (tier 2)
+        
+        Looks inside <script type="application/json"> / JSON-LD blocks and
+        `window.name = {...}` / `var name = [...]` assignments, walking the
+        decoded data for PDF URLs.
+        
+        Returns:
+            List of dicts with 'url' and 'title' keys
+        """
+        payloads = []
+        for match in EMBEDDED_JSON_PATTERN.finditer(html):
+            try:
+                payloads.append(json.loads(match.group(1)))
+            except ValueError:
+                pass
         
-        # Fallback to requests library
-        if HAS_REQUESTS:
+        decoder = json.JSONDecoder()
+        for match in JS_ASSIGNMENT_PATTERN.finditer(html):
             try:
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-                }
-                response = requests.get(url, timeout=self.timeout, headers=headers)
-                response.raise_for_status()
-                return response.text
-            except Exception as e:
-                return None
+                value, _ = decoder.raw_decode(html, match.end())
+                payloads.append(value)
+            except ValueError:
+                pass
         
-        return None
+        documents = []
+        seen = set()
+        for payload in payloads:
+            for url, title in self._walk_embedded(payload, base_url):
+                url = urllib.parse.urljoin(base_url, url)
+                if url not in seen:
+                    seen.add(url)
+                    documents.append({
+                        'url': url,
+                        'title': title or self._extract_title_from_url(url)
+                    })
+        return documents
+    
+    def _walk_embedded(self, value, base_url: str, title: str = ''):
+        """Yield (url, title) for every PDF URL inside decoded JSON"""
+        if isinstance(value, dict):
+            own_title = next((value[key] for key in ('title', 'name', 'label', 'text')
+                              if isinstance(value.get(key), str)), title)
+            for item in value.values():
+                yield from self._walk_embedded(item, base_url, own_title)
+        elif isinstance(value, list):
+            for item in value:
+                yield from self._walk_embedded(item, base_url, title)
+        elif isinstance(value, str) and '.pdf' in value.lower():
+            # Either a bare URL or an HTML fragment full of links
+            if PDF_URL_PATTERN.fullmatch(value.strip()):
+                yield value.strip(), title
+            else:
+                for link in self.extract_pdf_links(value, base_url):
+                    yield link['url'], link['title']
     
-    def extract_pdf_links(self, html: str) -> List[Dict[str, str]]:
+    def extract_pdf_links(self, html: str, base_url: str = '') -> List[Dict[str, str]]:
         """
         Extract PDF download links from HTML
         
         Args:
             html: Page HTML source
+            base_url: Page URL, used to resolve relative links
             
         Returns:
             List of dicts with 'url' and 'title' keys
         """
-        documents = []
-        
-        # Create a temporary driver instance to parse HTML
-        # (using Selenium's HTML parser is overkill, use regex instead)
-        import re
-        
-        # Pattern 1: Direct PDF links
-        pdf_pattern = r'href=["\']?([^"\'>\s]+\.pdf)["\']?'
-        for match in re.finditer(pdf_pattern, html, re.IGNORECASE):
-            url = match.group(1)
-            if url.startswith('http') or url.startswith('/'):
-                documents.append({
-                    'url': url,
-                    'title': self._extract_title_from_url(url)
-                })
-        
-        # Pattern 2: Links in table cells (common SWE3 structure)
-        # <a href="...">Document Title</a>
-        link_pattern = r'<a\s+(?:[^>]*?\s+)?href=["\']?([^"\'>\s]+)["\']?[^>]*>([^<]+)</a>'
-        for match in re.finditer(link_pattern, html):
-            url = match.group(1)
-            title = match.group(2).strip()
-            
-            # Only include if it's a PDF or document-like URL
-            if url.endswith('.pdf') or 'download' in url.lower() or 'document' in url.lower():
-                if not any(d['url'] == url for d in documents):  # Avoid duplicates
-                    documents.append({
-                        'url': url,
-                        'title': title if title else self._extract_title_from_url(url)
-                    })
-        
-        return documents
+        return extract_pdf_links(html, base_url)
     
     def _extract_title_from_url(self, url: str) -> str:
         """Extract human-readable title from URL"""
-        import urllib.parse
-        
-        # Get filename from URL
-        parsed = urllib.parse.urlparse(url)
-        filename = parsed.path.split('/')[-1]
-        
-        # Remove extension and decode URL encoding
-        title = urllib.parse.unquote(filename)
-        if '.' in title:
-            title = title.rsplit('.', 1)[0]
-        
-        return title or 'Document'
+        return title_from_url(url)
     
     def scrape(self, url: str) -> Dict[str, any]:
         """
         Main scraping function
         
+        Escalates through tiers and stops at the first that finds documents:
+        plain HTTP ('http'), data embedded in that same HTML
+        ('embedded-json'), then a rendered browser page ('browser').
+        engine='http' stops before the browser; engine='browser' goes
+        straight to it.
+        
         Args:
             url: URL to scrape
             
         Returns:
-            Dict with 'success', 'documents', and optional 'error' keys
+            Dict with 'success', 'documents', 'method', 'timings' and
+            optional 'error' keys
         """
-        try:
-            # Fetch and render page
-            html = self.fetch_url(url)
-            if not html:
-                return {
-                    'success': False,
-                    'documents': [],
-                    'error': 'Could not fetch URL'
-                }
-            
-            # Extract links
-            documents = self.extract_pdf_links(html)
-            
+        timings = {}
+        
+        def timed(tier, func, *args):
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                timings[tier] = round(time.perf_counter() - started, 4)
+        
+        def result(documents, method):
             return {
                 'success': True,
                 'documents': documents,
                 'count': len(documents),
-                'method': 'selenium' if (self.use_selenium and self.driver) else 'requests'
+                'method': method,
+                'timings': timings
+            }
+        
+        try:
+            if self.engine == 'browser':
+                if not self.use_selenium:
+                    return {
+                        'success': False,
+                        'documents': [],
+                        'error': 'Browser engine requested but selenium/webdriver-manager are not installed',
+                        'timings': timings
+                    }
+                rendered = timed('browser', self.fetch_with_browser, url)
+                if rendered is None:
+                    return {
+                        'success': False,
+                        'documents': [],
+                        'error': 'Could not render URL',
+                        'timings': timings
+                    }
+                return result(self.extract_pdf_links(rendered, url), 'browser')
+            
+            html = timed('http', self.fetch_with_http, url)
+            if html:
+                documents = self.extract_pdf_links(html, url)
+                if documents:
+                    return result(documents, 'http')
+                
+                documents = timed('embedded-json', self.extract_embedded_documents, html, url)
+                if documents:
+                    return result(documents, 'embedded-json')
+            
+            # Last resort: the only tier that executes the page's JavaScript
+            rendered = timed('browser', self.fetch_with_browser, url) if self.use_selenium else None
+            if rendered:
+                return result(self.extract_pdf_links(rendered, url), 'browser')
+            
+            if html:
+                return result([], 'http')
+            
+            return {
+                'success': False,
+                'documents': [],
+                'error': 'Could not fetch URL',
+                'timings': timings
             }
         except Exception as e:
             return {
                 'success': False,
                 'documents': [],
-                'error': str(e)
+                'error': str(e),
+                'timings': timings
             }
 
+    def scrape_many(self, urls: List[str]) -> List[Dict[str, any]]:
+        """
+        Scrape several URLs concurrently across the browser pool
+        
+        Returns:
+            One scrape() result per URL, in input order, each with its 'url'
+        """
+        with ThreadPoolExecutor(max_workers=self.browsers) as executor:
+            results = list(executor.map(self.scrape, urls))
+        
+        for url, result in zip(urls, results):
+            result['url'] = url
+        return results
+    
+    def iter_scrape_many(self, urls: List[str]):
+        """
+        Scrape several URLs concurrently, yielding each result as soon as
+        its page is done (completion order, not input order)
+        
+        Yields:
+            scrape() results, each with its 'url'
+        """
+        with ThreadPoolExecutor(max_workers=self.browsers) as executor:
+            futures = {executor.submit(self.scrape, url): url for url in urls}
+            for future in as_completed(futures):
+                result = future.result()
+                result['url'] = futures[future]
+                yield result
+
+# Default socket for --daemon (PHP looks here unless told otherwise): the plugin's
+# own run/ directory, not a world-writable one where anyone could bind it first
+PLUGIN_RUN_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'run')
+DEFAULT_SOCKET_PATH = os.environ.get('BKGT_SWE3_WORKER_SOCKET', os.path.join(PLUGIN_RUN_DIR, 'worker.sock'))
+
+# Longest request line a client may send
+MAX_REQUEST_BYTES = 1024 * 1024
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """One client connection; any number of requests, one JSON object per line"""
+    
+    def handle(self):
+        self.server.count('connections')
+        while True:
+            line = self.rfile.readline(MAX_REQUEST_BYTES)
+            if not line:
+                return
+            if not line.strip():
+                continue
+            
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError('request must be a JSON object')
+            except ValueError as e:
+                self.server.count('errors')
+                response = {'id': None, 'ok': False, 'error': f'Bad request: {e}'}
+            else:
+                response = self.server.dispatch(request)
+            
+            try:
+                self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+                self.wfile.flush()
+            except OSError:
+                return
+
+class ScraperDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Persistent scraper worker on a Unix domain socket
+    
+    Protocol: the client writes one JSON object per line and gets one JSON
+    line back per request, on the same connection:
+    
+        {"id": 1, "command": "scrape", "url": "https://..."}
+        {"id": 1, "ok": true, "result": {...scrape() result...}}
+    
+    Commands: scrape (url), scrape_many (urls), media_documents (the media
+    library listing swe3_scraper_final.py prints), health, stats, shutdown.
+    Scraping commands share `max_requests` slots; health and stats never
+    wait behind them.
+    """
+    
+    daemon_threads = True
+    
+    def __init__(self, socket_path: str, scraper: 'SWE3DocumentScraper', max_requests: int = 4):
+        """
+        Initialize daemon and bind the socket
+        
+        Args:
+            socket_path: Filesystem path of the Unix socket
+            scraper: Scraper whose session and browser pool stay warm
+            max_requests: Scrape requests handled concurrently
+        """
+        self.socket_path = socket_path
+        self.scraper = scraper
+        self.max_requests = max(1, max_requests)
+        self.started = time.time()
+        self.stats = {'connections': 0, 'requests': 0, 'errors': 0, 'active': 0, 'commands': {}}
+        self._slots = threading.BoundedSemaphore(self.max_requests)
+        self._stats_lock = threading.Lock()
+        # Media listing transfer counters summed over requests
+        self._media_stats = {}
+        self.commands = {
+            'scrape': self.cmd_scrape,
+            'scrape_many': self.cmd_scrape_many,
+            'media_documents': self.cmd_media_documents,
+            'health': self.cmd_health,
+            'stats': self.cmd_stats,
+            'shutdown': self.cmd_shutdown,
+        }
+        
+        prepare_socket_dir(socket_path)
+        remove_stale_socket(socket_path)
+        # Bind with the final 0660 mode: no window in which others can connect
+        previous_umask = os.umask(0o117)
+        try:
+            super().__init__(socket_path, DaemonRequestHandler)
+        finally:
+            os.umask(previous_umask)
+    
+    def count(self, key, amount=1):
+        """Increment a stats counter"""
+        with self._stats_lock:
+            self.stats[key] += amount
+    
+    def dispatch(self, request: Dict) -> Dict:
+        """Run one request and build its response"""
+        command = request.get('command')
+        response = {'id': request.get('id')}
+        handler = self.commands.get(command)
+        
+        with self._stats_lock:
+            self.stats['requests'] += 1
+            commands = self.stats['commands']
+            commands[command] = commands.get(command, 0) + 1
+        
+        if handler is None:
+            self.count('errors')
+            response.update(ok=False, error=f'Unknown command: {command}')
+            return response
+        
+        try:
+            if command in ('health', 'stats', 'shutdown'):
+                result = handler(request)
+            else:
+                with self._slots:
+                    self.count('active')
+                    try:
+                        result = handler(request)
+                    finally:
+                        self.count('active', -1)
+            response.update(ok=True, result=result)
+        except Exception as e:
+            self.count('errors')
+            response.update(ok=False, error=str(e))
+        return response
+    
+    def cmd_scrape(self, request: Dict) -> Dict:
+        url = request.get('url')
+        if not url:
+            raise ValueError('scrape needs "url"')
+        result = self.scraper.scrape(url)
+        result['url'] = url
+        return result
+    
+    def cmd_scrape_many(self, request: Dict) -> Dict:
+        urls = request.get('urls') or []
+        if not isinstance(urls, list) or not urls:
+            raise ValueError('scrape_many needs a non-empty "urls" list')
+        results = self.scraper.scrape_many(urls)
+        return {
+            'success': all(r.get('success') for r in results),
+            'results': results,
+            'count': sum(r.get('count', 0) for r in results),
+        }
+    
+    def cmd_media_documents(self, request: Dict) -> Dict:
+        # Imported here so plain page scraping never pays for it
+        from swe3_media_client import SWE3MediaClient
+        from swe3_scraper_final import scrape_swe3_documents
+        
+        # A client per request: the listing's completeness and counters are
+        # per listing, and requests run concurrently (the session is shared)
+        client = SWE3MediaClient()
+        try:
+            return scrape_swe3_documents(client)
+        finally:
+            with self._stats_lock:
+                for key, value in client.stats.items():
+                    self._media_stats[key] = self._media_stats.get(key, 0) + value
+    
+    def cmd_health(self, request: Dict) -> Dict:
+        return {
+            'status': 'ok',
+            'pid': os.getpid(),
+            'uptime': round(time.time() - self.started, 1),
+            'engine': self.scraper.engine,
+            'selenium': self.scraper.use_selenium,
+            'requests_library': HAS_REQUESTS,
+        }
+    
+    def cmd_stats(self, request: Dict) -> Dict:
+        with self._stats_lock:
+            stats = json.loads(json.dumps(self.stats))
+            if self._media_stats:
+                stats['media'] = dict(self._media_stats)
+        stats['max_requests'] = self.max_requests
+        stats['uptime'] = round(time.time() - self.started, 1)
+        stats['browser_pool'] = dict(self.scraper.pool.stats)
+        return stats
+    
+    def cmd_shutdown(self, request: Dict) -> Dict:
+        # shutdown() blocks until serve_forever() returns, so not from a handler thread
+        threading.Thread(target=self.shutdown, daemon=True).start()
+        return {'status': 'stopping'}
+    
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+def prepare_socket_dir(socket_path: str):
+    """
+    Create the socket's directory (0750) if missing
+    
+    Raises:
+        RuntimeError: if the directory belongs to another user or others
+            may write to it (and so plant a socket PHP would trust)
+    """
+    directory = os.path.dirname(os.path.abspath(socket_path))
+    os.makedirs(directory, mode=0o750, exist_ok=True)
+    info = os.stat(directory)
+    if info.st_uid != os.getuid() or info.st_mode & 0o022:
+        raise RuntimeError(f'{directory} must belong to this user and not be writable by group or others')
+
+def remove_stale_socket(socket_path: str):
+    """
+    Remove a socket file left behind by a dead worker
+    
+    Raises:
+        RuntimeError: if a live worker is already listening there
+    """
+    if not os.path.exists(socket_path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+    except OSError:
+        os.unlink(socket_path)
+        return
+    finally:
+        probe.close()
+    raise RuntimeError(f'A worker is already listening on {socket_path}')
+
+def run_daemon(args) -> int:
+    """Serve requests until SIGTERM/SIGINT or a shutdown command"""
+    scraper = SWE3DocumentScraper(headless=True, timeout=args.timeout, browsers=args.browsers,
+                                  max_pages_per_browser=args.max_pages_per_browser, engine=args.engine)
+    try:
+        server = ScraperDaemon(args.socket, scraper, max_requests=args.max_requests)
+    except (RuntimeError, OSError) as e:
+        print(f'[DAEMON] {e}', file=sys.stderr)
+        scraper.close()
+        return 1
+    
+    def stop(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    
+    print(f'[DAEMON] Listening on {args.socket} (pid {os.getpid()})', file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        scraper.close()
+    print('[DAEMON] Stopped', file=sys.stderr)
+    return 0
+
+def parse_args(argv=None):
+    """Parse command line; keeps the old `<url> [timeout]` form working"""
+    parser = argparse.ArgumentParser(description='Scrape SWE3 pages for document links')
+    parser.add_argument('urls', nargs='*', help='URLs to scrape; "-" reads URLs from stdin')
+    parser.add_argument('--timeout', type=int, default=10, help='Page wait timeout (seconds)')
+    parser.add_argument('--browsers', type=int, default=1, help='Concurrent browser instances')
+    parser.add_argument('--max-pages-per-browser', type=int, default=50,
+                        help='Page loads before a browser is restarted')
+    parser.add_argument('--engine', choices=ENGINES, default=os.environ.get('SWE3_ENGINE', 'auto'),
+                        help='auto: HTTP first, browser as last resort; http: never load the '
+                             'browser backend; browser: always render (env SWE3_ENGINE)')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Run as a persistent worker on a Unix socket instead of scraping once')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH,
+                        help='Socket path for --daemon (env BKGT_SWE3_WORKER_SOCKET)')
+    parser.add_argument('--max-requests', type=int, default=4,
+                        help='Scrape requests a daemon handles concurrently')
+    add_output_argument(parser)
+    args = parser.parse_args(argv)
+    
+    if args.daemon:
+        return args
+    
+    # Legacy form: swe3_document_scraper.py <url> <timeout>
+    if len(args.urls) == 2 and args.urls[1].isdigit():
+        args.timeout = int(args.urls.pop())
+    
+    # Only an explicit "-" reads stdin: a caller passing no (or an empty)
+    # URL gets the usage error instead of a process waiting on input
+    if args.urls == ['-']:
+        args.urls = [line.strip() for line in sys.stdin if line.strip()]
+    args.urls = [url for url in args.urls if url.strip()]
+    return args
+
+def stream_scrape(scraper: 'SWE3DocumentScraper', urls: List[str]) -> int:
+    """
+    Write each page's documents as NDJSON records as soon as that page is
+    scraped, one error record per failed page, then a summary record
+    
+    Returns:
+        Exit code
+    """
+    writer = NDJSONWriter()
+    methods = {}
+    for result in scraper.iter_scrape_many(urls):
+        if not result.get('success'):
+            writer.error(result.get('error', 'Unknown error'), page=result['url'])
+            continue
+        methods[result['method']] = methods.get(result['method'], 0) + 1
+        for document in result['documents']:
+            writer.document(document, page=result['url'], method=result['method'])
+    
+    writer.summary(writer.errors == 0, pages=len(urls), failed_pages=writer.errors,
+                   methods=methods, browser_pool=scraper.pool.stats)
+    return 0 if writer.errors == 0 else 1
+
 def main():
     """Command-line interface"""
-    if len(sys.argv) < 2:
+    args = parse_args()
+    if args.daemon:
+        sys.exit(run_daemon(args))
+    
+    if not args.urls:
         print(json.dumps({
-            'error': 'Usage: swe3_document_scraper.py <url> [timeout]'
+            'error': 'Usage: swe3_document_scraper.py <url> [url ...] [--timeout N] [--browsers N]'
         }))
         sys.exit(1)
     
-    url = sys.argv[1]
-    timeout = int(sys.argv[2]) if len(sys.argv) > 2 else 10
-    
-    scraper = SWE3DocumentScraper(headless=True, timeout=timeout)
-    result = scraper.scrape(url)
+    with SWE3DocumentScraper(headless=True, timeout=args.timeout, browsers=args.browsers,
+                             max_pages_per_browser=args.max_pages_per_browser,
+                             engine=args.engine) as scraper:
+        if args.output == 'ndjson':
+            sys.exit(stream_scrape(scraper, args.urls))
+        
+        if len(args.urls) == 1:
+            result = scraper.scrape(args.urls[0])
+        else:
+            results = scraper.scrape_many(args.urls)
+            result = {
+                'success': all(r.get('success') for r in results),
+                'results': results,
+                'count': sum(r.get('count', 0) for r in results),
+                'browser_pool': scraper.pool.stats
+            }
     
     # Output JSON result
     print(json.dumps(result, indent=2))
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+SWE3 Document Fingerprints
+Finds near-duplicate PDFs: SWE3 republishes the same rulebook every year,
+often several times with minor edits, under a new URL each time. Each
+document version gets a MinHash signature of its text's word shingles, and
+an LSH index over the signatures finds earlier versions of a new document
+without comparing it to the whole corpus.
+
+- Shingles: every run of SHINGLE_WORDS consecutive words
+- Signature: one-permutation MinHash. Each shingle is hashed once; the hash
+  picks one of NUM_BINS bins and the smallest value per bin is kept. Empty
+  bins borrow from the next non-empty one (rotation densification). Two
+  signatures agree in a bin with probability equal to the Jaccard
+  similarity of the shingle sets.
+- LSH: the signature is cut into BANDS bands of ROWS bins. Documents sharing
+  any whole band are candidates (likely above ~0.7 similarity), and only
+  the candidates are compared bin by bin.
+
+One SQLite file holds the signatures and the band buckets, keyed like the
+blob store and the search index (source URL + modified timestamp).
+
+Usage:
+    python3 swe3_fingerprint.py match regler-2025.pdf [--threshold 0.8]
+    python3 swe3_fingerprint.py index-blobs [--blob-dir DIR]
+    python3 swe3_fingerprint.py duplicates [--output json]
+    python3 swe3_fingerprint.py stats
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import unicodedata
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from swe3_pdf_text import extract_text_timed
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    title TEXT,
+    modified TEXT,
+    content_hash TEXT,
+    shingles INTEGER NOT NULL,
+    signature BLOB,
+    added_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    band INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    doc_id INTEGER NOT NULL,
+    PRIMARY KEY (band, bucket, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS buckets_doc ON buckets (doc_id);
+'''
+
+# Bumped whenever signatures computed by older code are no longer comparable
+SIGNATURE_VERSION = 1
+
+NUM_BINS = 128
+BANDS = 16
+ROWS = NUM_BINS // BANDS
+
+SHINGLE_WORDS = 5
+
+# Texts with fewer shingles (scans, covers, forms) are not fingerprinted
+MIN_SHINGLES = 20
+
+# Estimated Jaccard similarity from which a document counts as another version
+DEFAULT_THRESHOLD = 0.8
+
+WORD_PATTERN = re.compile(r'\w+')
+
+_BIN_BITS = NUM_BINS.bit_length() - 1
+_VALUE_BITS = 64 - _BIN_BITS
+_EMPTY = (1 << 64) - 1
+_PACK = struct.Struct(f'>{NUM_BINS}Q')
+
+
+def default_fingerprint_path(state_dir):
+    """Fingerprint index location inside the pipeline state directory"""
+    return os.path.join(state_dir, 'fingerprints.sqlite3')
+
+
+def shingles(text: str) -> set:
+    """Distinct runs of SHINGLE_WORDS lower-cased words"""
+    words = WORD_PATTERN.findall(unicodedata.normalize('NFC', text).lower())
+    return {' '.join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def signature(text: str) -> Tuple[Optional[Tuple[int, ...]], int]:
+    """
+    MinHash signature of a text
+
+    Returns:
+        (signature or None if the text is too short, shingle count)
+    """
+    items = shingles(text)
+    if len(items) < MIN_SHINGLES:
+        return None, len(items)
+
+    bins = [_EMPTY] * NUM_BINS
+    for shingle in items:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        index = value & (NUM_BINS - 1)
+        value >>= _BIN_BITS
+        if value < bins[index]:
+            bins[index] = value
+
+    # Rotation densification: an empty bin takes the next non-empty bin's
+    # value, offset by the distance so borrowed values stay distinct
+    filled = [index for index, value in enumerate(bins) if value != _EMPTY]
+    dense = list(bins)
+    for index, value in enumerate(bins):
+        if value == _EMPTY:
+            distance = next(((other - index) % NUM_BINS for other in filled if other > index),
+                            filled[0] + NUM_BINS - index)
+            dense[index] = bins[(index + distance) % NUM_BINS] + (distance << _VALUE_BITS)
+    return tuple(dense), len(items)
+
+
+def similarity(a, b) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_BINS
+
+
+def band_buckets(sig) -> List[int]:
+    """One bucket id (signed 64-bit, as SQLite stores it) per band"""
+    packed = _PACK.pack(*sig)
+    size = ROWS * 8
+    return [
+        int.from_bytes(hashlib.blake2b(packed[band * size:(band + 1) * size], digest_size=8).digest(),
+                       'big', signed=True)
+        for band in range(BANDS)
+    ]
+
+
+def fingerprint_text_timed(path: str):
+    """
+    extract_text_timed() plus the text's signature; the process pool task
+    the pipeline uses when it detects versions
+
+    Returns:
+        (text, method, cpu_seconds, signature, shingle count)
+    """
+    started = time.process_time()
+    text, method, _ = extract_text_timed(path)
+    sig, count = signature(text)
+    return text, method, time.process_time() - started, sig, count
+
+
+class SWE3FingerprintIndex:
+    """Signatures and LSH buckets of every document version; safe to share between threads"""
+
+    def __init__(self, path):
+        """
+        Open (or create) the index
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        self.stats = {'added': 0, 'unchanged': 0, 'matched': 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        if self._db.execute('PRAGMA user_version').fetchone()[0] != SIGNATURE_VERSION:
+            self._db.executescript('DROP TABLE IF EXISTS buckets; DROP TABLE IF EXISTS documents;')
+            self._db.execute(f'PRAGMA user_version = {SIGNATURE_VERSION}')
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def has(self, key, content_hash=None) -> bool:
+        """True if this version is fingerprinted (with this content, when a hash is given)"""
+        with self._lock:
+            row = self._db.execute('SELECT content_hash FROM documents WHERE key = ?', (key,)).fetchone()
+        return bool(row) and (content_hash is None or row[0] == content_hash)
+
+    def get(self, key) -> Optional[Tuple[int, ...]]:
+        """Stored signature of a version (None if unknown or too short to fingerprint)"""
+        with self._lock:
+            row = self._db.execute('SELECT signature FROM documents WHERE key = ?', (key,)).fetchone()
+        return _PACK.unpack(row[0]) if row and row[0] else None
+
+    def add(self, key, sig, url, title='', modified='', content_hash=None, shingle_count=0) -> bool:
+        """
+        Store one version's signature, replacing what was stored under key
+
+        Args:
+            key: Version key (blob_key: URL@modified)
+            sig: Signature from signature(), or None for a text too short
+                to fingerprint (remembered so it is not extracted again)
+            url: SWE3 source URL
+            title: Document title
+            modified: SWE3 modified timestamp
+            content_hash: SHA-256 of the PDF; an unchanged version is skipped
+            shingle_count: Distinct shingles in the text
+
+        Returns:
+            True if the index changed
+        """
+        if content_hash and self.has(key, content_hash):
+            self.stats['unchanged'] += 1
+            return False
+
+        with self._lock:
+            self._db.execute('BEGIN')
+            try:
+                row = self._db.execute('SELECT id FROM documents WHERE key = ?', (key,)).fetchone()
+                values = (url, title, modified, content_hash, shingle_count,
+                          _PACK.pack(*sig) if sig else None, _now())
+                if row:
+                    doc_id = row[0]
+                    self._db.execute('DELETE FROM buckets WHERE doc_id = ?', (doc_id,))
+                    self._db.execute('UPDATE documents SET url = ?, title = ?, modified = ?, content_hash = ?, '
+                                     'shingles = ?, signature = ?, added_at = ? WHERE id = ?', values + (doc_id,))
+                else:
+                    doc_id = self._db.execute('INSERT INTO documents (url, title, modified, content_hash, shingles, '
+                                              'signature, added_at, key) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                              values + (key,)).lastrowid
+                if sig:
+                    self._db.executemany('INSERT OR IGNORE INTO buckets (band, bucket, doc_id) VALUES (?, ?, ?)',
+                                         ((band, bucket, doc_id) for band, bucket in enumerate(band_buckets(sig))))
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self.stats['added'] += 1
+        return True
+
+    def remove(self, key) -> bool:
+        """Drop one version from the index"""
+        with self._lock:
+            row = self._db.execute('SELECT id FROM documents WHERE key = ?', (key,)).fetchone()
+            if not row:
+                return False
+            self._db.execute('BEGIN')
+            self._db.execute('DELETE FROM buckets WHERE doc_id = ?', (row[0],))
+            self._db.execute('DELETE FROM documents WHERE id = ?', (row[0],))
+            self._db.execute('COMMIT')
+        return True
+
+    def matches(self, sig, threshold=DEFAULT_THRESHOLD, exclude_url=None, limit=5) -> List[Dict]:
+        """
+        Earlier versions of a document: indexed versions whose signature
+        is at least threshold similar, found through the LSH buckets
+
+        Args:
+            sig: Signature of the new document
+            threshold: Lowest estimated Jaccard similarity reported
+            exclude_url: Ignore versions of this URL (the document itself)
+            limit: Matches returned
+
+        Returns:
+            Matches (most similar, then newest, first): key, url, title,
+            modified, similarity
+        """
+        if not sig:
+            return []
+        with self._lock:
+            candidates = set()
+            for band, bucket in enumerate(band_buckets(sig)):
+                candidates.update(doc_id for doc_id, in self._db.execute(
+                    'SELECT doc_id FROM buckets WHERE band = ? AND bucket = ?', (band, bucket)))
+            if not candidates:
+                return []
+            placeholders = ','.join('?' * len(candidates))
+            rows = self._db.execute(f'SELECT key, url, title, modified, signature FROM documents '
+                                    f'WHERE id IN ({placeholders})', list(candidates)).fetchall()
+
+        found = []
+        for key, url, title, modified, packed in rows:
+            if url == exclude_url or not packed:
+                continue
+            score = similarity(sig, _PACK.unpack(packed))
+            if score >= threshold:
+                found.append({'key': key, 'url': url, 'title': title, 'modified': modified,
+                              'similarity': round(score, 3)})
+        found.sort(key=lambda match: (match['similarity'], match['modified'] or ''), reverse=True)
+        if found:
+            self.stats['matched'] += 1
+        return found[:limit]
+
+    def match(self, sig, threshold=DEFAULT_THRESHOLD, exclude_url=None) -> Optional[Dict]:
+        """The closest earlier version (see matches()), or None"""
+        found = self.matches(sig, threshold, exclude_url, limit=1)
+        return found[0] if found else None
+
+    def duplicates(self, threshold=DEFAULT_THRESHOLD) -> List[Dict]:
+        """
+        Every pair of near-duplicate versions with different URLs
+
+        Returns:
+            Pairs (most similar first): a, b (key, url, title, modified), similarity
+        """
+        with self._lock:
+            rows = self._db.execute('SELECT id, key, url, title, modified, signature FROM documents '
+                                    'WHERE signature IS NOT NULL').fetchall()
+            pairs = self._db.execute(
+                'SELECT DISTINCT a.doc_id, b.doc_id FROM buckets a JOIN buckets b '
+                'ON a.band = b.band AND a.bucket = b.bucket AND a.doc_id < b.doc_id').fetchall()
+
+        documents = {row[0]: row[1:] for row in rows}
+        found = []
+        for first, second in pairs:
+            a, b = documents[first], documents[second]
+            if a[1] == b[1]:
+                continue
+            score = similarity(_PACK.unpack(a[4]), _PACK.unpack(b[4]))
+            if score >= threshold:
+                describe = lambda doc: {'key': doc[0], 'url': doc[1], 'title': doc[2], 'modified': doc[3]}
+                found.append({'a': describe(a), 'b': describe(b), 'similarity': round(score, 3)})
+        found.sort(key=lambda pair: pair['similarity'], reverse=True)
+        return found
+
+    def summary(self) -> Dict:
+        """Version, document and fingerprint counts"""
+        with self._lock:
+            versions, urls, fingerprinted = self._db.execute(
+                'SELECT COUNT(*), COUNT(DISTINCT url), COUNT(signature) FROM documents').fetchone()
+        return {'versions': versions, 'documents': urls, 'fingerprinted': fingerprinted,
+                'bytes': os.path.getsize(self.path)}
+
+    def close(self):
+        self._db.close()
+
+
+def _now():
+    return datetime.utcnow().isoformat() + 'Z'
+
+
+def fingerprint_files(index, entries, workers=None):
+    """
+    Extract and fingerprint files in the process pool
+
+    Args:
+        index: SWE3FingerprintIndex
+        entries: Iterable of (path, key, url, title, modified, content_hash)
+        workers: Extraction processes (default: one per CPU)
+
+    Returns:
+        Number of versions added
+    """
+    from swe3_pdf_text import TextExtractionPool
+
+    pool = TextExtractionPool(workers)
+    added = 0
+    try:
+        pending = []
+        for path, key, url, title, modified, content_hash in entries:
+            if content_hash and index.has(key, content_hash):
+                continue
+            pending.append((pool.submit(path, fingerprint_text_timed), key, url, title, modified, content_hash))
+        for future, key, url, title, modified, content_hash in pending:
+            try:
+                _, _, _, sig, count = future.result()
+            except Exception as e:
+                print(f'[FINGERPRINT] {url}: {e}', file=sys.stderr)
+                continue
+            added += index.add(key, sig, url, title, modified, content_hash, count)
+    finally:
+        pool.shutdown()
+    return added
+
+
+def main(argv=None):
+    """Command-line interface"""
+    from swe3_manifest import default_state_dir
+
+    parser = argparse.ArgumentParser(description='Find near-duplicate versions of SWE3 documents')
+    parser.add_argument('--index', default=os.environ.get('SWE3_FINGERPRINTS', default_fingerprint_path(default_state_dir())),
+                        help='Fingerprint index file (env SWE3_FINGERPRINTS)')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Lowest estimated similarity counted as a version (0-1)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    match = commands.add_parser('match', help='Earlier versions of PDF files')
+    match.add_argument('files', nargs='+')
+    match.add_argument('--limit', type=int, default=5)
+
+    blobs = commands.add_parser('index-blobs', help="Fingerprint every version in the pipeline's blob store")
+    blobs.add_argument('--blob-dir', default=os.environ.get('SWE3_BLOB_DIR', os.path.join(default_state_dir(), 'blobs')))
+    blobs.add_argument('--workers', type=int, default=None)
+
+    duplicates = commands.add_parser('duplicates', help='Near-duplicate pairs with different URLs')
+    duplicates.add_argument('--output', choices=('text', 'json'), default='text')
+
+    commands.add_parser('stats', help='Index size')
+    args = parser.parse_args(argv)
+
+    index = SWE3FingerprintIndex(args.index)
+    try:
+        if args.command == 'match':
+            results = []
+            for path in args.files:
+                started = time.perf_counter()
+                text, _, _ = extract_text_timed(path)
+                sig, count = signature(text)
+                found = index.matches(sig, args.threshold, limit=args.limit)
+                results.append({'file': path, 'shingles': count, 'matches': found,
+                                'took_ms': round((time.perf_counter() - started) * 1000, 2)})
+            print(json.dumps(results, indent=2, ensure_ascii=False))
+            return 0 if any(result['matches'] for result in results) else 1
+
+        if args.command == 'index-blobs':
+            from swe3_blob_store import SWE3BlobStore
+            from swe3_link_extractor import title_from_url
+
+            store = SWE3BlobStore(args.blob_dir, max_bytes=0)
+            entries = []
+            for key, digest in store.keys.items():
+                url, _, modified = key.rpartition('@')
+                entries.append((store.path(digest), key, url, title_from_url(url), modified, digest))
+            print(f'[FINGERPRINT] Added {fingerprint_files(index, entries, args.workers)} of {len(entries)} '
+                  f'blob versions', file=sys.stderr)
+            return 0
+
+        if args.command == 'duplicates':
+            pairs = index.duplicates(args.threshold)
+            if args.output == 'json':
+                print(json.dumps(pairs, indent=2, ensure_ascii=False))
+            else:
+                for pair in pairs:
+                    print(f"{pair['similarity']:.3f}  {pair['a']['title']} ({pair['a']['modified']})\n"
+                          f"       {pair['b']['title']} ({pair['b']['modified']})")
+                print(f'{len(pairs)} near-duplicate pairs', file=sys.stderr)
+            return 0
+
+        print(json.dumps(index.summary(), indent=2))
+        return 0
+    finally:
+        index.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+SWE3 HTTP Client
+One shared, pooled requests session for every SWE3/DMS script: keep-alive
+connections per host (so TLS handshakes are paid once per connection, not
+per request), default timeouts, retry with exponential backoff and
+adaptive per-host rate control (see swe3_rate_control). Buffered GETs go
+through a disk HTTP cache (see swe3_http_cache): unchanged REST and HTML
+resources are revalidated with a conditional request instead of being
+downloaded again. SWE3_HTTP_CACHE=off disables it, a path moves it, and
+SWE3_HTTP_CACHE_MB sets its size cap.
+"""
+
+import os
+import threading
+import time
+import weakref
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from swe3_http_cache import DEFAULT_MAX_BYTES, CachingAdapter, SWE3HTTPCache, default_cache_path
+from swe3_rate_control import DEFAULT_MAX_RATE, THROTTLE_STATUSES, RateController
+
+# (connect, read) seconds, used when a call does not pass its own timeout
+DEFAULT_TIMEOUT = (10, 30)
+
+# Connections kept alive per host; raise to match pipeline concurrency
+DEFAULT_POOL_SIZE = 10
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Methods that may be resent after a throttling response
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+# SWE3_HTTP_CACHE values that turn the cache off
+CACHE_OFF = ('off', '0', 'false', 'no')
+
+_session = None
+_cache = None
+_session_lock = threading.Lock()
+
+
+class SWE3Session(requests.Session):
+    """
+    requests.Session that applies DEFAULT_TIMEOUT to every call and, with a
+    RateController, paces each host and retries 429/503 answers itself
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, controller=None, throttle_retries=3, backoff=0.5):
+        super().__init__()
+        self.default_timeout = timeout
+        self.controller = controller
+        self.throttle_retries = throttle_retries
+        self.backoff = backoff
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.default_timeout)
+        if self.controller is None:
+            return super().request(method, url, **kwargs)
+        
+        limiter = self.controller.limiter(url)
+        # Only resend what can be sent again: no uploads, no streamed bodies
+        retryable = method.upper() in IDEMPOTENT_METHODS or (
+            not kwargs.get('files') and isinstance(kwargs.get('data'), (type(None), dict, str, bytes))
+        )
+        attempt = 0
+        while True:
+            limiter.acquire()
+            started = time.monotonic()
+            try:
+                response = super().request(method, url, **kwargs)
+            except Exception:
+                limiter.observe(None, time.monotonic() - started)
+                limiter.done()
+                raise
+            waited = limiter.observe(response.status_code, time.monotonic() - started,
+                                     response.headers.get('Retry-After'))
+            
+            # A 503 may come from the application itself; only resend it when that is harmless
+            if response.status_code not in THROTTLE_STATUSES or attempt >= self.throttle_retries \
+                    or not retryable or (response.status_code == 503 and method.upper() not in IDEMPOTENT_METHODS):
+                if kwargs.get('stream'):
+                    hold_slot(response, limiter)
+                else:
+                    limiter.done()
+                return response
+            
+            response.close()
+            limiter.done()
+            attempt += 1
+            if not waited:
+                # No Retry-After: the limiter already slowed down, add a short backoff
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+
+
+def hold_slot(response, limiter):
+    """
+    Keep a streamed response's concurrency slot until its body has been
+    read to the end or the response is closed (or garbage collected)
+    """
+    lock = threading.Lock()
+    released = []
+
+    def release():
+        with lock:
+            if released:
+                return
+            released.append(True)
+        limiter.done()
+
+    # urllib3 calls release_conn once the body is exhausted; requests calls it on close()
+    release_conn = response.raw.release_conn
+
+    def release_conn_and_slot():
+        try:
+            release_conn()
+        finally:
+            release()
+
+    response.raw.release_conn = release_conn_and_slot
+    weakref.finalize(response, release)
+
+
+def build_retry(retries=3, backoff=0.5, statuses=RETRY_STATUSES, respect_retry_after=True):
+    """
+    Retry policy: connection errors (including resets) for every method,
+    5xx and read errors only for idempotent methods so an upload that may
+    have reached the DMS is never sent twice
+    """
+    return Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=statuses,
+        allowed_methods=IDEMPOTENT_METHODS,
+        respect_retry_after_header=respect_retry_after,
+        raise_on_status=False
+    )
+
+
+def shared_cache():
+    """
+    Process-wide HTTP cache (env SWE3_HTTP_CACHE / SWE3_HTTP_CACHE_MB), or
+    None when it is turned off
+    """
+    global _cache
+    setting = os.environ.get('SWE3_HTTP_CACHE', '').strip()
+    if setting.lower() in CACHE_OFF:
+        return None
+    if _cache is None:
+        from swe3_manifest import default_state_dir
+        
+        max_mb = os.environ.get('SWE3_HTTP_CACHE_MB')
+        _cache = SWE3HTTPCache(setting or default_cache_path(default_state_dir()),
+                               max_bytes=int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES)
+    return _cache
+
+
+def create_session(pool_size=DEFAULT_POOL_SIZE, retries=3, backoff=0.5, timeout=DEFAULT_TIMEOUT,
+                   max_rate=DEFAULT_MAX_RATE, cache=None):
+    """
+    Create a new pooled session
+
+    Args:
+        pool_size: Keep-alive connections per host
+        retries: Retry attempts for failed requests
+        backoff: Exponential backoff factor (seconds)
+        timeout: Default (connect, read) timeout
+        max_rate: Ceiling of the adaptive per-host request rate (req/s); 0 disables rate control
+        cache: SWE3HTTPCache answering buffered GETs (None: no caching)
+    """
+    controller = RateController(max_rate=max_rate, max_concurrency=max(pool_size, 1)) if max_rate else None
+    session = SWE3Session(timeout=timeout, controller=controller, throttle_retries=retries, backoff=backoff)
+    session.headers['User-Agent'] = USER_AGENT
+
+    # With rate control, 429/503 (with or without Retry-After) are handled by
+    # the session rather than urllib3, so the controller sees them
+    if controller:
+        retry = build_retry(retries, backoff, tuple(s for s in RETRY_STATUSES if s not in THROTTLE_STATUSES),
+                            respect_retry_after=False)
+    else:
+        retry = build_retry(retries, backoff)
+    adapter_options = dict(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+    adapter = CachingAdapter(cache, **adapter_options) if cache is not None else HTTPAdapter(**adapter_options)
+    session.cache = cache
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """Process-wide shared session (created on first use)"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session(cache=shared_cache())
+        return _session
+
+
+def configure(pool_size=DEFAULT_POOL_SIZE, retries=3, backoff=0.5, timeout=DEFAULT_TIMEOUT,
+              max_rate=DEFAULT_MAX_RATE, cache=True):
+    """
+    Replace the shared session, e.g. to size the pools for a concurrent run
+
+    Args:
+        cache: Keep using the shared HTTP cache (False: no caching)
+
+    Returns:
+        The new shared session
+    """
+    global _session
+    session = create_session(pool_size, retries, backoff, timeout, max_rate,
+                             cache=shared_cache() if cache else None)
+    with _session_lock:
+        previous, _session = _session, session
+    if previous is not None:
+        previous.close()
+    return session
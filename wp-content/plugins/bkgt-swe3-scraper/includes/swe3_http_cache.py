@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+SWE3 HTTP Cache
+Private, disk-backed HTTP cache (RFC 9111) for the shared swe3_http
+session. It stores the REST JSON and HTML pages the scripts and the
+pipeline fetch again and again (/wp-json/, /wp/v2/pages/..., the media
+listing, the DMS manifest) together with their validators:
+
+- a response that is still fresh (Cache-Control max-age / Expires) is
+  answered from disk without a request
+- a stale one is revalidated with If-None-Match / If-Modified-Since; a 304
+  refreshes the stored headers and the body is served from disk, so an
+  unchanged resource costs a header round-trip instead of a download
+- no-store is never stored, no-cache is always revalidated, Vary is
+  honoured and responses without validators or freshness are not kept
+  (there is no heuristic freshness, so nothing is served stale)
+
+Only buffered GETs are cached; streamed downloads (PDFs, sitemaps) pass
+straight through. Entries live in one SQLite file with a size cap enforced
+by evicting the least recently used.
+"""
+
+import argparse
+import io
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPResponse
+from urllib3._collections import HTTPHeaderDict
+
+CACHE_VERSION = 1
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# A single response larger than this share of the cap is not stored
+MAX_ENTRY_SHARE = 8
+
+# Hop-by-hop and transfer headers (RFC 9111 3.1); bodies are stored decoded,
+# so Content-Encoding/Length describe the wire, not the stored entry
+UNSTORED_HEADERS = frozenset([
+    'connection', 'keep-alive', 'proxy-connection', 'proxy-authenticate', 'te', 'trailer',
+    'transfer-encoding', 'upgrade', 'content-encoding', 'content-length', 'set-cookie',
+])
+
+# Methods that can change the resource at their URL (RFC 9111 4.4)
+SAFE_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'TRACE'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    status INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    headers TEXT NOT NULL,
+    vary TEXT NOT NULL,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    request_time REAL NOT NULL,
+    response_time REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_lru ON responses (accessed_at);
+"""
+
+
+def default_cache_path(state_dir):
+    """HTTP cache location inside the pipeline state directory"""
+    return os.path.join(state_dir, 'http_cache.sqlite3')
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """Cache-Control directives as {name: argument or None}"""
+    directives = {}
+    for part in (value or '').split(','):
+        name, _, argument = part.partition('=')
+        name = name.strip().lower()
+        if name:
+            directives[name] = argument.strip().strip('"') or None
+    return directives
+
+
+def _seconds(value: Optional[str]) -> Optional[int]:
+    """delta-seconds argument, or None when missing or malformed"""
+    try:
+        seconds = int(value)
+    except (TypeError, ValueError):
+        return None
+    return seconds if seconds >= 0 else None
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+class CachedResponse:
+    """One stored response"""
+
+    __slots__ = ('url', 'status', 'reason', 'headers', 'vary', 'body', 'request_time', 'response_time')
+
+    def __init__(self, url, status, reason, headers, vary, body, request_time, response_time):
+        self.url = url
+        self.status = status
+        self.reason = reason
+        # [[name, value], ...] as sent, minus UNSTORED_HEADERS
+        self.headers = headers
+        # {lower-case request header: value} for each name in Vary
+        self.vary = vary
+        self.body = body
+        self.request_time = request_time
+        self.response_time = response_time
+
+    def header(self, name: str) -> Optional[str]:
+        name = name.lower()
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+        return None
+
+    def freshness_lifetime(self) -> float:
+        """Seconds the response is fresh for (RFC 9111 4.2.1); 0 without explicit freshness"""
+        max_age = _seconds(parse_cache_control(self.header('Cache-Control')).get('max-age'))
+        if max_age is not None:
+            return max_age
+        expires = self.header('Expires')
+        if expires is not None:
+            # An invalid Expires (e.g. "0") means already expired
+            expires_at = _http_date(expires)
+            date = _http_date(self.header('Date')) or self.response_time
+            return max(0.0, expires_at - date) if expires_at else 0.0
+        return 0.0
+
+    def age(self, now: Optional[float] = None) -> float:
+        """Current age (RFC 9111 4.2.3)"""
+        now = time.time() if now is None else now
+        date = _http_date(self.header('Date'))
+        apparent_age = max(0.0, self.response_time - date) if date else 0.0
+        response_delay = self.response_time - self.request_time
+        corrected_age = (_seconds(self.header('Age')) or 0) + response_delay
+        return max(apparent_age, corrected_age) + max(0.0, now - self.response_time)
+
+    def has_validators(self) -> bool:
+        return bool(self.header('ETag') or self.header('Last-Modified'))
+
+
+class SWE3HTTPCache:
+    """Size-capped response store; safe to share between threads (and processes, via SQLite)"""
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Initialize cache (the database is opened on first use)
+
+        Args:
+            path: SQLite database file
+            max_bytes: Cap on stored bodies; least recently used entries are evicted
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0, 'stored': 0, 'evicted': 0,
+                      'bypassed': 0, 'errors': 0, 'bytes_saved': 0}
+        self._db = None
+        self._disabled = False
+        self._lock = threading.Lock()
+
+    def count(self, key, amount=1):
+        """Increment a stats counter"""
+        with self._lock:
+            self.stats[key] += amount
+
+    def _connect(self):
+        """Open the database (under self._lock); None if the cache is unusable"""
+        if self._db is None and not self._disabled:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10)
+                db.execute('PRAGMA journal_mode=WAL')
+                db.execute('PRAGMA synchronous=NORMAL')
+                if db.execute('PRAGMA user_version').fetchone()[0] != CACHE_VERSION:
+                    db.execute('DROP TABLE IF EXISTS responses')
+                    db.execute(f'PRAGMA user_version = {CACHE_VERSION}')
+                db.executescript(SCHEMA)
+                self._db = db
+            except (OSError, sqlite3.Error) as e:
+                # A cache that cannot be opened must not break the scripts using it
+                print(f'[CACHE] Disabled: {e}', file=sys.stderr)
+                self._disabled = True
+                self.stats['errors'] += 1
+        return self._db
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        """Stored response for a URL, or None"""
+        with self._lock:
+            db = self._connect()
+            if db is None:
+                return None
+            try:
+                row = db.execute('SELECT status, reason, headers, vary, body, request_time, response_time '
+                                 'FROM responses WHERE url = ?', (url,)).fetchone()
+                if row:
+                    db.execute('UPDATE responses SET accessed_at = ? WHERE url = ?', (time.time(), url))
+            except sqlite3.Error:
+                self.stats['errors'] += 1
+                return None
+        if not row:
+            return None
+        status, reason, headers, vary, body, request_time, response_time = row
+        return CachedResponse(url, status, reason, json.loads(headers), json.loads(vary), bytes(body),
+                              request_time, response_time)
+
+    def put(self, entry: CachedResponse) -> bool:
+        """Store (or replace) an entry, then evict down to max_bytes"""
+        size = len(entry.body)
+        if self.max_bytes and size > self.max_bytes // MAX_ENTRY_SHARE:
+            return False
+        with self._lock:
+            db = self._connect()
+            if db is None:
+                return False
+            try:
+                db.execute('BEGIN IMMEDIATE')
+                db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+                    entry.url, entry.status, entry.reason, json.dumps(entry.headers), json.dumps(entry.vary),
+                    entry.body, size, entry.request_time, entry.response_time, time.time()))
+                if self.max_bytes:
+                    self.stats['evicted'] += self._evict(db)
+                db.execute('COMMIT')
+            except sqlite3.Error:
+                if db.in_transaction:
+                    db.execute('ROLLBACK')
+                self.stats['errors'] += 1
+                return False
+            self.stats['stored'] += 1
+        return True
+
+    def refresh(self, entry: CachedResponse):
+        """Store the headers and timestamps of a revalidated entry (the body is unchanged)"""
+        with self._lock:
+            db = self._connect()
+            if db is None:
+                return
+            try:
+                db.execute('UPDATE responses SET headers = ?, request_time = ?, response_time = ?, accessed_at = ? '
+                           'WHERE url = ?', (json.dumps(entry.headers), entry.request_time, entry.response_time,
+                                             time.time(), entry.url))
+            except sqlite3.Error:
+                self.stats['errors'] += 1
+
+    def _evict(self, db) -> int:
+        total = db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        evicted = []
+        for url, size in db.execute('SELECT url, size FROM responses ORDER BY accessed_at ASC'):
+            if total <= self.max_bytes:
+                break
+            evicted.append((url,))
+            total -= size
+        db.executemany('DELETE FROM responses WHERE url = ?', evicted)
+        return len(evicted)
+
+    def delete(self, url: str):
+        """Drop the entry for a URL (if any)"""
+        with self._lock:
+            db = self._connect()
+            if db is None:
+                return
+            try:
+                db.execute('DELETE FROM responses WHERE url = ?', (url,))
+            except sqlite3.Error:
+                self.stats['errors'] += 1
+
+    def clear(self) -> int:
+        """Drop every entry; returns how many there were"""
+        with self._lock:
+            db = self._connect()
+            if db is None:
+                return 0
+            return db.execute('DELETE FROM responses').rowcount
+
+    def summary(self) -> Dict:
+        """Entry count and stored bytes"""
+        with self._lock:
+            db = self._connect()
+            if db is None:
+                return {'entries': 0, 'bytes': 0, 'max_bytes': self.max_bytes}
+            entries, size = db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        return {'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes}
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class CachingAdapter(HTTPAdapter):
+    """HTTPAdapter answering buffered GETs from an SWE3HTTPCache"""
+
+    def __init__(self, cache: SWE3HTTPCache, **kwargs):
+        """
+        Args:
+            cache: Response store
+            **kwargs: HTTPAdapter arguments (pool sizes, max_retries)
+        """
+        super().__init__(**kwargs)
+        self.cache = cache
+
+    def send(self, request, stream=False, **kwargs):
+        method = request.method.upper()
+        if method not in SAFE_METHODS:
+            response = super().send(request, stream=stream, **kwargs)
+            if response.status_code < 400:
+                self.cache.delete(request.url)
+            return response
+
+        request_cc = parse_cache_control(request.headers.get('Cache-Control'))
+        if method != 'GET' or stream or 'no-store' in request_cc or _has_conditions(request):
+            if method == 'GET':
+                self.cache.count('bypassed')
+            return super().send(request, stream=stream, **kwargs)
+
+        entry = self.cache.get(request.url)
+        if entry is not None and entry.vary != _vary_values(request, entry.header('Vary')):
+            entry = None
+
+        if entry is not None and _is_fresh(entry, request_cc, request.headers.get('Pragma')):
+            self.cache.count('hits')
+            self.cache.count('bytes_saved', len(entry.body))
+            return self._from_cache(request, entry)
+
+        sent = request
+        if entry is not None and entry.has_validators():
+            sent = request.copy()
+            if entry.header('ETag'):
+                sent.headers['If-None-Match'] = entry.header('ETag')
+            if entry.header('Last-Modified'):
+                sent.headers['If-Modified-Since'] = entry.header('Last-Modified')
+
+        request_time = time.time()
+        response = super().send(sent, stream=False, **kwargs)
+        response_time = time.time()
+
+        if response.status_code == 304 and sent is not request:
+            response.close()
+            entry = _refreshed(entry, response.headers, request_time, response_time)
+            self.cache.refresh(entry)
+            self.cache.count('revalidated')
+            self.cache.count('bytes_saved', len(entry.body))
+            return self._from_cache(request, entry)
+
+        self.cache.count('misses')
+        if _is_storable(request, response):
+            self.cache.put(CachedResponse(
+                request.url, response.status_code, response.reason or '', _stored_headers(response.headers),
+                _vary_values(request, response.headers.get('Vary')), response.content,
+                request_time, response_time))
+        elif entry is not None and response.status_code in (200, 404, 410):
+            self.cache.delete(request.url)
+        return response
+
+    def _from_cache(self, request, entry: CachedResponse):
+        """A requests Response replaying a stored entry"""
+        headers = HTTPHeaderDict()
+        for name, value in entry.headers:
+            headers.add(name, value)
+        headers['Content-Length'] = str(len(entry.body))
+        headers['Age'] = str(int(entry.age()))
+        raw = HTTPResponse(body=io.BytesIO(entry.body), headers=headers, status=entry.status,
+                           reason=entry.reason, preload_content=False, decode_content=False,
+                           request_method=request.method)
+        response = self.build_response(request, raw)
+        response.from_cache = True
+        return response
+
+
+def _has_conditions(request) -> bool:
+    """The caller manages validation (or asks for part of the body) itself"""
+    return any(name in request.headers for name in
+               ('If-None-Match', 'If-Modified-Since', 'If-Match', 'If-Unmodified-Since', 'If-Range', 'Range'))
+
+
+def _vary_values(request, vary: Optional[str]) -> Dict[str, str]:
+    names = [name.strip().lower() for name in (vary or '').split(',') if name.strip()]
+    return {name: request.headers.get(name, '') for name in names}
+
+
+def _is_fresh(entry: CachedResponse, request_cc: Dict, pragma: Optional[str]) -> bool:
+    """May be served without contacting the origin (RFC 9111 4.2, 5.2.1)"""
+    response_cc = parse_cache_control(entry.header('Cache-Control'))
+    if 'no-cache' in response_cc or 'no-cache' in request_cc:
+        return False
+    if not request_cc and pragma and 'no-cache' in pragma.lower():
+        return False
+    age = entry.age()
+    max_age = _seconds(request_cc.get('max-age'))
+    if max_age is not None and age > max_age:
+        return False
+    return entry.freshness_lifetime() > age
+
+
+def _is_storable(request, response) -> bool:
+    """RFC 9111 3: a complete 200 the cache may keep and can use again"""
+    if response.status_code != 200:
+        return False
+    response_cc = parse_cache_control(response.headers.get('Cache-Control'))
+    if 'no-store' in response_cc or response.headers.get('Vary', '').strip() == '*':
+        return False
+    if 'Authorization' in request.headers and not {'public', 'must-revalidate', 's-maxage'} & set(response_cc):
+        return False
+    if response.headers.get('ETag') or response.headers.get('Last-Modified'):
+        return True
+    return _seconds(response_cc.get('max-age')) is not None or 'Expires' in response.headers
+
+
+def _stored_headers(headers) -> List[List[str]]:
+    return [[name, value] for name, value in headers.items() if name.lower() not in UNSTORED_HEADERS]
+
+
+def _refreshed(entry: CachedResponse, headers, request_time: float, response_time: float) -> CachedResponse:
+    """Stored entry updated with the headers of a 304 (RFC 9111 4.3.4)"""
+    updates = {name.lower(): (name, value) for name, value in headers.items()
+               if name.lower() not in UNSTORED_HEADERS}
+    merged = [[name, value] for name, value in entry.headers if name.lower() not in updates]
+    merged.extend([name, value] for name, value in updates.values())
+    return CachedResponse(entry.url, entry.status, entry.reason, merged, entry.vary, entry.body,
+                          request_time, response_time)
+
+
+def main(argv=None):
+    """Command-line interface"""
+    from swe3_manifest import default_state_dir
+
+    parser = argparse.ArgumentParser(description='Inspect or clear the SWE3 HTTP cache')
+    parser.add_argument('--cache', default=os.environ.get('SWE3_HTTP_CACHE') or default_cache_path(default_state_dir()),
+                        help='Cache file (env SWE3_HTTP_CACHE)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('stats', help='Entry count and size')
+    commands.add_parser('clear', help='Drop every entry')
+    args = parser.parse_args(argv)
+
+    cache = SWE3HTTPCache(args.cache)
+    try:
+        if args.command == 'clear':
+            print(f'[CACHE] Dropped {cache.clear()} entries', file=sys.stderr)
+            return 0
+        print(json.dumps(cache.summary(), indent=2))
+        return 0
+    finally:
+        cache.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
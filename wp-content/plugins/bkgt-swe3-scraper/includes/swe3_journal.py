@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+SWE3 Run Journal
+Append-only SQLite log of every document's state transitions during a
+pipeline run (listed, downloaded, uploaded, skipped, failed), so a run that
+is killed part way through can be resumed instead of started over.
+
+Events are buffered and written in batches (one transaction per batch) by
+whichever thread fills the buffer, or by a background flusher, so journal
+writes never sit on the per-document hot path. A crash loses at most the
+last flush interval of events; those documents are simply redone.
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    status TEXT NOT NULL,
+    listing_complete INTEGER NOT NULL DEFAULT 0,
+    resumes INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    url TEXT NOT NULL,
+    state TEXT NOT NULL,
+    at REAL NOT NULL,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS events_run_url ON events (run_id, url);
+'''
+
+# Document states; DONE_STATES need no more work when a run is resumed
+LISTED = 'listed'
+DOWNLOADED = 'downloaded'
+UPLOADED = 'uploaded'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+DONE_STATES = (UPLOADED, SKIPPED)
+
+# Run statuses; anything but 'completed' can be resumed
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED_RUN = 'failed'
+INTERRUPTED = 'interrupted'
+
+# Finished runs kept in the journal (with their events)
+KEEP_RUNS = 20
+
+
+def default_journal_path(state_dir):
+    """Journal location inside the pipeline state directory"""
+    return os.path.join(state_dir, 'journal.sqlite3')
+
+
+class SWE3RunJournal:
+    """Batched, append-only record of one pipeline run"""
+
+    def __init__(self, path, batch_size=200, flush_interval=1.0):
+        """
+        Open (or create) the journal
+
+        Args:
+            path: SQLite database file
+            batch_size: Buffered events that trigger a write
+            flush_interval: Seconds between background flushes
+        """
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.run_id = None
+        # url -> latest state/detail of the run being resumed (empty for a new run)
+        self.previous: Dict[str, Dict] = {}
+        self.listing_complete = False
+        self.stats = {'events': 0, 'flushes': 0}
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+        self._buffer = []
+        self._buffer_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher = None
+
+    def begin(self, resume=False):
+        """
+        Start a new run, or reopen the latest unfinished one
+
+        Args:
+            resume: Continue the most recent run that did not complete
+
+        Returns:
+            True if an earlier run is being resumed
+        """
+        row = None
+        if resume:
+            row = self._db.execute(
+                'SELECT id, listing_complete, status FROM runs ORDER BY id DESC LIMIT 1'
+            ).fetchone()
+            if row and row[2] == COMPLETED:
+                row = None
+
+        with self._db_lock:
+            if row:
+                self.run_id, listing_complete, _ = row
+                self.listing_complete = bool(listing_complete)
+                self._db.execute('UPDATE runs SET status = ?, finished_at = NULL, resumes = resumes + 1 WHERE id = ?',
+                                 (RUNNING, self.run_id))
+                self.previous = self._load_states(self.run_id)
+            else:
+                cursor = self._db.execute('INSERT INTO runs (started_at, status) VALUES (?, ?)',
+                                          (_now(), RUNNING))
+                self.run_id = cursor.lastrowid
+                self._prune()
+
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+        return row is not None
+
+    def _load_states(self, run_id):
+        """Latest state per URL, plus failure count and the listed metadata"""
+        states = {}
+        for url, state, detail in self._db.execute(
+            'SELECT url, state, detail FROM events WHERE run_id = ? ORDER BY id', (run_id,)
+        ):
+            entry = states.setdefault(url, {'state': None, 'detail': {}, 'attempts': 0, 'metadata': None})
+            detail = json.loads(detail) if detail else {}
+            entry['state'] = state
+            entry['detail'] = detail
+            if state == LISTED:
+                entry['metadata'] = detail
+            elif state == FAILED:
+                entry['attempts'] += 1
+        return states
+
+    def _prune(self):
+        """Drop events of all but the newest KEEP_RUNS runs"""
+        self._db.execute('DELETE FROM events WHERE run_id IN '
+                         '(SELECT id FROM runs ORDER BY id DESC LIMIT -1 OFFSET ?)', (KEEP_RUNS,))
+        self._db.execute('DELETE FROM runs WHERE id IN '
+                         '(SELECT id FROM runs ORDER BY id DESC LIMIT -1 OFFSET ?)', (KEEP_RUNS,))
+
+    def listed_documents(self) -> List[Dict]:
+        """Metadata of every document the resumed run had listed"""
+        return [entry['metadata'] for entry in self.previous.values() if entry['metadata']]
+
+    def is_done(self, url) -> bool:
+        """True if the resumed run already finished this document"""
+        entry = self.previous.get(url)
+        return bool(entry) and entry['state'] in DONE_STATES
+
+    def last_failure(self, url) -> Optional[Dict]:
+        """Detail of the last failure (plus 'attempts') if the resumed run failed this document"""
+        entry = self.previous.get(url)
+        if not entry or entry['state'] != FAILED:
+            return None
+        return dict(entry['detail'], attempts=entry['attempts'])
+
+    def record(self, url, state, detail=None):
+        """Queue a state transition (detail: JSON-able dict); written with the next batch"""
+        event = (self.run_id, url, state, time.time(), json.dumps(detail, ensure_ascii=False) if detail else None)
+        with self._buffer_lock:
+            self._buffer.append(event)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            self.flush()
+
+    def record_listing(self, documents):
+        """Record the whole listing, then mark it complete so a resume can skip listing"""
+        for doc in documents:
+            self.record(doc['url'], LISTED, doc)
+        self.flush()
+        with self._db_lock:
+            self._db.execute('UPDATE runs SET listing_complete = 1 WHERE id = ?', (self.run_id,))
+        self.listing_complete = True
+
+    def flush(self):
+        """Write buffered events in one transaction"""
+        with self._buffer_lock:
+            events, self._buffer = self._buffer, []
+        if not events:
+            return
+        with self._db_lock:
+            self._db.execute('BEGIN')
+            self._db.executemany('INSERT INTO events (run_id, url, state, at, detail) VALUES (?, ?, ?, ?, ?)', events)
+            self._db.execute('COMMIT')
+            self.stats['events'] += len(events)
+            self.stats['flushes'] += 1
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                print(f"[JOURNAL] Flush failed: {e}", file=sys.stderr)
+
+    def finish(self, status):
+        """Flush, close the run with a status and stop the background flusher"""
+        self._stop.set()
+        if self._flusher:
+            self._flusher.join()
+        self.flush()
+        with self._db_lock:
+            self._db.execute('UPDATE runs SET status = ?, finished_at = ? WHERE id = ?', (status, _now(), self.run_id))
+
+    def close(self):
+        self._db.close()
+
+
+def _now():
+    return datetime.utcnow().isoformat() + 'Z'
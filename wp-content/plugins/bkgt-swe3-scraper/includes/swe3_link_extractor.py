@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+SWE3 Link Extractor
+Single-pass, incremental tokenizer that collects PDF/document links from
+HTML. It can be fed bytes as they arrive off the network, resolves relative
+URLs against the page (or its <base href>), captures anchor text across
+nested elements and dedupes with a dict instead of rescanning the results.
+
+Only tags and comments are tokenized; everything between them is text that
+is kept while a document anchor is open and skipped otherwise.
+"""
+
+import codecs
+import html
+import re
+import urllib.parse
+from typing import Dict, List, Optional
+
+# A comment, or a start/end tag: (slash, name, attributes)
+TOKEN_PATTERN = re.compile(r'<!--.*?-->|<(/?)([a-zA-Z][^\s/>]*)([^>]*)>', re.DOTALL)
+
+ATTR_PATTERN = re.compile(r'''([^\s=/>]+)\s*=\s*("[^"]*"|'[^']*'|[^\s>]+)''')
+
+WHITESPACE = re.compile(r'\s+')
+
+# An unterminated '<' carried over longer than this is treated as text
+MAX_PENDING_CHARS = 64 * 1024
+
+
+def is_document_url(url: str) -> bool:
+    """PDFs, plus download/document links (same rule as the old regex pass)"""
+    lowered = url.lower()
+    path = urllib.parse.urlparse(lowered).path
+    return path.endswith('.pdf') or 'download' in lowered or 'document' in lowered
+
+
+def title_from_url(url: str) -> str:
+    """Human-readable title from a URL's filename"""
+    filename = urllib.parse.urlparse(url).path.split('/')[-1]
+    title = urllib.parse.unquote(filename)
+    if '.' in title:
+        title = title.rsplit('.', 1)[0]
+    return title or 'Document'
+
+
+class PDFLinkExtractor:
+    """Incremental extractor; call feed()/feed_bytes() any number of times, then close()"""
+
+    def __init__(self, base_url: str = '', encoding: str = 'utf-8'):
+        self.base_url = base_url
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        # Unconsumed input: a tag or comment split across chunks
+        self._pending = ''
+        # url -> document, in discovery order
+        self._documents: Dict[str, Dict[str, str]] = {}
+        # Document anchor currently open and the text seen inside it
+        self._anchor_url: Optional[str] = None
+        self._anchor_text: List[str] = []
+
+    def feed_bytes(self, chunk: bytes):
+        """Feed raw bytes; multi-byte characters split across chunks are handled"""
+        self.feed(self._decoder.decode(chunk))
+
+    def feed(self, data: str):
+        """Feed decoded text"""
+        buffer = self._pending + data
+        # Tags inside a comment that has not closed yet must not be tokenized
+        limit = len(buffer)
+        comment = buffer.rfind('<!--')
+        if comment != -1 and buffer.find('-->', comment + 4) == -1 \
+                and len(buffer) - comment <= MAX_PENDING_CHARS:
+            limit = comment
+
+        end = 0
+        for match in TOKEN_PATTERN.finditer(buffer, 0, limit):
+            if self._anchor_url and match.start() > end:
+                self._anchor_text.append(buffer[end:match.start()])
+            end = match.end()
+            if match.group(2):
+                self._handle_tag(match.group(2).lower(), match.group(1), match.group(3))
+
+        # Hold back a trailing tag that may be completed by the next chunk
+        cut = buffer.find('<', end, limit + 1)
+        if cut == -1 or len(buffer) - cut > MAX_PENDING_CHARS:
+            cut = len(buffer)
+        if self._anchor_url and cut > end:
+            self._anchor_text.append(buffer[end:cut])
+        self._pending = buffer[cut:]
+
+    def close(self):
+        """Flush buffered input"""
+        self.feed(self._decoder.decode(b'', final=True))
+        if self._anchor_url and self._pending:
+            self._anchor_text.append(self._pending)
+        self._pending = ''
+        self._finish_anchor()
+
+    @property
+    def documents(self) -> List[Dict[str, str]]:
+        """Documents found so far, as dicts with 'url' and 'title'"""
+        return list(self._documents.values())
+
+    def _handle_tag(self, tag: str, closing: str, attrs: str):
+        if tag == 'a':
+            # </a> ends the anchor, and browsers close an open <a> when a new one starts
+            self._finish_anchor()
+            if closing:
+                return
+            href = self._href(attrs)
+            if href and not href.startswith(('#', 'javascript:', 'mailto:')):
+                url = self._resolve(href)
+                if is_document_url(url):
+                    self._anchor_url = url
+                    if attrs.rstrip().endswith('/'):
+                        self._finish_anchor()
+            return
+
+        if closing or 'href' not in attrs.lower():
+            return
+        href = self._href(attrs)
+        if not href:
+            return
+        if tag == 'base':
+            self.base_url = self._resolve(href)
+        elif href.lower().split('?')[0].endswith('.pdf'):
+            self._add(self._resolve(href))
+
+    def _href(self, attrs: str) -> Optional[str]:
+        for name, value in ATTR_PATTERN.findall(attrs):
+            if name.lower() == 'href':
+                if value[:1] in ('"', "'"):
+                    value = value[1:-1]
+                return html.unescape(value).strip()
+        return None
+
+    def _resolve(self, href: str) -> str:
+        return urllib.parse.urljoin(self.base_url, href)
+
+    def _add(self, url: str, title: str = ''):
+        existing = self._documents.get(url)
+        if existing is None:
+            self._documents[url] = {'url': url, 'title': title or title_from_url(url)}
+        elif title and existing['title'] == title_from_url(url):
+            # A real anchor text beats a title guessed from the filename
+            existing['title'] = title
+
+    def _finish_anchor(self):
+        if self._anchor_url:
+            text = WHITESPACE.sub(' ', html.unescape(''.join(self._anchor_text))).strip()
+            self._add(self._anchor_url, text)
+        self._anchor_url = None
+        self._anchor_text = []
+
+
+def extract_pdf_links(html_text: str, base_url: str = '') -> List[Dict[str, str]]:
+    """Extract document links from a complete HTML string"""
+    extractor = PDFLinkExtractor(base_url)
+    extractor.feed(html_text)
+    extractor.close()
+    return extractor.documents
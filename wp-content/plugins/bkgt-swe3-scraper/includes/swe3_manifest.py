@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+SWE3 Sync Manifest
+Remembers what the pipeline has already synced, keyed by SWE3 media id,
+so the next run only lists, downloads and uploads what changed
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+MANIFEST_VERSION = 1
+
+
+def default_state_dir():
+    """Directory for pipeline state (manifest, caches)"""
+    return os.environ.get(
+        'SWE3_STATE_DIR',
+        os.path.join(os.path.expanduser('~'), '.cache', 'bkgt-swe3')
+    )
+
+
+class SWE3Manifest:
+    """Per-document record of the last successful sync"""
+
+    def __init__(self, path):
+        self.path = path
+        self.documents = {}
+        # Listing cut-off for modified_after; only advanced past work that succeeded
+        self.watermark = None
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Load manifest from disk (missing or corrupt file = empty manifest)"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if data.get('version') != MANIFEST_VERSION:
+            return
+
+        self.documents = data.get('documents', {})
+        self.watermark = data.get('watermark')
+
+    def save(self):
+        """Write manifest atomically"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+
+        with self._lock:
+            data = {
+                'version': MANIFEST_VERSION,
+                'watermark': self.watermark,
+                'saved_at': datetime.utcnow().isoformat() + 'Z',
+                'documents': self.documents
+            }
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+
+        os.replace(tmp_path, self.path)
+
+    def is_changed(self, doc):
+        """True if the listed document is new or differs from the last sync"""
+        entry = self.documents.get(str(doc['id']))
+        if not entry:
+            return True
+        return entry.get('modified') != doc.get('modified') or entry.get('source_url') != doc.get('url')
+
+    def record(self, doc, size, content_hash):
+        """Remember a successfully synced document"""
+        with self._lock:
+            self.documents[str(doc['id'])] = {
+                'modified': doc.get('modified'),
+                'source_url': doc.get('url'),
+                'title': doc.get('title'),
+                'size': size,
+                'hash': content_hash,
+                'synced_at': datetime.utcnow().isoformat() + 'Z'
+            }
+
+    def removed(self, current_ids):
+        """Manifest entries whose media id is no longer listed upstream"""
+        current = {str(media_id) for media_id in current_ids}
+        return [
+            dict(entry, id=int(media_id) if media_id.isdigit() else media_id)
+            for media_id, entry in self.documents.items()
+            if media_id not in current
+        ]
+
+    def forget(self, media_ids):
+        """Drop entries (after they have been reported as removed)"""
+        with self._lock:
+            for media_id in media_ids:
+                self.documents.pop(str(media_id), None)
+
+    def advance_watermark(self, listed, failed):
+        """
+        Move the modified_after cut-off forward
+
+        Args:
+            listed: documents returned by this run's listing
+            failed: documents from that listing that did not sync
+        """
+        if failed:
+            # Stop just before the oldest failure so it is listed again next run
+            failed_modified = [doc['modified'] for doc in failed if doc.get('modified')]
+            if failed_modified:
+                self.watermark = _shift_timestamp(min(failed_modified), seconds=-1)
+            return
+
+        modified = [doc['modified'] for doc in listed if doc.get('modified')]
+        if modified:
+            self.watermark = max([self.watermark or ''] + modified)
+
+
+def _shift_timestamp(value, seconds):
+    """Shift a WordPress ISO timestamp ('2025-03-01T10:00:00') by some seconds"""
+    try:
+        moved = datetime.fromisoformat(value) + timedelta(seconds=seconds)
+    except ValueError:
+        return None
+    return moved.isoformat()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+SWE3 Media Library Client
+Lists PDFs from the SWE3 WordPress media library. Filtering happens on the
+server (mime_type=application/pdf) and only the fields we use are requested
+(_fields=...), so each page is a fraction of a full media object dump.
+Pages after the first are fetched concurrently and yielded in order.
+"""
+
+import html
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urlencode
+
+from swe3_http import get_session
+
+# Overridable so runs and benchmarks can point at a mirror or a local fake
+SWE3_BASE_URL = os.environ.get('SWE3_BASE_URL', 'https://amerikanskfotboll.swe3.se')
+
+PDF_MIME_TYPE = 'application/pdf'
+
+# Everything the scripts read from a media object
+MEDIA_FIELDS = 'id,title,slug,source_url,mime_type,date,modified,media_details.filesize'
+
+# Safety limit on media library pages
+MAX_MEDIA_PAGES = 100
+
+
+@dataclass
+class SWE3MediaItem:
+    """One PDF in the SWE3 media library"""
+    id: int
+    title: str
+    url: str
+    date: str
+    modified: str
+    size: int
+    slug: str = ''
+    mime_type: str = PDF_MIME_TYPE
+
+    @classmethod
+    def from_api(cls, item: Dict) -> 'SWE3MediaItem':
+        """Build from a (projected) REST API media object"""
+        title = item.get('title', {})
+        if isinstance(title, dict):
+            title = title.get('rendered', '')
+        title = html.unescape(title or '')
+        if not title:
+            title = item.get('slug') or f"doc_{item.get('id')}"
+
+        return cls(
+            id=item.get('id'),
+            title=title,
+            url=item.get('source_url', ''),
+            date=item.get('date') or '',
+            modified=item.get('modified') or '',
+            size=(item.get('media_details') or {}).get('filesize', 0) or 0,
+            slug=item.get('slug') or '',
+            mime_type=item.get('mime_type') or PDF_MIME_TYPE
+        )
+
+    def to_dict(self) -> Dict:
+        """Plain dict in the shape the scripts have always emitted"""
+        return asdict(self)
+
+
+class SWE3MediaClient:
+    """Paginated, projected, server-filtered media library listing"""
+
+    def __init__(self, base_url: str = SWE3_BASE_URL, session=None, per_page: int = 100,
+                 workers: int = 8, max_pages: int = MAX_MEDIA_PAGES, timeout: int = 15, metrics=None,
+                 events=None):
+        """
+        Initialize client
+
+        Args:
+            base_url: WordPress site URL
+            session: requests session (defaults to the shared swe3_http one)
+            per_page: Items per page (WordPress caps this at 100)
+            workers: Concurrent page fetches after page 1
+            max_pages: Safety limit on pages
+            timeout: Per-request timeout (seconds)
+            metrics: Optional SWE3Metrics receiving list_page and parse timings
+            events: Optional swe3_metrics.EventLog for page errors (default: stderr text)
+        """
+        self.api_url = f'{base_url.rstrip("/")}/wp-json/wp/v2/media'
+        self.session = session or get_session()
+        self.per_page = per_page
+        self.workers = max(1, workers)
+        self.max_pages = max_pages
+        self.timeout = timeout
+        # X-WP-Total of the last listing
+        self.total_items = None
+        # False once a page of the last listing failed (the listing is missing items)
+        self.listing_complete = True
+        self.stats = {'requests': 0, 'errors': 0, 'bytes': 0, 'seconds': 0.0, 'items': 0}
+        self.metrics = metrics
+        self.events = events
+        self._stats_lock = threading.Lock()
+
+    def fetch_page(self, page: int, params: Optional[Dict] = None) -> Tuple[Optional[List[Dict]], Optional[int]]:
+        """
+        Fetch one media library page
+
+        Returns:
+            (items, total_pages); items is None when the page failed, [] for
+            a page past the end, and total_pages is None when the server
+            sent no X-WP-TotalPages
+        """
+        query = dict(params or {}, per_page=self.per_page, page=page)
+        url = f'{self.api_url}?{urlencode(query)}'
+        started = time.perf_counter()
+
+        try:
+            response = self.session.get(url, timeout=self.timeout)
+            body = response.content
+        except Exception as e:
+            self._record(time.perf_counter() - started, 0, error=True)
+            self._warn(page, str(e))
+            return None, None
+
+        self._record(time.perf_counter() - started, len(body), error=response.status_code != 200)
+
+        if response.status_code != 200:
+            # WordPress answers 400 for a page past the end
+            if response.status_code == 400:
+                return [], None
+            self._warn(page, f'HTTP {response.status_code}')
+            return None, None
+
+        if page == 1 and response.headers.get('X-WP-Total'):
+            self.total_items = int(response.headers['X-WP-Total'])
+        total_pages = response.headers.get('X-WP-TotalPages')
+
+        started = time.perf_counter()
+        try:
+            items = response.json()
+        except ValueError:
+            if self.metrics:
+                self.metrics.observe('parse', time.perf_counter() - started, len(body), 'error')
+            return None, None
+        if self.metrics:
+            self.metrics.observe('parse', time.perf_counter() - started, len(body))
+        with self._stats_lock:
+            self.stats['items'] += len(items)
+        return items, int(total_pages) if total_pages else None
+
+    def _warn(self, page: int, message: str):
+        if self.events:
+            self.events.emit('media', f'Page {page}: {message}', 'warning', page=page)
+        else:
+            print(f'[MEDIA] Page {page}: {message}', file=sys.stderr)
+
+    def _record(self, seconds: float, size: int, error: bool = False):
+        """Update transfer counters"""
+        if self.metrics:
+            self.metrics.observe('list_page', seconds, size, 'error' if error else 'ok')
+        with self._stats_lock:
+            self.stats['requests'] += 1
+            self.stats['bytes'] += size
+            self.stats['seconds'] += seconds
+            if error:
+                self.stats['errors'] += 1
+
+    def iter_pages(self, params: Optional[Dict] = None) -> Iterator[List[Dict]]:
+        """
+        Yield raw media pages in page order
+
+        Page 1 reports X-WP-TotalPages; the rest are fetched concurrently and
+        each is yielded as soon as it and every page before it are in.
+        Raises RuntimeError if page 1 cannot be fetched; a later page that
+        fails is skipped and clears listing_complete, so callers that act on
+        what is missing from a listing (removals, watermarks) can tell.
+        """
+        self.listing_complete = True
+        first_page, total_pages = self.fetch_page(1, params)
+        if first_page is None:
+            raise RuntimeError(f'Could not fetch {self.api_url}')
+        if not first_page:
+            return
+        yield first_page
+
+        if total_pages is None:
+            # No pagination headers (proxy stripped them?) - walk pages until empty
+            page = 2
+            while page <= self.max_pages:
+                items, _ = self.fetch_page(page, params)
+                if items is None:
+                    self.listing_complete = False
+                if not items:
+                    return
+                yield items
+                if len(items) < self.per_page:
+                    return
+                page += 1
+            return
+
+        last_page = min(total_pages, self.max_pages)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.fetch_page, page, params) for page in range(2, last_page + 1)]
+            for future in futures:
+                items, _ = future.result()
+                if items is None:
+                    self.listing_complete = False
+                if items:
+                    yield items
+
+    def iter_documents(self, modified_after: Optional[str] = None,
+                       fields: str = MEDIA_FIELDS) -> Iterator[SWE3MediaItem]:
+        """
+        Yield every PDF in the media library
+
+        Args:
+            modified_after: Only items modified after this timestamp
+            fields: _fields projection sent to the server
+        """
+        params = {'mime_type': PDF_MIME_TYPE, '_fields': fields}
+        if modified_after:
+            params['modified_after'] = modified_after
+
+        for items in self.iter_pages(params):
+            for item in items:
+                # Server already filters; guard against plugins that ignore mime_type
+                if item.get('mime_type', PDF_MIME_TYPE) != PDF_MIME_TYPE:
+                    continue
+                yield SWE3MediaItem.from_api(item)
+
+    def media_ids(self) -> Set[int]:
+        """
+        Ids of every PDF (cheapest possible listing, used to spot removals)
+
+        Raises RuntimeError unless every page was fetched: a missing page
+        would make its items look removed.
+        """
+        ids = set()
+        for items in self.iter_pages({'mime_type': PDF_MIME_TYPE, '_fields': 'id,mime_type'}):
+            ids.update(item.get('id') for item in items if item.get('mime_type', PDF_MIME_TYPE) == PDF_MIME_TYPE)
+        if not self.listing_complete:
+            raise RuntimeError(f'Incomplete media id listing from {self.api_url}')
+        return ids
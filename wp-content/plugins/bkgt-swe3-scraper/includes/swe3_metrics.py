@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+SWE3 Metrics and Event Log
+Per-stage counters, byte totals and latency histograms for the pipeline
+(list_page, parse, download, upload, upload_batch, stream), exported as a
+Prometheus textfile (for node_exporter's textfile collector) or a JSON
+summary, plus a structured event log: one NDJSON record per event on
+stderr, or the familiar "[STAGE] message" lines with --log-format text.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+# Histogram bucket upper bounds (seconds), Prometheus-style cumulative
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LOG_FORMATS = ('ndjson', 'text')
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        # One slot per bucket plus +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None if empty or beyond the last bucket)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+
+class SWE3Metrics:
+    """Thread-safe registry of per-stage metrics"""
+
+    def __init__(self, prefix='swe3_pipeline'):
+        self.prefix = prefix
+        self.started = time.time()
+        # stage -> outcome -> count
+        self.outcomes: Dict[str, Dict[str, int]] = {}
+        self.bytes: Dict[str, int] = {}
+        self.latency: Dict[str, Histogram] = {}
+        # Free-form gauges (documents fetched, uploaded, ... at the end of a run)
+        self.gauges: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, size: int = 0, outcome: str = 'ok'):
+        """
+        Record one operation of a stage
+
+        Args:
+            stage: Stage name (list_page, parse, download, upload, ...)
+            seconds: How long it took
+            size: Bytes moved
+            outcome: ok, error, cached, ...
+        """
+        with self._lock:
+            outcomes = self.outcomes.setdefault(stage, {})
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            self.bytes[stage] = self.bytes.get(stage, 0) + size
+            histogram = self.latency.get(stage)
+            if histogram is None:
+                histogram = self.latency[stage] = Histogram()
+            histogram.observe(seconds)
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self.gauges[name] = value
+
+    def to_dict(self) -> Dict:
+        """JSON summary: per stage outcomes, bytes and latency (mean, p50/p95/p99 bucket bounds)"""
+        with self._lock:
+            stages = {}
+            for stage, histogram in self.latency.items():
+                stages[stage] = {
+                    'count': histogram.count,
+                    'outcomes': dict(self.outcomes.get(stage, {})),
+                    'bytes': self.bytes.get(stage, 0),
+                    'seconds': round(histogram.sum, 4),
+                    'mean_ms': round(histogram.sum / histogram.count * 1000, 1) if histogram.count else None,
+                    'p50_ms': _ms(histogram.quantile(0.5)),
+                    'p95_ms': _ms(histogram.quantile(0.95)),
+                    'p99_ms': _ms(histogram.quantile(0.99)),
+                }
+            return {'elapsed_seconds': round(time.time() - self.started, 3), 'stages': stages,
+                    'gauges': dict(self.gauges)}
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        p = self.prefix
+        lines = [
+            f'# HELP {p}_stage_operations_total Operations per pipeline stage and outcome',
+            f'# TYPE {p}_stage_operations_total counter',
+        ]
+        with self._lock:
+            for stage, outcomes in sorted(self.outcomes.items()):
+                for outcome, count in sorted(outcomes.items()):
+                    lines.append(f'{p}_stage_operations_total{{stage="{stage}",outcome="{outcome}"}} {count}')
+
+            lines += [f'# HELP {p}_stage_bytes_total Bytes moved per pipeline stage',
+                      f'# TYPE {p}_stage_bytes_total counter']
+            for stage, size in sorted(self.bytes.items()):
+                lines.append(f'{p}_stage_bytes_total{{stage="{stage}"}} {size}')
+
+            lines += [f'# HELP {p}_stage_seconds Latency per pipeline stage',
+                      f'# TYPE {p}_stage_seconds histogram']
+            for stage, histogram in sorted(self.latency.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{p}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+
+            for name, value in sorted(self.gauges.items()):
+                lines += [f'# TYPE {p}_{name} gauge', f'{p}_{name} {value}']
+
+        lines += [f'# TYPE {p}_last_run_timestamp_seconds gauge',
+                  f'{p}_last_run_timestamp_seconds {time.time():.0f}']
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str):
+        """Write the Prometheus textfile atomically (the collector must never see half a file)"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+
+class Timer:
+    """Context manager measuring one stage operation; set .size/.outcome inside"""
+
+    def __init__(self, metrics: Optional[SWE3Metrics], stage: str):
+        self.metrics = metrics
+        self.stage = stage
+        self.size = 0
+        self.outcome = 'ok'
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self.started
+        if exc_type is not None:
+            self.outcome = 'error'
+        if self.metrics:
+            self.metrics.observe(self.stage, self.seconds, self.size, self.outcome)
+        return False
+
+
+class EventLog:
+    """Structured event log (NDJSON or "[STAGE] message" text), one line per event"""
+
+    def __init__(self, stream=None, log_format='ndjson'):
+        if log_format not in LOG_FORMATS:
+            raise ValueError(f'Unknown log format {log_format!r}')
+        self.stream = stream or sys.stderr
+        self.log_format = log_format
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, message: str = '', level: str = 'info', **fields):
+        """
+        Log one event
+
+        Args:
+            event: Stage or event name (download, upload, sync, ...)
+            message: Human-readable text (the whole line in text format)
+            level: info, warning or error
+            fields: Structured data (url, title, bytes, seconds, outcome, ...)
+        """
+        if self.log_format == 'text':
+            line = f'[{event.upper()}] {message}'
+        else:
+            record = {'ts': datetime.utcnow().isoformat() + 'Z', 'level': level, 'event': event}
+            if message:
+                record['msg'] = message
+            record.update(fields)
+            line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
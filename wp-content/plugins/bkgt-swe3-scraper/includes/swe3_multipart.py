@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+SWE3 Streaming Multipart Body
+Builds a multipart/form-data request body lazily from an iterator of file
+chunks, hashing the bytes as they pass through. Passed to requests as
+`data=`, the body goes out with chunked transfer encoding, so a document
+can be piped from one HTTP response into an upload without touching disk.
+"""
+
+import hashlib
+import uuid
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class StreamingMultipartBody:
+    """Iterable multipart body; file hashes are appended as trailing fields"""
+
+    def __init__(self, fields, chunks, filename, file_field='file', content_type='application/pdf'):
+        """
+        Initialize body
+
+        Args:
+            fields: Form fields sent before the file
+            chunks: Iterator of file bytes
+            filename: Filename reported for the file part
+            file_field: Form field name of the file part
+            content_type: MIME type of the file part
+        """
+        self.fields = fields
+        self.chunks = chunks
+        self.filename = filename
+        self.file_field = file_field
+        self.file_content_type = content_type
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={self.boundary}'
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.complete = False
+
+    def _field(self, name, value):
+        """Encode one simple form field"""
+        return (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+            f'{value}\r\n'
+        ).encode('utf-8')
+
+    def __iter__(self):
+        for name, value in self.fields.items():
+            yield self._field(name, value)
+
+        filename = self.filename.replace('"', '')
+        yield (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{self.file_field}"; filename="{filename}"\r\n'
+            f'Content-Type: {self.file_content_type}\r\n\r\n'
+        ).encode('utf-8')
+
+        for chunk in self.chunks:
+            if not chunk:
+                continue
+            self.md5.update(chunk)
+            self.sha256.update(chunk)
+            self.size += len(chunk)
+            yield chunk
+
+        # Hashes are only known once the file has streamed past, so they
+        # follow the file part; PHP populates $_POST regardless of order
+        yield b'\r\n'
+        yield self._field('file_hash', self.md5.hexdigest())
+        yield self._field('file_sha256', self.sha256.hexdigest())
+        yield self._field('streamed_size', self.size)
+        yield f'--{self.boundary}--\r\n'.encode('utf-8')
+        self.complete = True
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+SWE3 Script Output
+Shared --output handling for the document listing scripts.
+
+- json (default): one JSON object on stdout when the run is over, as the
+  scripts have always printed
+- ndjson: one record per line on stdout as soon as each document is
+  parsed, then a final summary record, so a consumer can start on the
+  first document while the rest of the library is still being fetched:
+
+    {"type": "document", "document": {...}}
+    {"type": "error", "page": "...", "error": "..."}
+    {"type": "summary", "success": true, "count": 123, ...}
+
+Human-readable progress goes to stderr in both modes, so stdout is always
+machine-readable.
+"""
+
+import json
+import os
+import sys
+from typing import Dict, Optional
+
+OUTPUT_FORMATS = ('json', 'ndjson')
+
+
+def add_output_argument(parser):
+    """Add --output to a script's argument parser (env SWE3_OUTPUT)"""
+    parser.add_argument('--output', choices=OUTPUT_FORMATS, default=os.environ.get('SWE3_OUTPUT', 'json'),
+                        help='json: one object when done; ndjson: one document per line as found, '
+                             'then a summary record (env SWE3_OUTPUT)')
+
+
+class NDJSONWriter:
+    """Writes NDJSON records, flushing each line so readers see it immediately"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.count = 0
+        self.errors = 0
+
+    def _write(self, record: Dict):
+        self.stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.stream.flush()
+
+    def document(self, document: Dict, **fields):
+        """One document record (fields: extra record-level keys such as the page it came from)"""
+        self._write(dict({'type': 'document'}, **fields, document=document))
+        self.count += 1
+
+    def error(self, error: str, **fields):
+        """A failure that did not end the run (one page of several, ...)"""
+        self._write(dict({'type': 'error'}, **fields, error=error))
+        self.errors += 1
+
+    def summary(self, success: bool, error: Optional[str] = None, **fields):
+        """Final record; 'count' is the number of documents written"""
+        record = {'type': 'summary', 'success': success, 'count': self.count}
+        if error:
+            record['error'] = error
+        record.update(fields)
+        self._write(record)
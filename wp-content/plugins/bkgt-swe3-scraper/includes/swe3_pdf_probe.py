@@ -0,0 +1,660 @@
+#!/usr/bin/env python3
+"""
+SWE3 PDF Probe
+Reads a PDF's header, trailer, document information dictionary and page
+count without parsing the file. The file is memory-mapped and only the
+bytes that are needed are touched: the header, the tail (startxref and
+%%EOF), the cross-reference sections and the few objects they point at
+(/Info, /Root, /Pages). A probe costs a fraction of a millisecond
+whatever the size of the PDF.
+
+The pipeline probes every download before uploading it: a file without a
+%PDF header or without %%EOF at the end (a truncated download, an HTML
+error page served with a PDF name) is marked failed instead of being
+stored in the DMS, and the title, dates and page count found in the file
+are sent along with the upload. A file that ends properly but whose
+startxref is missing or stale (viewers repair these) is uploaded unprobed.
+
+Classic xref tables, xref streams (PDF 1.5+), objects stored in object
+streams and incremental updates are handled; when the xref is damaged the
+probe falls back to scanning for the object it needs.
+
+Usage:
+    python3 swe3_pdf_probe.py regler.pdf [more.pdf ...]
+    python3 swe3_pdf_probe.py --blob-dir DIR
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+import sys
+import time
+import zlib
+from collections import namedtuple
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+# startxref and %%EOF must be within this many bytes of the end of the file
+# (the spec says 1024; some generators append junk after %%EOF)
+TAIL_BYTES = 64 * 1024
+
+# The header may be preceded by junk (the spec says 1024 bytes)
+HEADER_BYTES = 1024
+
+# Stop following /Prev and resolving references past these depths
+MAX_XREF_SECTIONS = 64
+MAX_RESOLVE_DEPTH = 16
+
+# Largest xref or object stream the probe inflates
+MAX_STREAM_BYTES = 4 * 1024 * 1024
+
+WHITESPACE = b' \t\r\n\f\x00'
+DELIMITERS = b'()<>[]{}/%'
+NUMBER_START = b'+-.0123456789'
+SKIP = re.compile(rb'[ \t\r\n\f\x00]*(?:%[^\r\n]*[ \t\r\n\f\x00]*)*')
+TOKEN = re.compile(rb'[^ \t\r\n\f\x00()<>\[\]{}/%]*')
+
+PDF_DATE = re.compile(
+    r"^(?:D:)?(\d{4})(\d{2})?(\d{2})?(\d{2})?(\d{2})?(\d{2})?\s*(?:([Zz])|([+-])(\d{2})'?(\d{2})?'?)?"
+)
+
+Ref = namedtuple('Ref', 'num gen')
+
+
+class PDFSyntaxError(ValueError):
+    """The bytes at an offset are not the PDF syntax the probe expected"""
+
+
+@dataclass
+class PDFInfo:
+    """What a probe found in one file"""
+    path: str
+    size: int = 0
+    is_pdf: bool = False
+    pdf_version: Optional[str] = None
+    # No %%EOF at the end of the file
+    truncated: bool = False
+    encrypted: bool = False
+    pages: Optional[int] = None
+    title: Optional[str] = None
+    author: Optional[str] = None
+    subject: Optional[str] = None
+    creator: Optional[str] = None
+    producer: Optional[str] = None
+    # ISO 8601 (from the D:YYYYMMDDHHmmSS+HH'mm' Info dates)
+    created: Optional[str] = None
+    modified: Optional[str] = None
+    # 'table', 'stream' or 'scan' (xref damaged, objects found by searching)
+    xref: Optional[str] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        """True if the file is a complete PDF (worth uploading)"""
+        return self.is_pdf and not self.truncated
+
+    @property
+    def problem(self) -> Optional[str]:
+        """Why the file is not worth uploading, or None"""
+        if not self.is_pdf:
+            return 'Not a PDF' + (f' ({self.error})' if self.error else '')
+        if self.truncated:
+            return 'Truncated PDF' + (f' ({self.error})' if self.error else '')
+        return None
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    def upload_fields(self) -> Dict:
+        """The probed values as DMS upload form fields (only those found)"""
+        fields = {
+            'pdf_title': self.title,
+            'pdf_created': self.created,
+            'pdf_modified': self.modified,
+            'pdf_pages': self.pages,
+            'pdf_version': self.pdf_version,
+        }
+        return {key: value for key, value in fields.items() if value not in (None, '')}
+
+
+def probe_pdf(path: str) -> PDFInfo:
+    """
+    Probe one file
+
+    Args:
+        path: File to probe
+
+    Returns:
+        PDFInfo; problems are reported in it, never raised
+    """
+    info = PDFInfo(path=path)
+    try:
+        with open(path, 'rb') as f:
+            info.size = os.fstat(f.fileno()).st_size
+            if info.size == 0:
+                info.error = 'empty file'
+                return info
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                _probe(buf, info)
+    except OSError as e:
+        info.error = str(e)
+    return info
+
+
+def probe_bytes(data: bytes, path: str = '') -> PDFInfo:
+    """probe_pdf() for a file already in memory"""
+    info = PDFInfo(path=path, size=len(data))
+    if not data:
+        info.error = 'empty file'
+        return info
+    _probe(data, info)
+    return info
+
+
+def _probe(buf, info: PDFInfo):
+    header = buf.find(b'%PDF-', 0, HEADER_BYTES)
+    if header < 0:
+        info.error = 'no %PDF header'
+        return
+    info.is_pdf = True
+    version = buf[header + 5:header + 8]
+    if re.match(rb'^\d\.\d$', version):
+        info.pdf_version = version.decode('ascii')
+
+    size = len(buf)
+    tail = max(0, size - TAIL_BYTES)
+    eof = buf.rfind(b'%%EOF', tail)
+    if eof < 0:
+        info.truncated = True
+        info.error = 'no %%EOF at end of file'
+        return
+    # A damaged startxref (missing, 0, stale after a sloppy incremental
+    # save) is not truncation: leave the file unprobed, viewers repair it
+    startxref = buf.rfind(b'startxref', tail, eof)
+    if startxref < 0:
+        info.error = 'no startxref before %%EOF'
+        return
+    try:
+        offset, _ = _parse(buf, startxref + 9)
+    except PDFSyntaxError:
+        offset = None
+    if not isinstance(offset, int) or not 0 < offset < size:
+        info.error = 'startxref points outside the file'
+        return
+
+    try:
+        document = _Document(buf)
+        document.load(offset)
+        _read_document(document, info)
+        info.xref = document.kind
+    except (ValueError, TypeError, LookupError, OverflowError, zlib.error, RecursionError) as e:
+        # A corrupt xref or object (a non-numeric offset, a /Columns that is
+        # not a number...) leaves the file unprobed rather than failing it
+        info.error = str(e) or e.__class__.__name__
+
+
+def _read_document(document: '_Document', info: PDFInfo):
+    trailer = document.trailer
+    info.encrypted = 'Encrypt' in trailer
+
+    root = document.resolve(trailer.get('Root'))
+    if isinstance(root, dict):
+        pages = document.resolve(root.get('Pages'))
+        if isinstance(pages, dict):
+            count = document.resolve(pages.get('Count'))
+            if isinstance(count, int) and count >= 0:
+                info.pages = count
+
+    metadata = document.resolve(trailer.get('Info'))
+    # Info strings of an encrypted file are encrypted too
+    if not isinstance(metadata, dict) or info.encrypted:
+        return
+    for field, key in (('title', 'Title'), ('author', 'Author'), ('subject', 'Subject'),
+                       ('creator', 'Creator'), ('producer', 'Producer')):
+        value = document.resolve(metadata.get(key))
+        if isinstance(value, bytes):
+            setattr(info, field, decode_text(value) or None)
+    for field, key in (('created', 'CreationDate'), ('modified', 'ModDate')):
+        value = document.resolve(metadata.get(key))
+        if isinstance(value, bytes):
+            setattr(info, field, parse_pdf_date(decode_text(value)))
+
+
+def decode_text(value: bytes) -> str:
+    """Decode a PDF text string (UTF-16BE or UTF-8 with BOM, else PDFDocEncoding)"""
+    if value.startswith(b'\xfe\xff'):
+        text = value[2:].decode('utf-16-be', errors='replace')
+    elif value.startswith(b'\xef\xbb\xbf'):
+        text = value[3:].decode('utf-8', errors='replace')
+    else:
+        # cp1252 matches PDFDocEncoding for everything SWE3 titles use
+        text = value.decode('cp1252', errors='replace')
+    return ' '.join(text.replace('\x00', '').split())
+
+
+def parse_pdf_date(value: str) -> Optional[str]:
+    """
+    Convert a PDF date (D:YYYYMMDDHHmmSSOHH'mm') to ISO 8601
+
+    Returns:
+        e.g. '2025-01-14T09:30:00+01:00', or None if value is not a date
+    """
+    match = PDF_DATE.match(value.strip())
+    if not match:
+        return None
+    year, month, day, hour, minute, second, utc, sign, tz_hour, tz_minute = match.groups()
+    tz = None
+    if utc:
+        tz = timezone.utc
+    elif sign:
+        delta = timedelta(hours=int(tz_hour), minutes=int(tz_minute or 0))
+        tz = timezone(-delta if sign == '-' else delta)
+    try:
+        moment = datetime(int(year), int(month or 1), int(day or 1), int(hour or 0),
+                          int(minute or 0), int(second or 0), tzinfo=tz)
+    except ValueError:
+        return None
+    return moment.isoformat()
+
+
+class _Document:
+    """Lazily resolved objects of one PDF"""
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.trailer = {}
+        # Newest first: ('table', first, count, data offset, entry width)
+        # or ('stream', first, count, entries, field widths, entry offset)
+        self.sections = []
+        self.kind = None
+        self._object_streams = {}
+
+    def load(self, offset: int):
+        """Read the xref section at offset and every older one it chains to"""
+        seen = set()
+        pending = [offset]
+        while pending and len(seen) < MAX_XREF_SECTIONS:
+            offset = pending.pop(0)
+            if offset in seen or not 0 <= offset < len(self.buf):
+                continue
+            seen.add(offset)
+            i = _skip(self.buf, offset)
+            if self.buf[i:i + 4] == b'xref':
+                trailer = self._load_table(i + 4)
+                self.kind = self.kind or 'table'
+            else:
+                trailer = self._load_stream(i)
+                self.kind = self.kind or 'stream'
+            for key, value in trailer.items():
+                self.trailer.setdefault(key, value)
+            # Hybrid files keep the xref stream of their compressed objects aside
+            if isinstance(trailer.get('XRefStm'), int):
+                pending.insert(0, trailer['XRefStm'])
+            if isinstance(trailer.get('Prev'), int):
+                pending.append(trailer['Prev'])
+
+    def _load_table(self, i: int) -> Dict:
+        buf = self.buf
+        while True:
+            i = _skip(buf, i)
+            if buf[i:i + 7] == b'trailer':
+                trailer, _ = _parse(buf, i + 7)
+                if not isinstance(trailer, dict):
+                    raise PDFSyntaxError('xref trailer is not a dictionary')
+                return trailer
+            first, i = _parse(buf, i)
+            count, i = _parse(buf, i)
+            if not isinstance(first, int) or not isinstance(count, int):
+                raise PDFSyntaxError('bad xref subsection header')
+            i = _skip(buf, i)
+            # Entries are 20 bytes, but some writers end them with a single EOL byte
+            width = 20
+            if count and buf[i + 18:i + 19] in (b'\r', b'\n') and buf[i + 19:i + 20] not in (b'\r', b'\n', b' '):
+                width = 19
+            self.sections.append(('table', first, count, i, width))
+            i += count * width
+
+    def _load_stream(self, i: int) -> Dict:
+        header, data = self._stream_object(i)
+        if header.get('Type') != 'XRef':
+            raise PDFSyntaxError('startxref does not point at an xref section')
+        widths = header.get('W')
+        if not isinstance(widths, list) or len(widths) != 3 or not all(isinstance(w, int) for w in widths):
+            raise PDFSyntaxError('bad xref stream /W')
+        index = header.get('Index') or [0, header.get('Size', 0)]
+        offset = 0
+        entry = sum(widths)
+        for first, count in zip(index[0::2], index[1::2]):
+            self.sections.append(('stream', first, count, data, widths, offset))
+            offset += count * entry
+        return header
+
+    def _stream_object(self, i: int):
+        """Parse 'n g obj << ... >> stream ...' at i; returns (dictionary, decoded data)"""
+        buf = self.buf
+        _, i = _object_header(buf, i)
+        header, i = _parse(buf, i)
+        if not isinstance(header, dict):
+            raise PDFSyntaxError('stream object without a dictionary')
+        i = _skip(buf, i)
+        if buf[i:i + 6] != b'stream':
+            raise PDFSyntaxError('missing stream keyword')
+        i += 6
+        if buf[i:i + 2] == b'\r\n':
+            i += 2
+        elif buf[i:i + 1] in (b'\n', b'\r'):
+            i += 1
+        length = self.resolve(header.get('Length'))
+        if not isinstance(length, int) or length < 0:
+            end = buf.find(b'endstream', i)
+            if end < 0:
+                raise PDFSyntaxError('unterminated stream')
+            length = end - i
+        data = buf[i:i + length]
+
+        filters = header.get('Filter')
+        filters = filters if isinstance(filters, list) else [filters] if filters else []
+        params = header.get('DecodeParms')
+        params = params[0] if isinstance(params, list) and params else params
+        for name in filters:
+            if name not in ('FlateDecode', 'Fl'):
+                raise PDFSyntaxError(f'unsupported stream filter {name}')
+            data = zlib.decompressobj().decompress(data, MAX_STREAM_BYTES)
+        if isinstance(params, dict) and isinstance(params.get('Predictor'), int) and params['Predictor'] >= 10:
+            data = _unpredict_png(data, params.get('Columns', 1))
+        return header, data
+
+    def _entry(self, num: int):
+        """('offset', n) or ('compressed', object stream number, index) or None if free/unknown"""
+        for section in self.sections:
+            kind, first, count = section[:3]
+            if not first <= num < first + count:
+                continue
+            if kind == 'table':
+                _, _, _, start, width = section
+                entry = self.buf[start + (num - first) * width:start + (num - first) * width + 18]
+                parts = entry.split()
+                if len(parts) != 3 or parts[2] not in (b'n', b'f'):
+                    return None
+                return ('offset', int(parts[0])) if parts[2] == b'n' else None
+            _, _, _, data, widths, offset = section
+            position = offset + (num - first) * sum(widths)
+            fields = []
+            for width in widths:
+                fields.append(int.from_bytes(data[position:position + width], 'big'))
+                position += width
+            kind = fields[0] if widths[0] else 1
+            if kind == 1:
+                return 'offset', fields[1]
+            if kind == 2:
+                return 'compressed', fields[1], fields[2]
+            return None
+        return None
+
+    def get(self, num: int):
+        """The object with number num, or None"""
+        entry = self._entry(num)
+        if entry and entry[0] == 'compressed':
+            return self._compressed_object(entry[1], entry[2], num)
+        if entry:
+            try:
+                found, i = _object_header(self.buf, entry[1])
+                if found == num:
+                    return _parse(self.buf, i)[0]
+            except PDFSyntaxError:
+                pass
+        return self._scan(num)
+
+    def _scan(self, num: int):
+        """Find object num by searching the file (the xref is wrong or incomplete)"""
+        last = None
+        for match in re.finditer(rb'(?<![0-9])%d\s+\d+\s+obj\b' % num, self.buf):
+            last = match
+        if last is None:
+            return None
+        self.kind = 'scan'
+        return _parse(self.buf, last.end())[0]
+
+    def _compressed_object(self, stream_num: int, index: int, num: int):
+        if stream_num not in self._object_streams:
+            entry = self._entry(stream_num)
+            if not entry or entry[0] != 'offset':
+                return None
+            header, data = self._stream_object(entry[1])
+            count, first = header.get('N'), header.get('First')
+            if not isinstance(count, int) or not isinstance(first, int):
+                raise PDFSyntaxError('bad object stream header')
+            pairs = []
+            i = 0
+            for _ in range(count):
+                number, i = _parse(data, i)
+                offset, i = _parse(data, i)
+                pairs.append((number, first + offset))
+            self._object_streams[stream_num] = (data, pairs)
+        data, pairs = self._object_streams[stream_num]
+        if index < len(pairs) and pairs[index][0] == num:
+            return _parse(data, pairs[index][1])[0]
+        for number, offset in pairs:
+            if number == num:
+                return _parse(data, offset)[0]
+        return None
+
+    def resolve(self, value, depth: int = 0):
+        """Follow indirect references"""
+        while isinstance(value, Ref) and depth < MAX_RESOLVE_DEPTH:
+            value = self.get(value.num)
+            depth += 1
+        return None if isinstance(value, Ref) else value
+
+
+def _unpredict_png(data: bytes, columns: int) -> bytes:
+    """Undo the PNG row predictors used by xref streams"""
+    row_size = columns + 1
+    previous = bytearray(columns)
+    out = bytearray()
+    for start in range(0, len(data) - columns, row_size):
+        kind = data[start]
+        row = bytearray(data[start + 1:start + row_size])
+        for k in range(len(row)):
+            left = row[k - 1] if k else 0
+            up = previous[k]
+            if kind == 1:
+                row[k] = (row[k] + left) & 0xFF
+            elif kind == 2:
+                row[k] = (row[k] + up) & 0xFF
+            elif kind == 3:
+                row[k] = (row[k] + (left + up) // 2) & 0xFF
+            elif kind == 4:
+                corner = previous[k - 1] if k else 0
+                estimate = left + up - corner
+                pa, pb, pc = abs(estimate - left), abs(estimate - up), abs(estimate - corner)
+                row[k] = (row[k] + (left if pa <= pb and pa <= pc else up if pb <= pc else corner)) & 0xFF
+        out += row
+        previous = row
+    return bytes(out)
+
+
+def _skip(buf, i: int) -> int:
+    """Skip whitespace and comments"""
+    return SKIP.match(buf, i).end()
+
+
+def _token(buf, i: int):
+    """A regular token (number, keyword) starting at i"""
+    j = TOKEN.match(buf, i).end()
+    return buf[i:j], j
+
+
+def _object_header(buf, i: int):
+    """Parse 'n g obj' at i; returns (n, index after 'obj')"""
+    num, i = _parse(buf, i)
+    gen, i = _parse(buf, i)
+    i = _skip(buf, i)
+    if not isinstance(num, int) or not isinstance(gen, int) or buf[i:i + 3] != b'obj':
+        raise PDFSyntaxError(f'no object at offset {i}')
+    return num, i + 3
+
+
+def _parse(buf, i: int, depth: int = 0):
+    """
+    Parse one PDF object at i
+
+    Dictionaries become dicts keyed by name, arrays lists, names str,
+    strings bytes (undecoded), numbers int/float and references Ref.
+
+    Returns:
+        (value, index after it)
+    """
+    if depth > 32:
+        raise PDFSyntaxError('objects nested too deeply')
+    i = _skip(buf, i)
+    if i >= len(buf):
+        raise PDFSyntaxError('unexpected end of data')
+    c = buf[i]
+
+    if c == 0x3C and buf[i + 1:i + 2] == b'<':  # << dictionary >>
+        value = {}
+        i += 2
+        while True:
+            i = _skip(buf, i)
+            if buf[i:i + 2] == b'>>':
+                return value, i + 2
+            key, i = _parse(buf, i, depth + 1)
+            if not isinstance(key, str):
+                raise PDFSyntaxError('dictionary key is not a name')
+            value[key], i = _parse(buf, i, depth + 1)
+
+    if c == 0x5B:  # [ array ]
+        value = []
+        i += 1
+        while True:
+            i = _skip(buf, i)
+            if buf[i:i + 1] == b']':
+                return value, i + 1
+            item, i = _parse(buf, i, depth + 1)
+            value.append(item)
+
+    if c == 0x2F:  # /Name
+        token, i = _token(buf, i + 1)
+        if b'#' in token:
+            token = re.sub(rb'#([0-9A-Fa-f]{2})', lambda m: bytes([int(m.group(1), 16)]), token)
+        return token.decode('latin-1'), i
+
+    if c == 0x28:  # (literal string)
+        return _literal(buf, i + 1)
+
+    if c == 0x3C:  # <hex string>
+        end = buf.find(b'>', i)
+        if end < 0:
+            raise PDFSyntaxError('unterminated hex string')
+        digits = bytes(d for d in buf[i + 1:end] if d not in WHITESPACE)
+        try:
+            return bytes.fromhex((digits + b'0' * (len(digits) % 2)).decode('ascii')), end + 1
+        except ValueError:
+            raise PDFSyntaxError('bad hex string')
+
+    token, j = _token(buf, i)
+    if not token:
+        raise PDFSyntaxError(f'unexpected {chr(c)!r} at offset {i}')
+    if c in NUMBER_START:
+        try:
+            number = int(token)
+        except ValueError:
+            try:
+                return float(token), j
+            except ValueError:
+                raise PDFSyntaxError(f'bad number {token!r}')
+        # 'n g R' is a reference
+        k = _skip(buf, j)
+        gen, m = _token(buf, k)
+        if gen.isdigit():
+            m = _skip(buf, m)
+            if buf[m:m + 1] == b'R' and (m + 1 >= len(buf) or buf[m + 1] in WHITESPACE or buf[m + 1] in DELIMITERS):
+                return Ref(number, int(gen)), m + 1
+        return number, j
+    if token == b'true':
+        return True, j
+    if token == b'false':
+        return False, j
+    if token == b'null':
+        return None, j
+    raise PDFSyntaxError(f'unexpected keyword {token[:20]!r}')
+
+
+def _literal(buf, i: int):
+    """Parse a (literal string) starting after its '('"""
+    value = bytearray()
+    depth = 1
+    n = len(buf)
+    while i < n:
+        c = buf[i]
+        if c == 0x5C:  # backslash
+            i += 1
+            if i >= n:
+                break
+            c = buf[i]
+            if 0x30 <= c <= 0x37:
+                k = i
+                while k < i + 3 and k < n and 0x30 <= buf[k] <= 0x37:
+                    k += 1
+                value.append(int(buf[i:k], 8) & 0xFF)
+                i = k
+                continue
+            if c in (0x0D, 0x0A):
+                # Line continuation
+                i += 2 if buf[i:i + 2] == b'\r\n' else 1
+                continue
+            value.append({0x6E: 0x0A, 0x72: 0x0D, 0x74: 0x09, 0x62: 0x08, 0x66: 0x0C}.get(c, c))
+        elif c == 0x28:
+            depth += 1
+            value.append(c)
+        elif c == 0x29:
+            depth -= 1
+            if depth == 0:
+                return bytes(value), i + 1
+            value.append(c)
+        else:
+            value.append(c)
+        i += 1
+    raise PDFSyntaxError('unterminated string')
+
+
+def main(argv=None):
+    """Command-line interface: one NDJSON record per file on stdout"""
+    from swe3_manifest import default_state_dir
+
+    parser = argparse.ArgumentParser(description='Read PDF metadata (pages, Info dictionary, trailer) without parsing')
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('--blob-dir', help="Probe every PDF in the pipeline's blob store "
+                        f"(e.g. {os.path.join(default_state_dir(), 'blobs')})")
+    args = parser.parse_args(argv)
+
+    paths = list(args.files)
+    if args.blob_dir:
+        objects = os.path.join(args.blob_dir, 'objects')
+        for directory, _, names in os.walk(objects):
+            paths.extend(os.path.join(directory, name) for name in sorted(names))
+    if not paths:
+        parser.error('no files to probe')
+
+    problems = 0
+    elapsed = 0.0
+    for path in paths:
+        started = time.perf_counter()
+        info = probe_pdf(path)
+        took = time.perf_counter() - started
+        elapsed += took
+        if not info.ok:
+            problems += 1
+        print(json.dumps(dict(info.to_dict(), micros=round(took * 1e6, 1)), ensure_ascii=False))
+
+    print(f'[PROBE] {len(paths)} files, {problems} not complete PDFs, '
+          f'{elapsed / len(paths) * 1e6:.1f} µs per file', file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
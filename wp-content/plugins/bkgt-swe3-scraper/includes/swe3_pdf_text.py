@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+SWE3 PDF Text Extraction
+Pulls plain text out of downloaded PDFs for the search index. Extraction
+is CPU-bound, so it runs in a process pool rather than on the pipeline's
+I/O threads.
+
+pypdf is used when it is installed; otherwise a small stdlib extractor
+inflates the FlateDecode content streams and collects the strings shown by
+the Tj/TJ/'/" operators. That is enough for the text-based PDFs SWE3
+publishes (WinAnsi/Latin-1 fonts); text drawn with CID fonts or scanned
+pages come out empty rather than garbled.
+"""
+
+import importlib.util
+import multiprocessing
+import re
+import time
+import unicodedata
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+# Stop collecting text after this many characters
+MAX_TEXT_CHARS = 2 * 1024 * 1024
+
+# Largest inflated stream the fallback extractor looks at
+MAX_STREAM_BYTES = 16 * 1024 * 1024
+
+STREAM_START = re.compile(rb'stream(?:\r\n|\n|\r)')
+DIRECT_LENGTH = re.compile(rb'/Length\s+(\d+)(?!\s+\d+\s+R)')
+
+# Streams that never hold page text
+SKIP_STREAM_MARKERS = (
+    b'/Image', b'/FontFile', b'/Length1', b'/Length2', b'/XRef', b'/ObjStm', b'/Metadata',
+    b'/EmbeddedFile', b'/ICCBased', b'/DCTDecode', b'/JPXDecode', b'/CCITTFaxDecode', b'/JBIG2Decode',
+)
+
+# A TJ adjustment more negative than this (thousandths of an em) is a word gap
+TJ_SPACE_THRESHOLD = -200
+
+WHITESPACE = b' \t\r\n\f\x00'
+DELIMITERS = b'()<>[]{}/%'
+
+
+def _installed(module: str) -> bool:
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+HAS_PYPDF = _installed('pypdf')
+
+
+def extract_text(path: str) -> Tuple[str, str]:
+    """
+    Extract the text of a PDF
+
+    Args:
+        path: PDF file
+
+    Returns:
+        (text, method) where method is 'pypdf' or 'stdlib'
+    """
+    if HAS_PYPDF:
+        try:
+            return _extract_with_pypdf(path), 'pypdf'
+        except Exception:
+            # Damaged files that pypdf refuses may still have readable streams
+            pass
+    with open(path, 'rb') as f:
+        data = f.read()
+    return extract_text_from_bytes(data), 'stdlib'
+
+
+def extract_text_timed(path: str) -> Tuple[str, str, float]:
+    """extract_text() plus its CPU time; the process pool's task function"""
+    started = time.process_time()
+    text, method = extract_text(path)
+    return text, method, time.process_time() - started
+
+
+def _extract_with_pypdf(path: str) -> str:
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    pages = []
+    size = 0
+    for page in reader.pages:
+        text = page.extract_text() or ''
+        pages.append(text)
+        size += len(text)
+        if size >= MAX_TEXT_CHARS:
+            break
+    return normalize_text('\n'.join(pages))
+
+
+def extract_text_from_bytes(data: bytes) -> str:
+    """Stdlib extractor: text shown by every content stream in the file"""
+    parts = []
+    size = 0
+    for content in _content_streams(data):
+        text = _content_text(content)
+        if text:
+            parts.append(text)
+            size += len(text)
+            if size >= MAX_TEXT_CHARS:
+                break
+    return normalize_text('\n'.join(parts))
+
+
+def normalize_text(text: str) -> str:
+    """NFC-normalize, collapse runs of spaces and drop blank lines"""
+    text = unicodedata.normalize('NFC', text)[:MAX_TEXT_CHARS]
+    lines = (' '.join(line.split()) for line in text.splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def _content_streams(data: bytes):
+    """Yield inflated streams that may be page content"""
+    for match in STREAM_START.finditer(data):
+        # The stream dictionary sits between the object header and 'stream'
+        header_start = data.rfind(b'obj', max(0, match.start() - 4096), match.start())
+        if header_start < 0:
+            continue
+        header = data[header_start:match.start()]
+        if any(marker in header for marker in SKIP_STREAM_MARKERS):
+            continue
+
+        start = match.end()
+        length = DIRECT_LENGTH.search(header)
+        end = start + int(length.group(1)) if length else -1
+        if end < 0 or data[end:end + 20].lstrip()[:9] != b'endstream':
+            end = data.find(b'endstream', start)
+            if end < 0:
+                continue
+        raw = data[start:end]
+
+        if b'/FlateDecode' in header or b'/Fl ' in header or b'/Fl]' in header:
+            try:
+                raw = zlib.decompressobj().decompress(raw, MAX_STREAM_BYTES)
+            except zlib.error:
+                continue
+        elif b'/Filter' in header:
+            # LZW, ASCII85, ... are rare for content streams in practice
+            continue
+
+        if b'BT' in raw and b'ET' in raw:
+            yield raw
+
+
+def _content_text(content: bytes) -> str:
+    """Text shown by one content stream"""
+    out: List[str] = []
+    operands = []
+    in_text = False
+    i, n = 0, len(content)
+
+    while i < n:
+        c = content[i]
+        if c in WHITESPACE:
+            i += 1
+        elif c == 0x25:  # % comment
+            end = content.find(b'\n', i)
+            i = n if end < 0 else end + 1
+        elif c == 0x28:  # (literal string)
+            value, i = _literal_string(content, i + 1)
+            operands.append(value)
+        elif c == 0x3C:  # <hex string> or <<
+            if content[i + 1:i + 2] == b'<':
+                i += 2
+                continue
+            end = content.find(b'>', i)
+            if end < 0:
+                break
+            operands.append(_hex_string(content[i + 1:end]))
+            i = end + 1
+        elif c == 0x3E:  # >>
+            i += 1
+        elif c in (0x5B, 0x5D):  # [ ] (TJ just takes the strings and numbers in between)
+            i += 1
+        elif c == 0x2F:  # /Name
+            j = i + 1
+            while j < n and content[j] not in WHITESPACE and content[j] not in DELIMITERS:
+                j += 1
+            operands.append(None)
+            i = j
+        else:
+            j = i
+            while j < n and content[j] not in WHITESPACE and content[j] not in DELIMITERS:
+                j += 1
+            if j == i:
+                i += 1
+                continue
+            token = content[i:j]
+            i = j
+            try:
+                operands.append(float(token))
+                continue
+            except ValueError:
+                pass
+
+            # An operator
+            if token == b'BT':
+                in_text = True
+            elif token == b'ET':
+                in_text = False
+                out.append('\n')
+            elif token == b'ID':
+                # Inline image data runs until EI
+                end = content.find(b'EI', i)
+                i = n if end < 0 else end + 2
+            elif in_text:
+                _show(token, operands, out)
+            operands = []
+
+    return ''.join(out)
+
+
+def _show(operator: bytes, operands: list, out: List[str]):
+    """Append the effect of one text operator"""
+    if operator == b'Tj' and operands and isinstance(operands[-1], str):
+        out.append(operands[-1])
+    elif operator in (b"'", b'"'):
+        out.append('\n')
+        if operands and isinstance(operands[-1], str):
+            out.append(operands[-1])
+    elif operator == b'TJ':
+        for item in operands:
+            if isinstance(item, float):
+                if item < TJ_SPACE_THRESHOLD:
+                    out.append(' ')
+            elif isinstance(item, str):
+                out.append(item)
+    elif operator in (b'Td', b'TD'):
+        numbers = [item for item in operands if isinstance(item, float)]
+        out.append('\n' if len(numbers) >= 2 and numbers[-1] != 0 else ' ')
+    elif operator in (b'T*', b'Tm'):
+        out.append('\n')
+
+
+def _literal_string(content: bytes, i: int) -> Tuple[str, int]:
+    """Decode a (literal string) starting after its '('; returns (text, next index)"""
+    value = bytearray()
+    depth = 1
+    n = len(content)
+    while i < n:
+        c = content[i]
+        if c == 0x5C:  # backslash
+            i += 1
+            if i >= n:
+                break
+            c = content[i]
+            if c in b'01234567':
+                digits = content[i:i + 3]
+                k = 0
+                while k < len(digits) and digits[k] in b'01234567':
+                    k += 1
+                value.append(int(digits[:k], 8) & 0xFF)
+                i += k
+                continue
+            if c in b'\r\n':
+                # Line continuation
+                i += 2 if content[i:i + 2] == b'\r\n' else 1
+                continue
+            value.append({0x6E: 0x0A, 0x72: 0x0D, 0x74: 0x09, 0x62: 0x08, 0x66: 0x0C}.get(c, c))
+        elif c == 0x28:
+            depth += 1
+            value.append(c)
+        elif c == 0x29:
+            depth -= 1
+            if depth == 0:
+                return _decode_string(bytes(value)), i + 1
+            value.append(c)
+        else:
+            value.append(c)
+        i += 1
+    return _decode_string(bytes(value)), n
+
+
+def _hex_string(digits: bytes) -> str:
+    digits = bytes(c for c in digits if c not in WHITESPACE)
+    if len(digits) % 2:
+        digits += b'0'
+    try:
+        value = bytes.fromhex(digits.decode('ascii'))
+    except ValueError:
+        return ''
+    text = _decode_string(value)
+    # Two-byte glyph ids (CID fonts) decode to junk; keep only plausible text
+    printable = sum(ch.isprintable() for ch in text)
+    return text if text and printable >= 0.8 * len(text) else ''
+
+
+def _decode_string(value: bytes) -> str:
+    if value.startswith(b'\xfe\xff'):
+        return value[2:].decode('utf-16-be', errors='replace')
+    return value.decode('cp1252', errors='replace')
+
+
+class TextExtractionPool:
+    """Process pool running extract_text_timed() (or a task built on it); submit() returns a Future"""
+
+    def __init__(self, workers: Optional[int] = None):
+        """
+        Args:
+            workers: Extraction processes (default: one per CPU)
+        """
+        self.workers = max(1, workers or multiprocessing.cpu_count())
+        # spawn, not fork: the pipeline forks from a process full of threads and sockets
+        self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context('spawn'))
+
+    def submit(self, path: str, task=None) -> Future:
+        """
+        Extract one file
+
+        Args:
+            path: PDF file
+            task: Picklable function of the path run instead of
+                extract_text_timed (e.g. swe3_fingerprint.fingerprint_text_timed)
+
+        Returns:
+            Future resolving to the task's result, by default (text, method, cpu_seconds)
+        """
+        return self._executor.submit(task or extract_text_timed, path)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -4,190 +4,1304 @@ SWE3 Document Pipeline Executor
 Fetches documents from SWE3, downloads them, and uploads to BKGT DMS
 """
 
-import requests
+import argparse
 import json
 import sys
 import os
 import hashlib
+import queue
+import signal
 import tempfile
+import threading
+import time
+import traceback
 from datetime import datetime
 
+import swe3_http
+from swe3_blob_store import SWE3BlobStore, hash_file
+from swe3_fingerprint import DEFAULT_THRESHOLD, SWE3FingerprintIndex, default_fingerprint_path, fingerprint_text_timed
+from swe3_media_client import SWE3_BASE_URL, SWE3MediaClient
+from swe3_journal import (
+    COMPLETED, DOWNLOADED, FAILED, FAILED_RUN, INTERRUPTED, SKIPPED, UPLOADED,
+    SWE3RunJournal, default_journal_path
+)
+from swe3_manifest import SWE3Manifest, default_state_dir
+from swe3_metrics import LOG_FORMATS, EventLog, SWE3Metrics, Timer
+from swe3_multipart import DEFAULT_CHUNK_SIZE, StreamingMultipartBody
+from swe3_pdf_probe import probe_pdf
+from swe3_rate_control import DEFAULT_MAX_RATE
+from swe3_search_index import SWE3SearchIndex, default_index_path
+
+# Marks the end of work on a stage queue
+_STOP = object()
+
+# Batch upload defaults (the DMS may advertise lower limits)
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_BATCH_MAX_BYTES = 32 * 1024 * 1024
+
+# Seconds an uploader waits for more files before sending a partial batch
+BATCH_WAIT = 0.25
+
+# Header carrying the DMS's shared upload secret (BKGT_SWE3_UPLOAD_TOKEN)
+DMS_TOKEN_HEADER = 'X-BKGT-SWE3-Token'
+
+# Bytes compared at each end of a file to recognise a stored copy before downloading it
+SAMPLE_BYTES = 64 * 1024
+
+def blob_key(doc):
+    """Blob store key for a listed document (changes whenever SWE3 modifies it)"""
+    return f"{doc['url']}@{doc.get('modified') or ''}"
+
 class SWE3_DMS_Pipeline:
     """Complete pipeline for SWE3 documents"""
     
-    def __init__(self, dms_url):
-        self.swe3_api = 'https://amerikanskfotboll.swe3.se/wp-json/wp/v2/media'
+    def __init__(self, dms_url, list_workers=8, download_workers=4, upload_workers=2, queue_size=8,
+                 manifest=None, blob_store=None, stream=False, chunk_size=DEFAULT_CHUNK_SIZE,
+                 batch_size=DEFAULT_BATCH_SIZE, batch_max_bytes=DEFAULT_BATCH_MAX_BYTES, batch_retries=2,
+                 reconcile=True, journal=None, resume=False, max_rate=DEFAULT_MAX_RATE,
+                 metrics=None, events=None, search_index=None, extract_workers=None,
+                 fingerprints=None, similarity_threshold=DEFAULT_THRESHOLD, dms_token=None):
+        self.swe3_url = SWE3_BASE_URL
         self.dms_url = dms_url
         # Use admin-ajax endpoint instead of REST API to bypass nginx restrictions
-        self.dms_endpoint = f'{dms_url}/wp-admin/admin-ajax.php?action=swe3_upload_document'
+        self.ajax_url = f'{dms_url}/wp-admin/admin-ajax.php'
+        self.dms_endpoint = f'{self.ajax_url}?action=swe3_upload_document'
+        # Sent with every DMS request (never to SWE3: the session is shared)
+        self.dms_headers = {DMS_TOKEN_HEADER: dms_token} if dms_token else {}
+        # Several files per upload request when the DMS supports it (see configure_batching)
+        self.batch_size = max(1, batch_size)
+        self.batch_max_bytes = max(1, batch_max_bytes)
+        self.batch_retries = max(0, batch_retries)
+        self.batch_endpoint = None
+        # Ask the DMS what it already holds and skip identical uploads
+        self.reconcile = reconcile
+        # SWE3 URL -> {'md5', 'sha256', 'post_id'} from the DMS (None if unknown)
+        self.dms_documents = None
+        # Optional SWE3RunJournal; resume continues its last unfinished run
+        self.journal = journal
+        self.resume = resume
         self.temp_dir = tempfile.mkdtemp(prefix='swe3_')
-        self.stats = {'fetched': 0, 'downloaded': 0, 'uploaded': 0, 'failed': 0}
+        self.list_workers = max(1, list_workers)
+        self.download_workers = max(1, download_workers)
+        self.upload_workers = max(1, upload_workers)
+        # Downloaded files waiting for an uploader; bounds disk use when uploads lag
+        self.queue_size = max(1, queue_size)
+        # Optional SWE3Manifest; enables incremental sync
+        self.manifest = manifest
+        # Optional SWE3BlobStore; downloads are kept (deduplicated) across runs
+        self.blob_store = blob_store
+        # Streaming mode pipes each PDF from SWE3 into the DMS upload (no blob store)
+        self.stream = stream
+        self.chunk_size = max(1024, chunk_size)
+        # One keep-alive connection per worker that can talk to a host at once;
+        # each host is paced adaptively up to max_rate requests per second
+        self.session = swe3_http.configure(
+            pool_size=max(self.list_workers, self.download_workers, self.upload_workers),
+            max_rate=max_rate
+        )
+        # Per-stage counters/latency histograms and the structured event log (stderr)
+        self.metrics = metrics or SWE3Metrics()
+        self.events = events or EventLog()
+        self.media_client = SWE3MediaClient(self.swe3_url, session=self.session, workers=self.list_workers,
+                                            metrics=self.metrics, events=self.events)
+        # Optional SWE3SearchIndex; downloaded PDFs have their text extracted in a
+        # process pool (extract_workers processes) and indexed
+        self.search_index = search_index
+        self.extract_workers = extract_workers
+        # Optional SWE3FingerprintIndex; uploads that are near-duplicates of a
+        # document under another URL are sent as a new version of it
+        self.fingerprints = fingerprints
+        self.similarity_threshold = similarity_threshold
+        self.text_pool = None
+        # SWE3 URL -> extraction future, awaited before the file may be deleted
+        self._extractions = {}
+        self.stats = {
+            'fetched': 0, 'unchanged': 0, 'removed': 0,
+            'downloaded': 0, 'uploaded': 0, 'failed': 0, 'batches': 0,
+            'skipped_unchanged': 0, 'resumed_done': 0, 'indexed': 0, 'versions': 0, 'rate_limits': {}
+        }
+        # False when a media page failed: the listing cannot show removals or move the watermark
+        self.listing_complete = True
+        self.removed = []
+        self._failed_docs = []
+        # SWE3 URLs whose upload outcome is recorded (a batch that fails later must not fail them twice)
+        self._finished = set()
+        # SWE3 URL -> last error message, kept for the journal
+        self._errors = {}
+        self._stats_lock = threading.Lock()
+    
+    def _count(self, key, amount=1):
+        """Increment a stats counter (shared by all stage workers)"""
+        with self._stats_lock:
+            self.stats[key] += amount
+    
+    def _note_error(self, url, message):
+        """Remember why a document failed (journaled when it is marked failed)"""
+        with self._stats_lock:
+            self._errors[url] = message
+    
+    def log(self, event, message, level='info', **fields):
+        """Emit a structured event (see swe3_metrics.EventLog)"""
+        self.events.emit(event, message, level, **fields)
+    
+    def _journal(self, url, state, detail=None):
+        if self.journal:
+            self.journal.record(url, state, detail)
         
-    def fetch_all_documents(self):
-        """Fetch all PDF documents from SWE3"""
-        print(f"[FETCH] Getting documents from SWE3...")
+    def fetch_media_ids(self):
+        """Fetch the ids of every PDF in the media library (ids only, to spot removals)"""
+        try:
+            return self.media_client.media_ids()
+        except RuntimeError as e:
+            self.log('error', str(e), 'error')
+            return None
+    
+    def fetch_all_documents(self, modified_after=None):
+        """Fetch all PDF documents from SWE3
+        
+        Args:
+            modified_after: only list items modified after this timestamp
+        
+        Returns:
+            Dict of documents keyed by URL, or None if listing failed
+        """
+        self.log('fetch', "Getting documents from SWE3...", modified_after=modified_after)
         documents = {}
-        page = 1
         
-        while page <= 100:
+        if modified_after:
+            self.log('fetch', f"Only items modified after {modified_after}")
+        
+        try:
+            for doc in self.media_client.iter_documents(modified_after=modified_after):
+                if doc.url:
+                    documents[doc.url] = {
+                        'id': doc.id,
+                        'title': doc.title,
+                        'url': doc.url,
+                        'size': doc.size,
+                        'date': doc.date,
+                        'modified': doc.modified
+                    }
+        except RuntimeError as e:
+            self.log('error', str(e), 'error')
+            return None
+        
+        self.listing_complete = self.media_client.listing_complete
+        if not self.listing_complete:
+            self.log('fetch', "Listing incomplete (a media page failed): not checking removals "
+                     "or advancing the watermark this run", 'error')
+        self.stats['fetched'] = len(documents)
+        self.log('fetch', f"Found {len(documents)} documents", documents=len(documents))
+        return documents
+    
+    def download_document(self, doc_url, filename, cache_key=None, size=0):
+        """Download PDF from SWE3
+        
+        With a blob store, bytes already stored under cache_key (or found
+        by find_stored_copy under another key) are reused instead of
+        fetched, and new downloads are adopted into the store. The blob
+        returned is pinned; the caller unpins it when done with the file.
+        
+        Returns:
+            (file_path, sha256 hex digest) or (None, None) on failure
+        """
+        if self.blob_store and cache_key:
+            file_path, digest = self.blob_store.lookup(cache_key, pin=True)
+            if file_path:
+                self.metrics.observe('download', 0.0, 0, 'cached')
+                self.log('download', f"{filename[:40]}: Cached ({digest[:12]})", url=doc_url, outcome='cached')
+                return file_path, digest
+            file_path, digest = self.find_stored_copy(doc_url, size, cache_key)
+            if file_path:
+                self.metrics.observe('download', 0.0, 0, 'deduplicated')
+                self.log('download', f"{filename[:40]}: Same file as stored {digest[:12]}, not downloaded",
+                         url=doc_url, outcome='deduplicated')
+                return file_path, digest
+        
+        with Timer(self.metrics, 'download') as timer:
             try:
-                url = f"{self.swe3_api}?per_page=100&page={page}"
-                response = requests.get(url, timeout=15)
-                
+                response = self.session.get(doc_url, timeout=30, stream=True)
                 if response.status_code != 200:
-                    break
-                
-                data = response.json()
-                if not data:
-                    break
+                    timer.outcome = 'error'
+                    self.log('download', f"{filename[:40]}: Failed (HTTP {response.status_code})", 'warning',
+                             url=doc_url, outcome='error', status=response.status_code)
+                    self._note_error(doc_url, f"Download failed (HTTP {response.status_code})")
+                    self._count('failed')
+                    response.close()
+                    return None, None
                 
-                for item in data:
-                    if item.get('mime_type') == 'application/pdf':
-                        title = item.get('title', {})
-                        if isinstance(title, dict):
-                            title = title.get('rendered', '')
-                        if not title:
-                            title = item.get('slug', f'doc_{item["id"]}')
-                        
-                        doc_url = item.get('source_url', '')
-                        if doc_url:
-                            documents[doc_url] = {
-                                'id': item.get('id'),
-                                'title': title,
-                                'url': doc_url,
-                                'size': item.get('media_details', {}).get('filesize', 0),
-                                'date': item.get('date')
-                            }
+                if self.blob_store:
+                    f, file_path = self.blob_store.new_temp_file()
+                else:
+                    file_path = os.path.join(self.temp_dir, filename)
+                    f = open(file_path, 'wb')
+                digest = hashlib.sha256()
                 
-                page += 1
+                with f:
+                    for chunk in response.iter_content(chunk_size=8192):
+                        if chunk:
+                            f.write(chunk)
+                            digest.update(chunk)
+                            timer.size += len(chunk)
                 
             except Exception as e:
-                print(f"[ERROR] Page {page}: {e}")
-                break
+                timer.outcome = 'error'
+                self.log('download', f"{filename[:40]}: Error - {e}", 'warning', url=doc_url, outcome='error')
+                self._note_error(doc_url, f"Download error: {e}")
+                self._count('failed')
+                return None, None
         
-        self.stats['fetched'] = len(documents)
-        print(f"[FETCH] Found {len(documents)} documents")
-        return documents
+        self.log('download', f"{filename[:40]}: OK ({timer.size:,} bytes)", url=doc_url, outcome='ok',
+                 bytes=timer.size, seconds=round(timer.seconds, 4))
+        self._count('downloaded')
+        
+        if self.blob_store:
+            return self.blob_store.put(file_path, digest.hexdigest(), key=cache_key, pin=True)
+        return file_path, digest.hexdigest()
+    
+    def find_stored_copy(self, doc_url, size, cache_key):
+        """
+        Recognise a file the blob store already holds under another key
+        (the same PDF uploaded to SWE3 twice) without downloading it
+        
+        A stored blob of the listed size whose first and last SAMPLE_BYTES
+        match the remote file's (two Range requests) is the same file: a
+        PDF's tail holds its xref offsets and trailer, which change with any
+        rewrite. Files the samples would nearly cover are just downloaded.
+        
+        Returns:
+            (path, digest) of the stored copy, now also stored under
+            cache_key and pinned, or (None, None)
+        """
+        if not size or size <= 2 * SAMPLE_BYTES:
+            return None, None
+        candidates = self.blob_store.digests_of_size(size)
+        if not candidates:
+            return None, None
+        
+        head = self._fetch_range(doc_url, 0, SAMPLE_BYTES - 1, size)
+        tail = head and self._fetch_range(doc_url, size - SAMPLE_BYTES, size - 1, size)
+        if not tail:
+            return None, None
+        for digest in candidates:
+            try:
+                with open(self.blob_store.path(digest), 'rb') as f:
+                    if f.read(SAMPLE_BYTES) != head:
+                        continue
+                    f.seek(size - SAMPLE_BYTES)
+                    if f.read() != tail:
+                        continue
+            except OSError:
+                continue
+            path = self.blob_store.link(cache_key, digest, pin=True)
+            if path:
+                return path, digest
+        return None, None
     
-    def download_document(self, doc_url, filename):
-        """Download PDF from SWE3"""
+    def _fetch_range(self, doc_url, start, end, size):
+        """Bytes start-end of doc_url, or None unless the server sends exactly that range"""
         try:
-            response = requests.get(doc_url, timeout=30, stream=True)
-            if response.status_code != 200:
-                print(f"[DOWNLOAD] {filename[:40]}: Failed (HTTP {response.status_code})")
+            response = self.session.get(doc_url, headers={'Range': f'bytes={start}-{end}'}, timeout=30, stream=True)
+            if response.status_code != 206 or response.headers.get('Content-Range') != f'bytes {start}-{end}/{size}':
+                # Ignoring Range means sending the whole file: do not read it twice
+                response.close()
                 return None
+            return response.content
+        except Exception:
+            return None
+    
+    def probe_download(self, file_path, metadata):
+        """
+        Probe stage: read the downloaded PDF's header, trailer and Info dictionary
+        
+        Returns:
+            True if the file is a complete PDF; its title, dates and page
+            count are kept in metadata['pdf'] and sent with the upload
+        """
+        with Timer(self.metrics, 'probe') as timer:
+            try:
+                info = probe_pdf(file_path)
+            except Exception as e:
+                # A probe bug must not cost the document: upload it unprobed
+                timer.outcome = 'error'
+                self.log('probe', f"{metadata['title'][:40]}: Probe error - {e!r}, uploading unprobed",
+                         'warning', url=metadata['url'], outcome='error', error=repr(e))
+                metadata['pdf'] = {}
+                return True
+            timer.size = info.size
+            problem = info.problem
+            if problem:
+                timer.outcome = 'error'
+        
+        if problem:
+            self.log('probe', f"{metadata['title'][:40]}: {problem}", 'warning',
+                     url=metadata['url'], outcome='error', error=problem)
+            self._note_error(metadata['url'], problem)
+            self._count('failed')
+            return False
+        metadata['pdf'] = info.upload_fields()
+        return True
+    
+    def upload_fields(self, metadata):
+        """Form fields sent with every document upload"""
+        fields = {
+            'title': metadata['title'],
+            'url': metadata['url'],
+            'date': metadata.get('date', ''),
+            'size': metadata.get('size', 0),
+            'action': 'swe3_upload_document'
+        }
+        # pdf_title, pdf_created, ... when the file was probed (not in streaming mode)
+        fields.update(metadata.get('pdf') or {})
+        # version_of, version_of_url, similarity when it is a new version of another document
+        fields.update(metadata.get('previous_version') or {})
+        return fields
+    
+    def upload_to_dms(self, file_path, metadata, content_hash=None):
+        """Upload document to DMS"""
+        with Timer(self.metrics, 'upload') as timer:
+            try:
+                timer.size = os.path.getsize(file_path)
+                with open(file_path, 'rb') as f:
+                    # Blob store paths have no .pdf extension; the DMS checks it
+                    files = {'file': (f"swe3_{metadata['id']}.pdf", f, 'application/pdf')}
+                    data = self.upload_fields(metadata)
+                    if content_hash:
+                        data['file_sha256'] = content_hash
+                    
+                    response = self.session.post(
+                        self.dms_endpoint,
+                        data=data,
+                        files=files,
+                        headers=self.dms_headers,
+                        timeout=60
+                    )
+            except Exception as e:
+                timer.outcome = 'error'
+                self.log('upload', f"{metadata['title'][:40]}: Error - {e}", 'warning',
+                         url=metadata['url'], outcome='error')
+                self._note_error(metadata['url'], f"Upload error: {e}")
+                self._count('failed')
+                return False
             
-            file_path = os.path.join(self.temp_dir, filename)
-            
-            with open(file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            
-            print(f"[DOWNLOAD] {filename[:40]}: OK ({os.path.getsize(file_path):,} bytes)")
-            self.stats['downloaded'] += 1
-            return file_path
-            
+            ok = self._check_upload_response(response, metadata)
+            timer.outcome = 'ok' if ok else 'error'
+        return ok
+    
+    def fetch_upload_capabilities(self):
+        """
+        Ask the DMS which upload modes it supports
+        
+        Returns:
+            The advertised capabilities, or None when the DMS does not
+            answer (an older DMS replies '0' to an unknown ajax action)
+        """
+        try:
+            response = self.session.get(f'{self.ajax_url}?action=swe3_upload_capabilities',
+                                        headers=self.dms_headers, timeout=15)
+            result = response.json() if response.status_code == 200 else None
+        except Exception:
+            return None
+        if not isinstance(result, dict) or not result.get('success'):
+            return None
+        return result.get('data') or {}
+    
+    def fetch_dms_manifest(self):
+        """
+        Fetch the DMS's SWE3 URL -> hash manifest in one request
+        
+        Returns:
+            Dict keyed by SWE3 URL, or None if the DMS does not provide one
+        """
+        try:
+            response = self.session.get(f'{self.ajax_url}?action=swe3_document_manifest',
+                                        headers=self.dms_headers, timeout=60)
+            result = response.json() if response.status_code == 200 else None
         except Exception as e:
-            print(f"[DOWNLOAD] {filename[:40]}: Error - {e}")
+            self.log('sync', f"Could not fetch DMS manifest: {e}", 'warning')
             return None
+        if response.status_code == 403:
+            self.log('sync', "DMS refused the document manifest (check --dms-token), "
+                     "uploading every changed document", 'warning')
+            return None
+        if not isinstance(result, dict) or not result.get('success'):
+            self.log('sync', "DMS does not provide a document manifest, uploading every changed document")
+            return None
+        
+        documents = (result.get('data') or {}).get('documents') or {}
+        self.log('sync', f"DMS holds {len(documents)} SWE3 documents", dms_documents=len(documents))
+        return documents
     
-    def upload_to_dms(self, file_path, metadata):
-        """Upload document to DMS"""
+    def unchanged_in_dms(self, metadata, file_path, content_hash):
+        """True if the DMS already has exactly this file for this SWE3 URL"""
+        if not self.dms_documents:
+            return False
+        existing = self.dms_documents.get(metadata['url'])
+        if not existing:
+            return False
+        if existing.get('sha256'):
+            return existing['sha256'] == content_hash
+        if existing.get('md5'):
+            # Documents imported by the PHP scraper only carry an md5
+            return existing['md5'] == hash_file(file_path, algorithm='md5')
+        return False
+    
+    def configure_batching(self):
+        """Enable batch uploads if the DMS advertises them, within its limits"""
+        if self.batch_size <= 1 or self.stream:
+            return
+        
+        capabilities = self.fetch_upload_capabilities()
+        if not capabilities or not capabilities.get('batch'):
+            self.log('upload', "DMS does not advertise batch uploads, sending one document per request")
+            self.batch_size = 1
+            return
+        
+        action = capabilities.get('batch_action') or 'swe3_upload_documents_batch'
+        self.batch_endpoint = f'{self.ajax_url}?action={action}'
+        if capabilities.get('max_items'):
+            self.batch_size = max(1, min(self.batch_size, int(capabilities['max_items'])))
+        if capabilities.get('max_bytes'):
+            # Leave room for the multipart framing and form fields
+            self.batch_max_bytes = max(1, min(self.batch_max_bytes, int(capabilities['max_bytes']) - 64 * 1024))
+        self.log('upload', f"Batch uploads: up to {self.batch_size} documents / "
+                 f"{self.batch_max_bytes / (1024 * 1024):.0f} MB per request",
+                 batch_size=self.batch_size, batch_max_bytes=self.batch_max_bytes)
+    
+    def upload_batch(self, batch):
+        """
+        Upload several documents in one request
+        
+        Args:
+            batch: List of (file_path, content_hash, metadata)
+        
+        Returns:
+            One success flag per item (same order), or None if the request
+            as a whole failed
+        """
+        items = []
+        files = {}
+        handles = []
+        started = time.perf_counter()
+        size = sum(os.path.getsize(entry[0]) for entry in batch)
         try:
-            with open(file_path, 'rb') as f:
-                files = {'file': f}
-                data = {
-                    'title': metadata['title'],
-                    'url': metadata['url'],
-                    'date': metadata.get('date', ''),
-                    'size': metadata.get('size', 0),
-                    'action': 'swe3_upload_document'
-                }
+            for index, (file_path, content_hash, metadata) in enumerate(batch):
+                item = self.upload_fields(metadata)
+                item.pop('action')
+                item['index'] = index
+                if content_hash:
+                    item['file_sha256'] = content_hash
+                items.append(item)
                 
-                response = requests.post(
-                    self.dms_endpoint,
-                    data=data,
-                    files=files,
-                    timeout=60
-                )
+                f = open(file_path, 'rb')
+                handles.append(f)
+                files[f'file_{index}'] = (f"swe3_{metadata['id']}.pdf", f, 'application/pdf')
             
-            if response.status_code in [200, 201]:
-                try:
-                    result = response.json()
-                    if result.get('success') or result.get('data', {}).get('post_id'):
-                        print(f"[UPLOAD] {metadata['title'][:40]}: OK (ID: {result.get('data', {}).get('post_id')})")
-                        self.stats['uploaded'] += 1
-                        return True
-                except:
-                    pass
+            self._count('batches')
+            response = self.session.post(
+                self.batch_endpoint,
+                data={'items': json.dumps(items)},
+                files=files,
+                headers=self.dms_headers,
+                timeout=60 + 15 * len(batch)
+            )
+        except Exception as e:
+            self.metrics.observe('upload_batch', time.perf_counter() - started, size, 'error')
+            self.log('upload', f"Batch of {len(batch)}: Error - {e}", 'warning', batch=len(batch), outcome='error')
+            for _, _, metadata in batch:
+                self._note_error(metadata['url'], f"Batch upload error: {e}")
+            return None
+        finally:
+            for f in handles:
+                f.close()
+        
+        try:
+            result = response.json()
+        except ValueError:
+            result = None
+        if response.status_code != 200 or not isinstance(result, dict) or not result.get('success'):
+            self.metrics.observe('upload_batch', time.perf_counter() - started, size, 'error')
+            self.log('upload', f"Batch of {len(batch)}: Failed (HTTP {response.status_code}) - {response.text[:200]}",
+                     'warning', batch=len(batch), outcome='error', status=response.status_code)
+            for _, _, metadata in batch:
+                self._note_error(metadata['url'], f"Batch upload failed (HTTP {response.status_code})")
+            return None
+        
+        self.metrics.observe('upload_batch', time.perf_counter() - started, size)
+        outcomes = [False] * len(batch)
+        for entry in (result.get('data') or {}).get('results', []):
+            index = entry.get('index')
+            if not isinstance(index, int) or not 0 <= index < len(batch):
+                continue
+            metadata = batch[index][2]
+            if entry.get('success'):
+                outcomes[index] = True
+                self.log('upload', f"{metadata['title'][:40]}: OK (ID: {entry.get('post_id')}, batch)",
+                         url=metadata['url'], outcome='ok', post_id=entry.get('post_id'), batch=len(batch))
+            else:
+                self.log('upload', f"{metadata['title'][:40]}: Failed in batch - {entry.get('error')}", 'warning',
+                         url=metadata['url'], outcome='error', error=entry.get('error'), batch=len(batch))
+                self._note_error(metadata['url'], f"Rejected in batch: {entry.get('error')}")
+        return outcomes
+    
+    def upload_documents(self, batch):
+        """
+        Upload a batch, resending only the items that failed
+        
+        Items whose batch request failed outright on every attempt (as
+        opposed to being rejected individually) get one single upload each.
+        """
+        remaining = list(batch)
+        request_failed = False
+        for attempt in range(self.batch_retries + 1):
+            if attempt:
+                self.log('upload', f"Retrying {len(remaining)} failed document(s) (attempt {attempt + 1})",
+                         documents=len(remaining), attempt=attempt + 1)
+                time.sleep(0.5 * 2 ** (attempt - 1))
             
-            # Log the error response
-            error_msg = response.text[:200] if response.text else f"HTTP {response.status_code}"
-            print(f"[UPLOAD] {metadata['title'][:40]}: Failed (HTTP {response.status_code}) - {error_msg}")
-            self.stats['failed'] += 1
-            return False
+            outcomes = self.upload_batch(remaining)
+            request_failed = outcomes is None
+            if request_failed:
+                outcomes = [False] * len(remaining)
             
+            failed = []
+            for entry, ok in zip(remaining, outcomes):
+                if ok:
+                    self._count('uploaded')
+                    self._finish_upload(*entry, True)
+                else:
+                    failed.append(entry)
+            remaining = failed
+            if not remaining:
+                return
+        
+        for file_path, content_hash, metadata in remaining:
+            if request_failed:
+                ok = self.upload_to_dms(file_path, metadata, content_hash)
+            else:
+                ok = False
+                self._count('failed')
+            self._finish_upload(file_path, content_hash, metadata, ok)
+    
+    def _check_upload_response(self, response, metadata):
+        """Count and log the DMS answer to an upload"""
+        if response.status_code in [200, 201]:
+            try:
+                result = response.json()
+                if result.get('success') or result.get('data', {}).get('post_id'):
+                    post_id = result.get('data', {}).get('post_id')
+                    self.log('upload', f"{metadata['title'][:40]}: OK (ID: {post_id})",
+                             url=metadata['url'], outcome='ok', post_id=post_id)
+                    self._count('uploaded')
+                    return True
+            except:
+                pass
+        
+        # Log the error response
+        error_msg = response.text[:200] if response.text else f"HTTP {response.status_code}"
+        self.log('upload', f"{metadata['title'][:40]}: Failed (HTTP {response.status_code}) - {error_msg}", 'warning',
+                 url=metadata['url'], outcome='error', status=response.status_code)
+        self._note_error(metadata['url'], f"Upload failed (HTTP {response.status_code}): {error_msg}")
+        self._count('failed')
+        return False
+    
+    def stream_document(self, doc_url, metadata):
+        """
+        Pipe a PDF from SWE3 straight into a DMS upload
+        
+        The SWE3 response is read chunk by chunk into a chunked multipart
+        request body; hashes are computed on the way through and sent as
+        trailing form fields. Nothing is written to disk.
+        
+        Returns:
+            (size, sha256 hex digest) on success, (None, None) on failure
+        """
+        label = metadata['title'][:40]
+        with Timer(self.metrics, 'stream') as timer:
+            try:
+                response = self.session.get(doc_url, timeout=30, stream=True)
+                if response.status_code != 200:
+                    timer.outcome = 'error'
+                    self.log('stream', f"{label}: Download failed (HTTP {response.status_code})", 'warning',
+                             url=doc_url, outcome='error', status=response.status_code)
+                    self._note_error(doc_url, f"Download failed (HTTP {response.status_code})")
+                    self._count('failed')
+                    response.close()
+                    return None, None
+                
+                with response:
+                    body = StreamingMultipartBody(
+                        self.upload_fields(metadata),
+                        response.iter_content(chunk_size=self.chunk_size),
+                        f"swe3_{metadata['id']}.pdf"
+                    )
+                    upload = self.session.post(
+                        self.dms_endpoint,
+                        data=body,
+                        headers=dict(self.dms_headers, **{'Content-Type': body.content_type}),
+                        timeout=60
+                    )
+                timer.size = body.size
+                
+                if not body.complete:
+                    timer.outcome = 'error'
+                    self.log('stream', f"{label}: Upload ended before the download finished", 'warning',
+                             url=doc_url, outcome='error')
+                    self._note_error(doc_url, "Upload ended before the download finished")
+                    self._count('failed')
+                    return None, None
+                
+                self._count('downloaded')
+                if not self._check_upload_response(upload, metadata):
+                    timer.outcome = 'error'
+                    return None, None
+                return body.size, body.sha256.hexdigest()
+                
+            except Exception as e:
+                timer.outcome = 'error'
+                self.log('stream', f"{label}: Error - {e}", 'warning', url=doc_url, outcome='error')
+                self._note_error(doc_url, f"Stream error: {e}")
+                self._count('failed')
+                return None, None
+    
+    def queue_text_extraction(self, file_path, content_hash, metadata):
+        """Text stage: extract the PDF's text in the process pool, indexing it when it comes back"""
+        key = blob_key(metadata)
+        if (not self.search_index or self.search_index.is_indexed(key, content_hash)) and \
+                (not self.fingerprints or self.fingerprints.has(key, content_hash)):
+            return
+        
+        # The blob may not be evicted before the pool has read it
+        if self.blob_store:
+            self.blob_store.pin(content_hash)
+        # Fingerprints are computed in the pool as well, next to the text
+        try:
+            future = self.text_pool.submit(file_path, fingerprint_text_timed if self.fingerprints else None)
+        except Exception:
+            if self.blob_store:
+                self.blob_store.unpin(content_hash)
+            raise
+        with self._stats_lock:
+            self._extractions[metadata['url']] = future
+        future.add_done_callback(lambda done: self._index_text(done, key, content_hash, metadata))
+    
+    def _index_text(self, future, key, content_hash, metadata):
+        """Index one extraction result (runs on the process pool's result thread)"""
+        if self.blob_store:
+            self.blob_store.unpin(content_hash)
+        url = metadata['url']
+        try:
+            result = future.result()
         except Exception as e:
-            print(f"[UPLOAD] {metadata['title'][:40]}: Error - {e}")
-            self.stats['failed'] += 1
-            return False
+            self.metrics.observe('extract', 0.0, 0, 'error')
+            self.log('index', f"{metadata['title'][:40]}: Text extraction failed - {e}", 'warning',
+                     url=url, outcome='error')
+            return
+        text, method, cpu_seconds = result[:3]
+        self.metrics.observe('extract', cpu_seconds, len(text), 'ok' if text else 'empty')
+        
+        if self.fingerprints:
+            signature, shingle_count = result[3:5]
+            try:
+                self.fingerprints.add(key, signature, url, metadata['title'], metadata.get('modified', ''),
+                                      content_hash, shingle_count)
+            except Exception as e:
+                self.log('version', f"{metadata['title'][:40]}: Fingerprinting failed - {e}", 'warning',
+                         url=url, outcome='error')
+        if not self.search_index:
+            return
+        
+        with Timer(self.metrics, 'index') as timer:
+            timer.size = len(text)
+            try:
+                added = self.search_index.add(key, text, url, metadata['title'], metadata.get('modified', ''),
+                                              content_hash)
+            except Exception as e:
+                timer.outcome = 'error'
+                self.log('index', f"{metadata['title'][:40]}: Indexing failed - {e}", 'warning',
+                         url=url, outcome='error')
+                return
+        if not added:
+            return
+        self._count('indexed')
+        self.log('index', f"{metadata['title'][:40]}: Indexed {len(text):,} characters ({method})",
+                 url=url, outcome='ok', characters=len(text), method=method, cpu_seconds=round(cpu_seconds, 4))
     
-    def run(self):
-        """Execute complete pipeline"""
-        print("\n" + "="*60)
-        print("SWE3 → BKGT DMS Pipeline")
-        print("="*60 + "\n")
-        
-        # Fetch documents
-        documents = self.fetch_all_documents()
-        if not documents:
-            print("[ERROR] No documents found!")
-            return False
+    def identify_version(self, metadata):
+        """
+        Version stage: look for an earlier version of a document under
+        another URL before it is uploaded
+        
+        Waits for the document's fingerprint from the process pool. A match
+        is sent with the upload (version_of: its DMS post when known,
+        version_of_url, similarity) so the DMS files the upload as a new
+        version of that document instead of as an unrelated one.
+        """
+        url = metadata['url']
+        with self._stats_lock:
+            future = self._extractions.get(url)
+        if future:
+            try:
+                signature = future.result()[3]
+            except Exception:
+                return
+        else:
+            signature = self.fingerprints.get(blob_key(metadata))
         
-        print(f"\n[PIPELINE] Processing {len(documents)} documents...")
+        with Timer(self.metrics, 'match') as timer:
+            match = self.fingerprints.match(signature, self.similarity_threshold, exclude_url=url)
+            timer.outcome = 'match' if match else 'none'
+        if not match:
+            return
         
-        # Process each document
-        for i, (url, metadata) in enumerate(documents.items(), 1):
-            filename = f"swe3_{metadata['id']}.pdf"
+        fields = {'version_of_url': match['url'], 'similarity': match['similarity']}
+        known = (self.dms_documents or {}).get(match['url'])
+        if known and known.get('post_id'):
+            fields['version_of'] = known['post_id']
+        metadata['previous_version'] = fields
+        self._count('versions')
+        self.log('version', f"{metadata['title'][:40]}: New version of {(match['title'] or match['url'])[:40]} "
+                 f"({match['similarity']:.0%} similar)", url=url, version_of_url=match['url'],
+                 similarity=match['similarity'])
+    
+    def _await_text_extraction(self, url):
+        """Wait until the extraction of url (if any) no longer needs its file"""
+        with self._stats_lock:
+            future = self._extractions.pop(url, None)
+        if future:
+            future.exception()
+    
+    def _mark_failed(self, metadata):
+        """Remember a document that did not make it through the pipeline"""
+        with self._stats_lock:
+            self._failed_docs.append(metadata)
+            error = self._errors.pop(metadata['url'], None)
+        self._journal(metadata['url'], FAILED, {'error': error or 'Unknown error'})
+    
+    def _fail_unexpected(self, stage, metadata, error):
+        """
+        Fail one document after an unexpected exception in a stage worker,
+        which then carries on with the next item (a dead worker would leave
+        the bounded queues feeding it blocked for good)
+        """
+        self.log(stage, f"{metadata['title'][:40]}: Unexpected error - {error!r}", 'error',
+                 url=metadata['url'], outcome='error', error=repr(error), traceback=traceback.format_exc())
+        self._note_error(metadata['url'], f"Unexpected {stage} error: {error!r}")
+        self._count('failed')
+        self._mark_failed(metadata)
+    
+    def _fail_unfinished(self, item, error):
+        """_fail_unexpected() for a queued upload, unless its outcome is already recorded"""
+        file_path, content_hash, metadata = item
+        with self._stats_lock:
+            if metadata['url'] in self._finished:
+                return
+        self._fail_unexpected('upload', metadata, error)
+        if self.blob_store:
+            self.blob_store.unpin(content_hash)
+    
+    def _download_worker(self, download_queue, upload_queue):
+        """Download stage: fetch PDFs and hand them to the upload stage"""
+        while True:
+            item = download_queue.get()
+            if item is _STOP:
+                return
             
-            file_path = self.download_document(url, filename)
-            if file_path:
-                self.upload_to_dms(file_path, metadata)
-                try:
+            url, metadata = item
+            try:
+                self._download_item(url, metadata, upload_queue)
+            except Exception as e:
+                self._fail_unexpected('download', metadata, e)
+    
+    def _download_item(self, url, metadata, upload_queue):
+        """Download, probe and queue one document"""
+        filename = f"swe3_{metadata['id']}.pdf"
+        file_path, content_hash = self.download_document(url, filename, blob_key(metadata), metadata.get('size'))
+        if not file_path:
+            self._mark_failed(metadata)
+            return
+        
+        # download_document() pinned the blob; until the pin is handed to
+        # _finish_upload() or the upload stage, an exception must drop it
+        pinned = bool(self.blob_store)
+        try:
+            if not self.probe_download(file_path, metadata):
+                # Keep neither a truncated file nor an error page for the next run
+                if self.blob_store:
+                    self.blob_store.release(blob_key(metadata))
+                    pinned = False
+                    self.blob_store.unpin(content_hash)
+                else:
                     os.remove(file_path)
-                except:
-                    pass
+                self._mark_failed(metadata)
+                return
+            
+            self._journal(url, DOWNLOADED, {'hash': content_hash})
+            if self.text_pool:
+                self.queue_text_extraction(file_path, content_hash, metadata)
+            if self.unchanged_in_dms(metadata, file_path, content_hash):
+                self.log('upload', f"{metadata['title'][:40]}: Unchanged in DMS, skipped",
+                         url=url, outcome='skipped')
+                self._count('skipped_unchanged')
+                pinned = False
+                self._finish_upload(file_path, content_hash, metadata, True, state=SKIPPED)
+            else:
+                # Blocks while the uploaders are behind (backpressure)
+                upload_queue.put((file_path, content_hash, metadata))
+                pinned = False
+        except Exception:
+            if pinned:
+                self.blob_store.unpin(content_hash)
+            raise
+    
+    def _finish_upload(self, file_path, content_hash, metadata, ok, state=UPLOADED):
+        """Record the outcome of an upload and drop the temp file (or its blob store pin)"""
+        with self._stats_lock:
+            self._finished.add(metadata['url'])
+        try:
+            if ok:
+                size = os.path.getsize(file_path)
+                self._journal(metadata['url'], state, {'size': size, 'hash': content_hash})
+                if self.manifest:
+                    self.manifest.record(metadata, size, content_hash)
+            else:
+                self._mark_failed(metadata)
+        finally:
+            if self.blob_store:
+                self.blob_store.unpin(content_hash)
+        if self.blob_store:
+            return
+        self._await_text_extraction(metadata['url'])
+        try:
+            os.remove(file_path)
+        except:
+            pass
+    
+    def _upload_worker(self, upload_queue):
+        """Upload stage: push downloaded PDFs to the DMS"""
+        if self.batch_endpoint:
+            return self._batch_upload_worker(upload_queue)
+        
+        while True:
+            item = upload_queue.get()
+            if item is _STOP:
+                return
+            
+            file_path, content_hash, metadata = item
+            try:
+                if self.fingerprints:
+                    self.identify_version(metadata)
+                ok = self.upload_to_dms(file_path, metadata, content_hash)
+                self._finish_upload(file_path, content_hash, metadata, ok)
+            except Exception as e:
+                self._fail_unfinished(item, e)
+    
+    def _batch_upload_worker(self, upload_queue):
+        """
+        Upload stage, batched: gather up to batch_size files (and at most
+        batch_max_bytes) per request, sending a partial batch when no more
+        files arrive within BATCH_WAIT seconds
+        """
+        pending = None
+        stopping = False
+        while True:
+            if pending is None:
+                if stopping:
+                    return
+                item = upload_queue.get()
+                if item is _STOP:
+                    return
+            else:
+                item, pending = pending, None
+            
+            batch_bytes = self._queued_size(item)
+            if batch_bytes is None:
+                continue
+            batch = [item]
+            while not stopping and len(batch) < self.batch_size:
+                try:
+                    item = upload_queue.get(timeout=BATCH_WAIT)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                size = self._queued_size(item)
+                if size is None:
+                    continue
+                if batch_bytes + size > self.batch_max_bytes:
+                    pending = item
+                    break
+                batch.append(item)
+                batch_bytes += size
+            
+            try:
+                if self.fingerprints:
+                    for _, _, metadata in batch:
+                        self.identify_version(metadata)
+                self.upload_documents(batch)
+            except Exception as e:
+                for item in batch:
+                    self._fail_unfinished(item, e)
+    
+    def _queued_size(self, item):
+        """Size of a queued file, or None (and the document failed) if the file is gone"""
+        file_path, content_hash, metadata = item
+        try:
+            return os.path.getsize(file_path)
+        except OSError as e:
+            self.log('upload', f"{metadata['title'][:40]}: Downloaded file missing - {e}", 'warning',
+                     url=metadata['url'], outcome='error')
+            self._note_error(metadata['url'], f"Downloaded file missing: {e}")
+            self._count('failed')
+            self._finish_upload(file_path, content_hash, metadata, False)
+            return None
+    
+    def _stream_worker(self, work_queue):
+        """Streaming mode: download and upload each document in one pass"""
+        while True:
+            item = work_queue.get()
+            if item is _STOP:
+                return
+            
+            url, metadata = item
+            try:
+                size, content_hash = self.stream_document(url, metadata)
+                if size is None:
+                    self._mark_failed(metadata)
+                    continue
+                self._journal(url, UPLOADED, {'size': size, 'hash': content_hash})
+                if self.manifest:
+                    self.manifest.record(metadata, size, content_hash)
+            except Exception as e:
+                self._fail_unexpected('stream', metadata, e)
+    
+    def report_removed(self):
+        """Report (and forget) manifest entries that disappeared upstream"""
+        current_ids = self.fetch_media_ids()
+        if current_ids is None:
+            self.log('sync', "Could not list media ids, skipping removal check", 'warning')
+            return
+        
+        self.removed = self.manifest.removed(current_ids)
+        for doc in self.removed:
+            self.log('sync', f"Removed upstream: {doc.get('title') or doc['id']} ({doc.get('source_url')})",
+                     url=doc.get('source_url'), outcome='removed', media_id=doc['id'])
+        
+        self.stats['removed'] = len(self.removed)
+        if self.blob_store:
+            for doc in self.removed:
+                self.blob_store.release(blob_key({'url': doc.get('source_url'), 'modified': doc.get('modified')}))
+        self.manifest.forget(doc['id'] for doc in self.removed)
+    
+    def _run_staged(self, documents):
+        """Download and upload through separate bounded worker pools"""
+        self.log('pipeline', f"Processing {len(documents)} documents "
+                 f"({self.download_workers} download / {self.upload_workers} upload workers)...",
+                 documents=len(documents), download_workers=self.download_workers, upload_workers=self.upload_workers)
+        
+        download_queue = queue.Queue()
+        upload_queue = queue.Queue(maxsize=self.queue_size)
+        
+        for url, metadata in documents.items():
+            download_queue.put((url, metadata))
+        for _ in range(self.download_workers):
+            download_queue.put(_STOP)
+        
+        downloaders = [
+            threading.Thread(target=self._download_worker, args=(download_queue, upload_queue), daemon=True)
+            for _ in range(self.download_workers)
+        ]
+        uploaders = [
+            threading.Thread(target=self._upload_worker, args=(upload_queue,), daemon=True)
+            for _ in range(self.upload_workers)
+        ]
+        for worker in downloaders + uploaders:
+            worker.start()
+        
+        for worker in downloaders:
+            worker.join()
+        for _ in range(self.upload_workers):
+            upload_queue.put(_STOP)
+        for worker in uploaders:
+            worker.join()
+    
+    def _run_streaming(self, documents):
+        """Stream every document from SWE3 to the DMS without temp files"""
+        self.log('pipeline', f"Streaming {len(documents)} documents "
+                 f"({self.download_workers} workers, {self.chunk_size:,} byte chunks)...",
+                 documents=len(documents), workers=self.download_workers, chunk_size=self.chunk_size)
+        
+        work_queue = queue.Queue()
+        for url, metadata in documents.items():
+            work_queue.put((url, metadata))
+        for _ in range(self.download_workers):
+            work_queue.put(_STOP)
+        
+        workers = [
+            threading.Thread(target=self._stream_worker, args=(work_queue,), daemon=True)
+            for _ in range(self.download_workers)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    
+    def skip_finished(self, documents):
+        """
+        Drop documents the resumed run already finished
+        
+        Their journaled size and hash go into the manifest, which was not
+        saved when the run was interrupted. Earlier failures are retried.
+        """
+        remaining = {}
+        for url, doc in documents.items():
+            if self.journal.is_done(url):
+                self.stats['resumed_done'] += 1
+                detail = self.journal.previous[url]['detail']
+                if self.manifest:
+                    self.manifest.record(doc, detail.get('size'), detail.get('hash'))
+                continue
+            failure = self.journal.last_failure(url)
+            if failure:
+                self.log('resume', f"Retrying {doc['title'][:40]} (failed {failure['attempts']}x, "
+                         f"last error: {failure.get('error')})",
+                         url=url, attempts=failure['attempts'], error=failure.get('error'))
+            remaining[url] = doc
+        self.log('resume', f"{self.stats['resumed_done']} documents already done, {len(remaining)} to go",
+                 done=self.stats['resumed_done'], remaining=len(remaining))
+        return remaining
+    
+    def run(self):
+        """Execute complete pipeline (journaled when a journal is set)"""
+        if not self.journal:
+            return self._run()
+        
+        resumed = self.journal.begin(self.resume)
+        if self.resume and not resumed:
+            self.log('resume', "No unfinished run in the journal, starting a new one")
+        status = INTERRUPTED
+        try:
+            success = self._run(resumed)
+            status = COMPLETED if success else FAILED_RUN
+            return success
+        finally:
+            # Also reached on SIGTERM/KeyboardInterrupt, leaving the run resumable
+            self.journal.finish(status)
+    
+    def _run(self, resumed=False):
+        self.log('pipeline', "SWE3 → BKGT DMS Pipeline", swe3_url=self.swe3_url, dms_url=self.dms_url,
+                 stream=self.stream, resumed=resumed)
+        
+        # Fetch documents (a resumed run reuses its journaled listing)
+        modified_after = self.manifest.watermark if self.manifest else None
+        if resumed and self.journal.listing_complete:
+            documents = {doc['url']: doc for doc in self.journal.listed_documents()}
+            self.stats['fetched'] = len(documents)
+            self.log('resume', f"Resuming run {self.journal.run_id} with its {len(documents)} listed documents",
+                     run_id=self.journal.run_id, documents=len(documents))
+        else:
+            documents = self.fetch_all_documents(modified_after=modified_after)
+            if documents is None or (not documents and not modified_after):
+                self.log('error', "No documents found!", 'error')
+                return False
+            # A partial listing is not journaled, so a resume lists again
+            if self.journal and self.listing_complete:
+                self.journal.record_listing(documents.values())
+        
+        listed = list(documents.values())
+        if resumed:
+            documents = self.skip_finished(documents)
+        if self.manifest:
+            documents = {url: doc for url, doc in documents.items() if self.manifest.is_changed(doc)}
+            self.stats['unchanged'] = len(listed) - len(documents)
+            if self.listing_complete:
+                self.report_removed()
+        
+        if self.stream:
+            # Streamed files are hashed only as they are uploaded, too late to skip them
+            if self.search_index or self.fingerprints:
+                self.log('index', "Text extraction needs downloaded files, not indexing a streamed run", 'warning')
+            self._run_streaming(documents)
+        else:
+            if documents:
+                if self.reconcile:
+                    self.dms_documents = self.fetch_dms_manifest()
+                self.configure_batching()
+                if self.search_index or self.fingerprints:
+                    from swe3_pdf_text import TextExtractionPool
+                    self.text_pool = TextExtractionPool(self.extract_workers)
+                    self.log('index', f"Extracting text in {self.text_pool.workers} processes",
+                             workers=self.text_pool.workers)
+            try:
+                self._run_staged(documents)
+            finally:
+                if self.text_pool:
+                    # Blob store files outlive the uploads; let their extractions finish
+                    self.text_pool.shutdown(wait=True)
+                    self.text_pool = None
+        
+        if self.manifest:
+            # Items on a page that failed may be older than the new watermark
+            if self.listing_complete:
+                self.manifest.advance_watermark(listed, self._failed_docs)
+            self.manifest.save()
+        if self.blob_store:
+            # Blobs pinned during the run may have pushed the store over its quota
+            self.blob_store.evict()
+            self.blob_store.save()
+        if self.session.controller:
+            self.stats['rate_limits'] = self.session.controller.snapshot()
         
         # Report results
-        print(f"\n" + "="*60)
-        print("Pipeline Complete")
-        print("="*60)
-        print(f"Fetched:   {self.stats['fetched']}")
-        print(f"Downloaded: {self.stats['downloaded']}")
-        print(f"Uploaded:   {self.stats['uploaded']}")
-        print(f"Failed:     {self.stats['failed']}")
-        print("="*60 + "\n")
-        
-        return self.stats['failed'] == 0
+        for name, value in self.stats.items():
+            if isinstance(value, int):
+                self.metrics.set_gauge(f'documents_{name}', value)
+        success = self.stats['failed'] == 0 and self.listing_complete
+        self.metrics.set_gauge('success', int(success))
+        self.metrics.set_gauge('run_seconds', round(time.time() - self.metrics.started, 3))
+        for host, limits in self.stats['rate_limits'].items():
+            self.log('rate', f"{host}: {limits['rate']} req/s, {limits['concurrency']} concurrent "
+                     f"({limits['throttled']} throttled, {limits['decreases']} slowdowns)", host=host, **limits)
+        self.log('summary', "Pipeline complete: " + ", ".join(
+            f"{name} {value}" for name, value in self.stats.items() if isinstance(value, int)
+        ), stats={name: value for name, value in self.stats.items() if isinstance(value, int)})
+        
+        return success
+
+def parse_args(argv=None):
+    """Parse command line options, defaulting to the environment"""
+    parser = argparse.ArgumentParser(description='Sync SWE3 documents into the BKGT DMS')
+    parser.add_argument('--dms-url', default=os.environ.get('LEDARE_DMS_URL', 'https://ledare.bkgt.se'),
+                        help='DMS base URL (env: LEDARE_DMS_URL)')
+    parser.add_argument('--dms-token', default=os.environ.get('LEDARE_DMS_TOKEN'),
+                        help="The DMS's BKGT_SWE3_UPLOAD_TOKEN, needed for batch uploads, the document "
+                             "manifest and versioning (env: LEDARE_DMS_TOKEN)")
+    parser.add_argument('--list-workers', type=int, default=int(os.environ.get('SWE3_LIST_WORKERS', 8)),
+                        help='Concurrent media library page fetches (env: SWE3_LIST_WORKERS)')
+    parser.add_argument('--download-workers', type=int, default=int(os.environ.get('SWE3_DOWNLOAD_WORKERS', 4)),
+                        help='Concurrent PDF downloads (env: SWE3_DOWNLOAD_WORKERS)')
+    parser.add_argument('--upload-workers', type=int, default=int(os.environ.get('SWE3_UPLOAD_WORKERS', 2)),
+                        help='Concurrent DMS uploads (env: SWE3_UPLOAD_WORKERS)')
+    parser.add_argument('--queue-size', type=int, default=int(os.environ.get('SWE3_QUEUE_SIZE', 8)),
+                        help='Downloaded files allowed to wait for upload (env: SWE3_QUEUE_SIZE)')
+    parser.add_argument('--manifest', default=os.environ.get('SWE3_MANIFEST', os.path.join(default_state_dir(), 'manifest.json')),
+                        help='Sync manifest used for incremental runs (env: SWE3_MANIFEST)')
+    parser.add_argument('--full', action='store_true',
+                        help='Ignore the manifest and re-sync every document')
+    parser.add_argument('--blob-dir', default=os.environ.get('SWE3_BLOB_DIR', os.path.join(default_state_dir(), 'blobs')),
+                        help='Content-addressed PDF store (env: SWE3_BLOB_DIR)')
+    parser.add_argument('--blob-quota-mb', type=int, default=int(os.environ.get('SWE3_BLOB_QUOTA_MB', 1024)),
+                        help='Disk quota for the PDF store in MB, 0 disables the store (env: SWE3_BLOB_QUOTA_MB)')
+    parser.add_argument('--stream', action='store_true', default=os.environ.get('SWE3_STREAM') == '1',
+                        help='Pipe PDFs from SWE3 straight into the DMS upload, no temp files (env: SWE3_STREAM=1)')
+    parser.add_argument('--chunk-size', type=int, default=int(os.environ.get('SWE3_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)),
+                        help='Streaming buffer size in bytes (env: SWE3_CHUNK_SIZE)')
+    parser.add_argument('--batch-size', type=int, default=int(os.environ.get('SWE3_BATCH_SIZE', DEFAULT_BATCH_SIZE)),
+                        help='Documents per upload request when the DMS supports batches, 1 disables (env: SWE3_BATCH_SIZE)')
+    parser.add_argument('--batch-max-mb', type=float,
+                        default=float(os.environ.get('SWE3_BATCH_MAX_MB', DEFAULT_BATCH_MAX_BYTES / (1024 * 1024))),
+                        help='Upper bound on file bytes per batch request in MB (env: SWE3_BATCH_MAX_MB)')
+    parser.add_argument('--no-reconcile', dest='reconcile', action='store_false',
+                        help="Upload changed documents without checking the DMS's hash manifest first")
+    parser.add_argument('--max-rate', type=float, default=float(os.environ.get('SWE3_MAX_RATE', DEFAULT_MAX_RATE)),
+                        help='Ceiling of the adaptive per-host request rate in req/s, 0 disables pacing (env: SWE3_MAX_RATE)')
+    parser.add_argument('--log-format', choices=LOG_FORMATS, default=os.environ.get('SWE3_LOG_FORMAT', 'ndjson'),
+                        help='Event log on stderr: one JSON object per line, or "[STAGE] message" text (env: SWE3_LOG_FORMAT)')
+    parser.add_argument('--metrics-file', default=os.environ.get('SWE3_METRICS_FILE'),
+                        help='Write per-stage metrics here in Prometheus textfile format (env: SWE3_METRICS_FILE)')
+    parser.add_argument('--journal', default=os.environ.get('SWE3_JOURNAL', default_journal_path(default_state_dir())),
+                        help='Run journal used by --resume, empty disables it (env: SWE3_JOURNAL)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the last interrupted or failed run, retrying only what did not finish')
+    parser.add_argument('--extract-text', action='store_true', default=os.environ.get('SWE3_EXTRACT_TEXT') == '1',
+                        help='Extract the text of downloaded PDFs into the search index (env: SWE3_EXTRACT_TEXT=1)')
+    parser.add_argument('--search-index', default=os.environ.get('SWE3_SEARCH_INDEX', default_index_path(default_state_dir())),
+                        help='Full-text index used by --extract-text and swe3_search_index.py (env: SWE3_SEARCH_INDEX)')
+    parser.add_argument('--extract-workers', type=int, default=int(os.environ.get('SWE3_EXTRACT_WORKERS', 0)) or None,
+                        help='Text extraction processes, default one per CPU (env: SWE3_EXTRACT_WORKERS)')
+    parser.add_argument('--detect-versions', action='store_true', default=os.environ.get('SWE3_DETECT_VERSIONS') == '1',
+                        help='Upload near-duplicates of a document under another URL as a new version of it (env: SWE3_DETECT_VERSIONS=1)')
+    parser.add_argument('--fingerprints', default=os.environ.get('SWE3_FINGERPRINTS', default_fingerprint_path(default_state_dir())),
+                        help='Fingerprint index used by --detect-versions and swe3_fingerprint.py (env: SWE3_FINGERPRINTS)')
+    parser.add_argument('--similarity', type=float, default=float(os.environ.get('SWE3_SIMILARITY', DEFAULT_THRESHOLD)),
+                        help='Estimated text similarity (0-1) from which a document is another version (env: SWE3_SIMILARITY)')
+    return parser.parse_args(argv)
 
 def main():
     """Main entry point"""
-    # Detect DMS URL from environment or use default
-    dms_url = os.environ.get('LEDARE_DMS_URL', 'https://ledare.bkgt.se')
+    args = parse_args()
+    dms_url = args.dms_url
+    events = EventLog(log_format=args.log_format)
+    if args.resume and not args.journal:
+        events.emit('error', "--resume needs a journal", 'error')
+        return 2
+    if args.detect_versions and not args.dms_token:
+        events.emit('config', "--detect-versions without --dms-token: the DMS will store "
+                    "versions as new documents", 'warning')
+    
+    # Let cron/systemd stops unwind normally so the journal is flushed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    journal = SWE3RunJournal(args.journal) if args.journal else None
+    search_index = SWE3SearchIndex(args.search_index) if args.extract_text else None
+    fingerprints = SWE3FingerprintIndex(args.fingerprints) if args.detect_versions else None
     
-    pipeline = SWE3_DMS_Pipeline(dms_url)
-    success = pipeline.run()
+    pipeline = SWE3_DMS_Pipeline(
+        dms_url,
+        list_workers=args.list_workers,
+        download_workers=args.download_workers,
+        upload_workers=args.upload_workers,
+        queue_size=args.queue_size,
+        manifest=None if args.full else SWE3Manifest(args.manifest),
+        blob_store=SWE3BlobStore(args.blob_dir, args.blob_quota_mb * 1024 * 1024) if args.blob_quota_mb > 0 and not args.stream else None,
+        stream=args.stream,
+        chunk_size=args.chunk_size,
+        batch_size=args.batch_size,
+        batch_max_bytes=int(args.batch_max_mb * 1024 * 1024),
+        reconcile=args.reconcile,
+        journal=journal,
+        resume=args.resume,
+        max_rate=args.max_rate,
+        events=events,
+        search_index=search_index,
+        extract_workers=args.extract_workers,
+        fingerprints=fingerprints,
+        similarity_threshold=args.similarity,
+        dms_token=args.dms_token
+    )
+    index_summary = None
+    fingerprint_summary = None
+    try:
+        success = pipeline.run()
+    finally:
+        if journal:
+            journal.close()
+        if search_index:
+            index_summary = dict(search_index.summary(), **search_index.stats)
+            search_index.close()
+        if fingerprints:
+            fingerprint_summary = dict(fingerprints.summary(), **fingerprints.stats)
+            fingerprints.close()
+        if args.metrics_file:
+            pipeline.metrics.write_textfile(args.metrics_file)
     
     # Output JSON summary
     summary = {
         'success': success,
         'timestamp': datetime.utcnow().isoformat() + 'Z',
         'stats': pipeline.stats,
+        'listing': pipeline.media_client.stats,
+        'removed': pipeline.removed,
+        'blob_store': pipeline.blob_store.stats if pipeline.blob_store else None,
+        'journal': {'run_id': journal.run_id, **journal.stats} if journal else None,
+        'search_index': index_summary,
+        'fingerprints': fingerprint_summary,
+        'http_cache': pipeline.session.cache.stats if pipeline.session.cache else None,
+        'metrics': pipeline.metrics.to_dict(),
         'dms_url': dms_url
     }
     
-    print("JSON Summary:")
+    # stdout carries only the summary; the event log is on stderr
     print(json.dumps(summary, indent=2))
     
     return 0 if success else 1
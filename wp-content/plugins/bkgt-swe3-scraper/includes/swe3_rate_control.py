@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+SWE3 Rate Control
+Per-host request pacing for the shared HTTP session. Each host gets a token
+bucket (a requests-per-second ceiling) and an AIMD concurrency limit:
+
+- every healthy response raises the limit by 1/limit (about +1 per round
+  of requests), except just below the level that was last throttled: that
+  level is only probed once per probe interval, which doubles each time
+  the probe is throttled again and halves each time it is not
+- a 429/503 or a latency spike halves it; at most one cut per COOLDOWN,
+  so a burst of errors from requests already in flight is one signal
+- Retry-After pauses the host's bucket until the server asked us to
+  come back
+"""
+
+import email.utils
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+# Responses that mean "slow down"
+THROTTLE_STATUSES = (429, 503)
+
+DEFAULT_MAX_RATE = 50.0
+DEFAULT_CONCURRENCY = 8
+DEFAULT_MAX_CONCURRENCY = 64
+
+# Seconds between two multiplicative decreases
+COOLDOWN = 1.0
+
+# Bounds of the interval between probes above the last throttled level (seconds)
+MIN_PROBE_INTERVAL = 1.0
+MAX_PROBE_INTERVAL = 60.0
+
+# A response this many times slower than the running average is a spike...
+SPIKE_FACTOR = 4.0
+# ...provided it took at least this long (seconds) and the average has settled
+SPIKE_MIN_SECONDS = 1.0
+SPIKE_MIN_SAMPLES = 10
+
+# Longest Retry-After honoured (seconds)
+MAX_RETRY_AFTER = 120.0
+
+
+def parse_retry_after(value, now=None) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return min(float(value), MAX_RETRY_AFTER)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    seconds = when.timestamp() - (now if now is not None else time.time())
+    return min(max(0.0, seconds), MAX_RETRY_AFTER)
+
+
+class TokenBucket:
+    """Blocking token bucket with a burst of one second's worth of requests"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping as needed; returns the seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                else:
+                    # Burst capacity of one second's worth of requests
+                    self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return waited
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds: float):
+        """Hand out no tokens for the next `seconds`"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+
+class HostLimiter:
+    """Token bucket plus AIMD concurrency limit for one host"""
+
+    def __init__(self, host: str, max_rate: float = DEFAULT_MAX_RATE,
+                 concurrency: int = DEFAULT_CONCURRENCY, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self.host = host
+        self.max_concurrency = max(1, max_concurrency)
+        self.bucket = TokenBucket(max_rate)
+        self.limit = float(min(concurrency, self.max_concurrency))
+        # Concurrency limit when last throttled, and how often to probe it
+        self.ceiling = None
+        self.probe_interval = MIN_PROBE_INTERVAL
+        self.in_flight = 0
+        self.latency = None
+        self.samples = 0
+        self.stats = {'requests': 0, 'throttled': 0, 'spikes': 0, 'decreases': 0, 'wait_seconds': 0.0}
+        self._last_decrease = 0.0
+        self._last_probe = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Block until a concurrency slot and a rate token are free"""
+        started = time.monotonic()
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+        self.bucket.acquire()
+        with self._cond:
+            self.stats['wait_seconds'] += time.monotonic() - started
+
+    def observe(self, status: Optional[int], seconds: float, retry_after: Optional[str] = None) -> Optional[float]:
+        """
+        Adapt to how a request went (its slot is given back with done())
+
+        Args:
+            status: HTTP status, or None if the request raised
+            seconds: Time until the response headers arrived
+            retry_after: Retry-After header of the response
+
+        Returns:
+            The honoured Retry-After in seconds, if any
+        """
+        wait = parse_retry_after(retry_after) if status in THROTTLE_STATUSES else None
+        with self._cond:
+            self.stats['requests'] += 1
+
+            if status in THROTTLE_STATUSES:
+                self.stats['throttled'] += 1
+                self._decrease()
+            elif status is not None and status < 500:
+                spike = (self.samples >= SPIKE_MIN_SAMPLES and seconds >= SPIKE_MIN_SECONDS
+                         and seconds > SPIKE_FACTOR * self.latency)
+                if spike:
+                    self.stats['spikes'] += 1
+                    self._decrease()
+                else:
+                    self._increase()
+                self.latency = seconds if self.latency is None else 0.9 * self.latency + 0.1 * seconds
+                self.samples += 1
+            # A smaller limit may let nobody in; a bigger one may let a waiter in
+            self._cond.notify_all()
+
+        if wait:
+            self.bucket.pause(wait)
+        return wait
+
+    def done(self):
+        """Give a concurrency slot back"""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _increase(self):
+        if self.ceiling is None or self.limit < self.ceiling - 1:
+            self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            return
+        
+        now = time.monotonic()
+        if now - self._last_probe < self.probe_interval:
+            return
+        if self._last_probe > self._last_decrease:
+            # The previous probe was not throttled: the host takes more
+            self.probe_interval = max(MIN_PROBE_INTERVAL, self.probe_interval / 2)
+            self.ceiling = max(self.ceiling, self.limit + 1)
+        self._last_probe = now
+        self.limit = min(self.max_concurrency, int(self.limit) + 1.0)
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self._last_decrease < COOLDOWN:
+            return
+        if self._last_probe and now - self._last_probe < self.probe_interval:
+            # Throttled right after probing: wait longer before the next probe
+            self.probe_interval = min(MAX_PROBE_INTERVAL, self.probe_interval * 2)
+        self._last_decrease = now
+        self.stats['decreases'] += 1
+        self.ceiling = self.limit
+        self.limit = max(1.0, self.limit / 2)
+
+    def snapshot(self) -> Dict:
+        """Current limits and counters"""
+        with self._cond:
+            return dict(
+                self.stats,
+                concurrency=int(self.limit),
+                probe_interval=self.probe_interval,
+                rate=round(self.bucket.rate, 2),
+                in_flight=self.in_flight,
+                latency_ms=round(self.latency * 1000, 1) if self.latency is not None else None,
+                wait_seconds=round(self.stats['wait_seconds'], 3)
+            )
+
+
+class RateController:
+    """HostLimiter per host, created on first use"""
+
+    def __init__(self, max_rate: float = DEFAULT_MAX_RATE,
+                 concurrency: int = DEFAULT_CONCURRENCY, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self.settings = {'max_rate': max_rate, 'concurrency': concurrency, 'max_concurrency': max_concurrency}
+        self.hosts: Dict[str, HostLimiter] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, url: str) -> HostLimiter:
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            limiter = self.hosts.get(host)
+            if limiter is None:
+                limiter = self.hosts[host] = HostLimiter(host, **self.settings)
+            return limiter
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Limits per host, for run stats"""
+        with self._lock:
+            hosts = list(self.hosts.values())
+        return {limiter.host: limiter.snapshot() for limiter in hosts}
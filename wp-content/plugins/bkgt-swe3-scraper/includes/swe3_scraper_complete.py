@@ -4,92 +4,92 @@ Complete SWE3 Document Scraper
 Fetches ALL documents from the WordPress REST API with proper pagination
 """
 
-import requests
+import argparse
 import json
 import sys
 from datetime import datetime
 
-def scrape_all_documents():
+from swe3_media_client import MEDIA_FIELDS, PDF_MIME_TYPE, SWE3MediaClient, SWE3MediaItem
+from swe3_output import NDJSONWriter, add_output_argument
+
+SOURCE = 'WordPress Media Library REST API (Complete Pagination)'
+
+def iter_all_documents(client):
+    """Yield each unique PDF document as soon as its page is parsed"""
+    # Only URLs are remembered, so memory stays flat however big the library
+    seen = set()
+    
+    # Pages arrive in order; server already filtered to PDFs
+    for page, items in enumerate(client.iter_pages({'mime_type': PDF_MIME_TYPE, '_fields': MEDIA_FIELDS}), 1):
+        for item in items:
+            doc = SWE3MediaItem.from_api(item)
+            # Skip duplicate URLs
+            if doc.url not in seen:
+                seen.add(doc.url)
+                yield doc.to_dict()
+        
+        print(f"  Page {page}: Found {len(items)} PDFs", file=sys.stderr)
+    
+    # A failed page is skipped by the client; never report that as complete
+    if not client.listing_complete:
+        raise RuntimeError(f"Incomplete listing: a media page from {client.api_url} could not be fetched")
+
+def scrape_all_documents(client=None):
     """Fetch all PDF documents from SWE3 WordPress REST API"""
-    base_url = 'https://amerikanskfotboll.swe3.se/wp-json/wp/v2/media'
-    documents = {}
-    total_pages = 0
-    total_items = 0
+    client = client or SWE3MediaClient()
+    
+    print(f"Fetching SWE3 complete media library: {client.api_url}", file=sys.stderr)
+    
+    # Store by URL as key
+    documents = {doc['url']: doc for doc in iter_all_documents(client)}
     
-    print(f"Fetching SWE3 complete media library: {base_url}")
+    return documents, client.stats['requests'], client.total_items or len(documents)
+
+def stream_all_documents(client=None, writer=None):
+    """Write each unique PDF document as an NDJSON record, then a summary record"""
+    client = client or SWE3MediaClient()
+    writer = writer or NDJSONWriter()
+    
+    print(f"Fetching SWE3 complete media library: {client.api_url}", file=sys.stderr)
     
-    # Paginate through all media
-    for page in range(1, 100):  # Safety limit at 100 pages
-        try:
-            url = f"{base_url}?per_page=100&page={page}"
-            response = requests.get(url, timeout=15)
-            
-            if response.status_code != 200:
-                print(f"  Page {page}: Status {response.status_code} - stopping pagination")
-                break
-            
-            data = response.json()
-            
-            # Check if we got results
-            if not data or len(data) == 0:
-                print(f"  Page {page}: No results - pagination complete")
-                break
-            
-            page_pdfs = 0
-            total_items += len(data)
-            
-            # Filter and process PDFs
-            for item in data:
-                if item.get('mime_type') == 'application/pdf':
-                    doc_id = item.get('id')
-                    
-                    # Extract title
-                    title = item.get('title', {})
-                    if isinstance(title, dict):
-                        title = title.get('rendered', '')
-                    if not title:
-                        title = item.get('slug', f'Document {doc_id}')
-                    
-                    # Get file info
-                    url = item.get('source_url', '')
-                    media_details = item.get('media_details', {})
-                    file_size = media_details.get('filesize', 0)
-                    
-                    # Store by URL as key to avoid duplicates
-                    documents[url] = {
-                        'id': doc_id,
-                        'title': title,
-                        'url': url,
-                        'mime_type': item.get('mime_type'),
-                        'date': item.get('date'),
-                        'modified': item.get('modified'),
-                        'size': file_size
-                    }
-                    page_pdfs += 1
-            
-            print(f"  Page {page}: Found {page_pdfs} PDFs (total items: {len(data)})")
-            total_pages = page
-            
-        except requests.exceptions.RequestException as e:
-            print(f"  Page {page}: Error - {e}")
-            continue
-        except json.JSONDecodeError as e:
-            print(f"  Page {page}: JSON decode error - {e}")
-            continue
+    error = None
+    try:
+        for doc in iter_all_documents(client):
+            writer.document(doc)
+    except Exception as e:
+        error = str(e)
+        print(f"\n✗ Error after {writer.count} documents: {error}", file=sys.stderr)
     
-    return documents, total_pages, total_items
+    writer.summary(
+        error is None,
+        error,
+        pages_fetched=client.stats['requests'],
+        total_media_items=client.total_items or writer.count,
+        fetched_at=datetime.utcnow().isoformat() + 'Z',
+        source=SOURCE,
+        transfer=client.stats
+    )
+    return 0 if error is None else 1
 
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(description='List every SWE3 media library PDF')
+    add_output_argument(parser)
+    args = parser.parse_args()
+    
+    if args.output == 'ndjson':
+        return stream_all_documents()
+    
     try:
         # Fetch all documents
-        documents, pages_fetched, total_items = scrape_all_documents()
+        client = SWE3MediaClient()
+        documents, pages_fetched, total_items = scrape_all_documents(client)
         
         # Convert to sorted list
         doc_list = sorted(documents.values(), key=lambda x: x.get('date', ''), reverse=True)
         
-        print(f"\n✓ Found {len(documents)} unique PDF documents")
-        print(f"  Fetched {pages_fetched} pages with {total_items} total media items")
+        print(f"\n✓ Found {len(documents)} unique PDF documents", file=sys.stderr)
+        print(f"  Fetched {pages_fetched} pages with {total_items} total media items", file=sys.stderr)
         
         # Output JSON
         output = {
@@ -98,15 +98,15 @@ def main():
             'pages_fetched': pages_fetched,
             'total_media_items': total_items,
             'fetched_at': datetime.utcnow().isoformat() + 'Z',
-            'source': 'WordPress Media Library REST API (Complete Pagination)',
+            'source': SOURCE,
+            'transfer': client.stats,
             'documents': doc_list
         }
         
-        print(f"\n=== JSON Output ===")
         print(json.dumps(output, indent=2, ensure_ascii=False))
         
         return 0
-        
+    
     except Exception as e:
         error_output = {
             'success': False,
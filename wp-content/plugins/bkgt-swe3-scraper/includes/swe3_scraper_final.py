@@ -5,71 +5,49 @@ Fetches PDFs from WordPress Media Library via REST API
 This is the correct approach - simple, reliable, and doesn't require browser rendering
 """
 
+import argparse
 import requests
 import json
 import sys
-from typing import List, Dict
+from typing import List, Dict, Iterator
 from datetime import datetime
 
-def scrape_swe3_documents() -> Dict:
+from swe3_media_client import SWE3MediaClient
+from swe3_output import NDJSONWriter, add_output_argument
+
+SOURCE = 'WordPress Media Library REST API'
+
+def iter_swe3_documents(client: SWE3MediaClient) -> Iterator[Dict]:
+    """
+    Yield each PDF document as soon as its media page is parsed
+    
+    Raises RuntimeError at the end if a page failed, so a listing with
+    missing documents is never reported as a success.
+    """
+    # Server filters to PDFs and returns only the fields we use
+    for doc in client.iter_documents():
+        yield doc.to_dict()
+    if not client.listing_complete:
+        raise RuntimeError(f'Incomplete listing: a media page from {client.api_url} could not be fetched')
+
+def scrape_swe3_documents(client: SWE3MediaClient = None) -> Dict:
     """
     Fetch all PDF documents from SWE3 WordPress Media Library
     
+    Args:
+        client: Media client to reuse (a long-running worker keeps one warm)
+    
     Returns:
         Dict with success status, documents array, and metadata
     """
-    base_url = 'https://amerikanskfotboll.swe3.se'
-    api_url = f'{base_url}/wp-json/wp/v2/media'
+    client = client or SWE3MediaClient()
     
-    print(f'Fetching SWE3 media library: {api_url}')
+    print(f'Fetching SWE3 media library: {client.api_url}', file=sys.stderr)
     
     try:
-        # Fetch all media items
-        all_documents = []
-        page = 1
-        per_page = 100
-        
-        while True:
-            url = f'{api_url}?per_page={per_page}&page={page}'
-            print(f'  Fetching page {page}...')
-            
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
-            media_items = response.json()
-            
-            if not media_items:
-                break
-            
-            # Filter for PDFs only
-            for item in media_items:
-                mime_type = item.get('mime_type', '').lower()
-                
-                if mime_type == 'application/pdf':
-                    doc = {
-                        'id': item.get('id'),
-                        'title': item.get('title', {}).get('rendered', 'Document'),
-                        'url': item.get('source_url', ''),
-                        'mime_type': mime_type,
-                        'date': item.get('date', ''),
-                        'modified': item.get('modified', ''),
-                        'size': item.get('media_details', {}).get('filesize', 0),
-                    }
-                    
-                    # Normalize title (remove HTML entities)
-                    if '&' in doc['title']:
-                        import html
-                        doc['title'] = html.unescape(doc['title'])
-                    
-                    all_documents.append(doc)
-            
-            # Check if there are more pages
-            if len(media_items) < per_page:
-                break
-            
-            page += 1
+        all_documents = list(iter_swe3_documents(client))
         
-        print(f'\n✓ Found {len(all_documents)} PDF documents')
+        print(f'\n✓ Found {len(all_documents)} PDF documents', file=sys.stderr)
         
         # Sort by modified date (newest first)
         all_documents.sort(
@@ -82,10 +60,11 @@ def scrape_swe3_documents() -> Dict:
             'count': len(all_documents),
             'documents': all_documents,
             'fetched_at': datetime.utcnow().isoformat(),
-            'source': 'WordPress Media Library REST API',
+            'source': SOURCE,
+            'transfer': client.stats,
         }
         
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, RuntimeError) as e:
         return {
             'success': False,
             'error': f'HTTP Error: {str(e)}',
@@ -100,24 +79,69 @@ def scrape_swe3_documents() -> Dict:
             'documents': [],
         }
 
+def stream_swe3_documents(client: SWE3MediaClient = None, writer: NDJSONWriter = None) -> bool:
+    """
+    Write each PDF document as an NDJSON record as soon as it is parsed,
+    then a summary record
+    
+    Documents come in media library order (newest upload first), not
+    sorted by modified date: nothing is held back until the end.
+    
+    Returns:
+        True on success
+    """
+    client = client or SWE3MediaClient()
+    writer = writer or NDJSONWriter()
+    
+    print(f'Fetching SWE3 media library: {client.api_url}', file=sys.stderr)
+    
+    error = None
+    try:
+        for doc in iter_swe3_documents(client):
+            writer.document(doc)
+    except (requests.exceptions.RequestException, RuntimeError) as e:
+        error = f'HTTP Error: {str(e)}'
+    except Exception as e:
+        error = f'Error: {str(e)}'
+    
+    if error:
+        print(f'\n✗ Error after {writer.count} documents: {error}', file=sys.stderr)
+    else:
+        print(f'\n✓ Found {writer.count} PDF documents', file=sys.stderr)
+    
+    writer.summary(
+        error is None,
+        error,
+        fetched_at=datetime.utcnow().isoformat(),
+        source=SOURCE,
+        transfer=client.stats,
+    )
+    return error is None
+
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description='List SWE3 media library PDFs')
+    add_output_argument(parser)
+    args = parser.parse_args()
+    
+    if args.output == 'ndjson':
+        sys.exit(0 if stream_swe3_documents() else 1)
+    
     result = scrape_swe3_documents()
     
     # Print summary
     if result['success']:
-        print(f'\nSummary:')
+        print(f'\nSummary:', file=sys.stderr)
         for doc in result['documents'][:5]:
-            print(f'  - {doc["title"]}')
-            print(f'    {doc["url"]}')
+            print(f'  - {doc["title"]}', file=sys.stderr)
+            print(f'    {doc["url"]}', file=sys.stderr)
         
         if len(result['documents']) > 5:
-            print(f'  ... and {len(result["documents"]) - 5} more')
+            print(f'  ... and {len(result["documents"]) - 5} more', file=sys.stderr)
     else:
-        print(f'\n✗ Error: {result["error"]}')
+        print(f'\n✗ Error: {result["error"]}', file=sys.stderr)
     
-    # Print JSON output
-    print(f'\n=== JSON Output ===')
+    # Print JSON output (stdout carries nothing else)
     print(json.dumps(result, indent=2, ensure_ascii=False))
     
     # Exit with proper code
@@ -4,12 +4,13 @@ SWE3 Document Scraper v2 - Using WordPress REST API
 This is the correct approach - fetch page content via REST API and extract PDFs
 """
 
-import requests
 import re
 import json
 import sys
 from typing import List, Dict
 
+from swe3_http import get_session
+
 def scrape_via_rest_api(page_id: int = 5776) -> Dict:
     """
     Fetch SWE3 page via WordPress REST API and extract PDFs
@@ -26,7 +27,7 @@ def scrape_via_rest_api(page_id: int = 5776) -> Dict:
     print(f'Fetching REST API: {api_url}')
     
     try:
-        response = requests.get(api_url, timeout=10)
+        response = get_session().get(api_url, timeout=10)
         response.raise_for_status()
         
         page_data = response.json()
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+SWE3 Search Index
+On-disk inverted index over the text of every SWE3 document version, with
+BM25 ranking. One SQLite file holds the documents (one row per version,
+keyed like the blob store: source URL + modified timestamp), the postings
+(term -> document, term frequency) and the compressed text used for
+snippets.
+
+Updates are incremental: adding a version replaces only that version's
+postings, and a version whose content hash is already indexed is skipped.
+Queries read the postings of the query terms only, so they answer in
+milliseconds however large the corpus grows.
+
+Usage:
+    python3 swe3_search_index.py query "offside straff" [--limit 10] [--latest]
+    python3 swe3_search_index.py add regler.pdf --url https://... [--title ...]
+    python3 swe3_search_index.py index-blobs [--blob-dir DIR]
+    python3 swe3_search_index.py stats
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    url TEXT NOT NULL,
+    title TEXT,
+    modified TEXT,
+    content_hash TEXT,
+    length INTEGER NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_url ON documents (url);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    doc_id INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc_id);
+CREATE TABLE IF NOT EXISTS texts (
+    doc_id INTEGER PRIMARY KEY,
+    text BLOB NOT NULL
+);
+'''
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Terms too common in rule texts to say anything about relevance
+STOPWORDS = frozenset('''
+och att det som en ett i på av för med till är den de om har inte kan ska vara eller
+från vid under efter när så där hur alla annat andra dess sin sitt sina man
+the of and to in is for on a an or be by at as it this that with are from
+'''.split())
+
+# Characters of context on each side of a snippet's first match
+SNIPPET_CONTEXT = 80
+
+
+def default_index_path(state_dir):
+    """Search index location inside the pipeline state directory"""
+    return os.path.join(state_dir, 'search.sqlite3')
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens, without stopwords and one-letter words"""
+    text = unicodedata.normalize('NFC', text).lower()
+    return [token for token in TOKEN_PATTERN.findall(text)
+            if (len(token) > 1 or token.isdigit()) and token not in STOPWORDS and not token.startswith('_')]
+
+
+class SWE3SearchIndex:
+    """Incremental BM25 index; safe to share between threads"""
+
+    def __init__(self, path):
+        """
+        Open (or create) the index
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        self.stats = {'added': 0, 'unchanged': 0, 'removed': 0}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def is_indexed(self, key, content_hash=None) -> bool:
+        """True if this version is indexed (with this content, when a hash is given)"""
+        with self._lock:
+            row = self._db.execute('SELECT content_hash FROM documents WHERE key = ?', (key,)).fetchone()
+        return bool(row) and (content_hash is None or row[0] == content_hash)
+
+    def add(self, key, text, url, title='', modified='', content_hash=None) -> bool:
+        """
+        Index one document version, replacing what was indexed under key
+
+        Args:
+            key: Version key (blob_key: URL@modified)
+            text: Extracted text
+            url: SWE3 source URL
+            title: Document title (indexed along with the text)
+            modified: SWE3 modified timestamp
+            content_hash: SHA-256 of the PDF; an unchanged version is skipped
+
+        Returns:
+            True if the index changed
+        """
+        if content_hash and self.is_indexed(key, content_hash):
+            self.stats['unchanged'] += 1
+            return False
+
+        terms = Counter(tokenize(f'{title}\n{text}'))
+        with self._lock:
+            self._db.execute('BEGIN')
+            try:
+                row = self._db.execute('SELECT id FROM documents WHERE key = ?', (key,)).fetchone()
+                values = (url, title, modified, content_hash, sum(terms.values()), _now())
+                if row:
+                    doc_id = row[0]
+                    self._db.execute('DELETE FROM postings WHERE doc_id = ?', (doc_id,))
+                    self._db.execute('UPDATE documents SET url = ?, title = ?, modified = ?, content_hash = ?, '
+                                     'length = ?, indexed_at = ? WHERE id = ?', values + (doc_id,))
+                else:
+                    doc_id = self._db.execute('INSERT INTO documents (url, title, modified, content_hash, length, '
+                                              'indexed_at, key) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                              values + (key,)).lastrowid
+                self._db.executemany('INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)',
+                                     ((term, doc_id, tf) for term, tf in terms.items()))
+                self._db.execute('INSERT OR REPLACE INTO texts (doc_id, text) VALUES (?, ?)',
+                                 (doc_id, zlib.compress(text.encode('utf-8'))))
+                self._db.execute('COMMIT')
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self.stats['added'] += 1
+        return True
+
+    def remove(self, key) -> bool:
+        """Drop one version from the index"""
+        with self._lock:
+            row = self._db.execute('SELECT id FROM documents WHERE key = ?', (key,)).fetchone()
+            if not row:
+                return False
+            self._db.execute('BEGIN')
+            for table, column in (('postings', 'doc_id'), ('texts', 'doc_id'), ('documents', 'id')):
+                self._db.execute(f'DELETE FROM {table} WHERE {column} = ?', (row[0],))
+            self._db.execute('COMMIT')
+            self.stats['removed'] += 1
+        return True
+
+    def search(self, query, limit=10, latest=False) -> List[Dict]:
+        """
+        Rank document versions against a query with BM25
+
+        A trailing * makes a term a prefix ("regel*" matches regeln,
+        regelbok, ...).
+
+        Args:
+            query: Free text
+            limit: Hits returned
+            latest: Only the newest indexed version of each URL
+
+        Returns:
+            Hits (best first): key, url, title, modified, score, snippet
+        """
+        terms = _query_terms(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            count, total_length = self._db.execute('SELECT COUNT(*), SUM(length) FROM documents').fetchone()
+            if not count:
+                return []
+            average_length = (total_length or 0) / count or 1
+
+            scores = Counter()
+            for term, prefix in terms:
+                if prefix:
+                    rows = self._db.execute(
+                        'SELECT p.doc_id, SUM(p.tf), d.length FROM postings p JOIN documents d ON d.id = p.doc_id '
+                        'WHERE p.term >= ? AND p.term < ? GROUP BY p.doc_id', (term, term + '\U0010ffff')
+                    ).fetchall()
+                else:
+                    rows = self._db.execute(
+                        'SELECT p.doc_id, p.tf, d.length FROM postings p JOIN documents d ON d.id = p.doc_id '
+                        'WHERE p.term = ?', (term,)
+                    ).fetchall()
+                idf = math.log(1 + (count - len(rows) + 0.5) / (len(rows) + 0.5))
+                for doc_id, tf, length in rows:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                    scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+            if not scores:
+                return []
+            ranked = [doc_id for doc_id, _ in scores.most_common()]
+            if latest:
+                ranked = self._latest_versions(ranked)
+
+            hits = []
+            for doc_id in ranked[:limit]:
+                key, url, title, modified, text = self._db.execute(
+                    'SELECT d.key, d.url, d.title, d.modified, t.text FROM documents d '
+                    'LEFT JOIN texts t ON t.doc_id = d.id WHERE d.id = ?', (doc_id,)
+                ).fetchone()
+                hits.append({
+                    'key': key,
+                    'url': url,
+                    'title': title,
+                    'modified': modified,
+                    'score': round(scores[doc_id], 4),
+                    'snippet': _snippet(zlib.decompress(text).decode('utf-8') if text else '', terms),
+                })
+        return hits
+
+    def _latest_versions(self, ranked):
+        """Keep, per URL, only the newest version that matched (called under the lock)"""
+        placeholders = ','.join('?' * len(ranked))
+        rows = self._db.execute(f'SELECT id, url, modified FROM documents WHERE id IN ({placeholders})',
+                                ranked).fetchall()
+        newest = {}
+        for doc_id, url, modified in rows:
+            if url not in newest or (modified or '') > newest[url][1]:
+                newest[url] = (doc_id, modified or '')
+        keep = {doc_id for doc_id, _ in newest.values()}
+        return [doc_id for doc_id in ranked if doc_id in keep]
+
+    def summary(self) -> Dict:
+        """Document, version and term counts"""
+        with self._lock:
+            versions, urls, total_length = self._db.execute(
+                'SELECT COUNT(*), COUNT(DISTINCT url), SUM(length) FROM documents').fetchone()
+            terms = self._db.execute('SELECT COUNT(DISTINCT term) FROM postings').fetchone()[0]
+        return {'versions': versions, 'documents': urls, 'terms': terms, 'tokens': total_length or 0,
+                'bytes': os.path.getsize(self.path)}
+
+    def close(self):
+        self._db.close()
+
+
+def _query_terms(query):
+    """(term, is_prefix) pairs, deduplicated, in query order"""
+    terms = []
+    for word in query.split():
+        prefix = word.endswith('*')
+        for token in tokenize(word.rstrip('*')):
+            if (token, prefix) not in terms:
+                terms.append((token, prefix))
+    return terms
+
+
+def _snippet(text, terms):
+    """Context around the first query term found in text"""
+    lowered = text.lower()
+    positions = [lowered.find(term) for term, _ in terms]
+    positions = [position for position in positions if position >= 0]
+    if not positions:
+        return text[:2 * SNIPPET_CONTEXT].replace('\n', ' ')
+    start = max(0, min(positions) - SNIPPET_CONTEXT)
+    end = min(len(text), min(positions) + SNIPPET_CONTEXT)
+    snippet = text[start:end].replace('\n', ' ')
+    return ('…' if start > 0 else '') + snippet + ('…' if end < len(text) else '')
+
+
+def _now():
+    return datetime.utcnow().isoformat() + 'Z'
+
+
+def index_files(index, entries, workers=None):
+    """
+    Extract and index files in the process pool
+
+    Args:
+        index: SWE3SearchIndex
+        entries: Iterable of (path, key, url, title, modified, content_hash)
+        workers: Extraction processes (default: one per CPU)
+
+    Returns:
+        Number of versions added
+    """
+    from swe3_pdf_text import TextExtractionPool
+
+    pool = TextExtractionPool(workers)
+    added = 0
+    try:
+        pending = []
+        for path, key, url, title, modified, content_hash in entries:
+            if content_hash and index.is_indexed(key, content_hash):
+                continue
+            pending.append((pool.submit(path), key, url, title, modified, content_hash))
+        for future, key, url, title, modified, content_hash in pending:
+            try:
+                text, _, _ = future.result()
+            except Exception as e:
+                print(f'[INDEX] {url}: {e}', file=sys.stderr)
+                continue
+            added += index.add(key, text, url, title, modified, content_hash)
+    finally:
+        pool.shutdown()
+    return added
+
+
+def main(argv=None):
+    """Command-line interface"""
+    from swe3_manifest import default_state_dir
+
+    parser = argparse.ArgumentParser(description='Search the text of every SWE3 document version')
+    parser.add_argument('--index', default=os.environ.get('SWE3_SEARCH_INDEX', default_index_path(default_state_dir())),
+                        help='Index file (env SWE3_SEARCH_INDEX)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    query = commands.add_parser('query', help='Ranked search')
+    query.add_argument('text', nargs='+')
+    query.add_argument('--limit', type=int, default=10)
+    query.add_argument('--latest', action='store_true', help='Only the newest version of each document')
+    query.add_argument('--output', choices=('text', 'json'), default='text')
+
+    add = commands.add_parser('add', help='Index PDF files')
+    add.add_argument('files', nargs='+')
+    add.add_argument('--url', help='Source URL (default: file path; only with one file)')
+    add.add_argument('--title', default='')
+    add.add_argument('--modified', default='')
+    add.add_argument('--workers', type=int, default=None)
+
+    blobs = commands.add_parser('index-blobs', help="Index every version in the pipeline's blob store")
+    blobs.add_argument('--blob-dir', default=os.environ.get('SWE3_BLOB_DIR', os.path.join(default_state_dir(), 'blobs')))
+    blobs.add_argument('--workers', type=int, default=None)
+
+    commands.add_parser('stats', help='Index size')
+    args = parser.parse_args(argv)
+
+    index = SWE3SearchIndex(args.index)
+    try:
+        if args.command == 'query':
+            started = time.perf_counter()
+            hits = index.search(' '.join(args.text), limit=args.limit, latest=args.latest)
+            took_ms = round((time.perf_counter() - started) * 1000, 2)
+            if args.output == 'json':
+                print(json.dumps({'hits': hits, 'took_ms': took_ms}, indent=2, ensure_ascii=False))
+            else:
+                for hit in hits:
+                    print(f"{hit['score']:8.3f}  {hit['title']} ({hit['modified']})\n          {hit['url']}\n"
+                          f"          {hit['snippet']}")
+                print(f'{len(hits)} hits in {took_ms} ms', file=sys.stderr)
+            return 0 if hits else 1
+
+        if args.command == 'add':
+            from swe3_blob_store import hash_file
+            from swe3_link_extractor import title_from_url
+
+            if args.url and len(args.files) > 1:
+                parser.error('--url needs exactly one file')
+            entries = []
+            for path in args.files:
+                url = args.url or os.path.abspath(path)
+                entries.append((path, f'{url}@{args.modified}', url, args.title or title_from_url(url),
+                                args.modified, hash_file(path)))
+            print(f'[INDEX] Added {index_files(index, entries, args.workers)} of {len(entries)} files', file=sys.stderr)
+            return 0
+
+        if args.command == 'index-blobs':
+            from swe3_blob_store import SWE3BlobStore
+            from swe3_link_extractor import title_from_url
+
+            store = SWE3BlobStore(args.blob_dir, max_bytes=0)
+            entries = []
+            for key, digest in store.keys.items():
+                url, _, modified = key.rpartition('@')
+                entries.append((store.path(digest), key, url, title_from_url(url), modified, digest))
+            print(f'[INDEX] Added {index_files(index, entries, args.workers)} of {len(entries)} blob versions',
+                  file=sys.stderr)
+            return 0
+
+        print(json.dumps(index.summary(), indent=2))
+        return 0
+    finally:
+        index.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
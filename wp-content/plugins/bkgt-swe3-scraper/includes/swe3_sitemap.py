@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+SWE3 Sitemap Discovery
+Streams document URLs out of the site's XML sitemaps. WordPress (core
+wp-sitemap.xml or Yoast's sitemap_index.xml) publishes a sitemap index
+pointing at many child sitemaps, some of them gzipped; a plain regex over
+/sitemap.xml finds nothing there.
+
+Each sitemap is parsed incrementally as its bytes arrive (XMLPullParser,
+inflating .xml.gz piecewise) and every <url>/<sitemap> element is dropped
+once read, so memory stays flat however large the sitemaps get. Child
+sitemaps are fetched concurrently; with a cut-off date, children whose
+index <lastmod> is older are not fetched at all and older entries are
+skipped. The cut-off can be kept between runs as a watermark in the state
+directory (--incremental).
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+from xml.etree import ElementTree
+
+from swe3_http import get_session
+from swe3_manifest import default_state_dir
+from swe3_output import NDJSONWriter, add_output_argument
+
+SWE3_BASE_URL = os.environ.get('SWE3_BASE_URL', 'https://amerikanskfotboll.swe3.se')
+
+# Tried in order when robots.txt names no sitemap (Yoast, WordPress core, generic)
+ROOT_SITEMAPS = ('/sitemap_index.xml', '/wp-sitemap.xml', '/sitemap.xml')
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Bytes read from the socket, and inflated from a .gz, per parser feed
+CHUNK_SIZE = 64 * 1024
+
+# The sitemap protocol caps a sitemap at 50 MB uncompressed; allow some slack
+MAX_SITEMAP_BYTES = 100 * 1024 * 1024
+
+# Sitemap indexes nested deeper than this are not followed
+MAX_DEPTH = 3
+
+# Parsed entries waiting for the consumer; bounds memory when it is slower than the fetchers
+QUEUE_SIZE = 1000
+
+DEFAULT_WORKERS = 4
+
+STATE_FILE = 'sitemap.json'
+
+
+@dataclass
+class SitemapEntry:
+    """One <url> from a sitemap"""
+    url: str
+    lastmod: Optional[str]
+    sitemap: str
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+class SitemapError(Exception):
+    """A sitemap could not be fetched or parsed"""
+
+
+def is_pdf_url(url: str) -> bool:
+    """True for URLs whose path ends in .pdf"""
+    return urlparse(url).path.lower().endswith('.pdf')
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse a W3C datetime as used by <lastmod> ('2025-03-01', '2025-03-01T10:00:00+01:00', ...)
+
+    Returns:
+        Timezone-aware datetime (UTC when the value has no offset), or None
+        when missing or unreadable
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.endswith(('Z', 'z')):
+        value = value[:-1] + '+00:00'
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _local_name(tag: str) -> str:
+    """Tag without its XML namespace"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _child_text(element, name: str) -> Optional[str]:
+    for child in element:
+        if _local_name(child.tag) == name:
+            return (child.text or '').strip() or None
+    return None
+
+
+def _inflated(chunks) -> Iterator[bytes]:
+    """Pass chunks through, inflating them piecewise when the body is gzip (.xml.gz)"""
+    chunks = (chunk for chunk in chunks if chunk)
+    first = next(chunks, b'')
+    if not first.startswith(GZIP_MAGIC):
+        yield first
+        yield from chunks
+        return
+
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    yield decompressor.decompress(first, CHUNK_SIZE)
+    while decompressor.unconsumed_tail:
+        yield decompressor.decompress(decompressor.unconsumed_tail, CHUNK_SIZE)
+    for chunk in chunks:
+        yield decompressor.decompress(chunk, CHUNK_SIZE)
+        while decompressor.unconsumed_tail:
+            yield decompressor.decompress(decompressor.unconsumed_tail, CHUNK_SIZE)
+    yield decompressor.flush()
+
+
+def parse_sitemap(chunks, max_bytes: int = MAX_SITEMAP_BYTES) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """
+    Stream the entries of one sitemap or sitemap index
+
+    Args:
+        chunks: Iterable of raw body bytes (plain XML or gzip)
+        max_bytes: Stop with SitemapError past this much (inflated) XML
+
+    Yields:
+        (kind, loc, lastmod) where kind is 'url' (urlset) or 'sitemap'
+        (sitemapindex); lastmod is the raw string or None
+    """
+    parser = ElementTree.XMLPullParser(events=('start', 'end'))
+    root = None
+    size = 0
+
+    def entries():
+        nonlocal root
+        for event, element in parser.read_events():
+            if event == 'start':
+                if root is None:
+                    root = element
+                continue
+            kind = _local_name(element.tag)
+            if kind in ('url', 'sitemap') and element is not root:
+                loc = _child_text(element, 'loc')
+                if loc:
+                    yield kind, loc, _child_text(element, 'lastmod')
+                # Drop every entry read so far; the tree never grows past one <url>
+                root.clear()
+
+    try:
+        for data in _inflated(chunks):
+            size += len(data)
+            if size > max_bytes:
+                raise SitemapError(f'sitemap larger than {max_bytes:,} bytes')
+            parser.feed(data)
+            yield from entries()
+        parser.close()
+    except (ElementTree.ParseError, zlib.error) as e:
+        raise SitemapError(f'unreadable sitemap: {e}') from e
+    yield from entries()
+
+
+class SWE3SitemapReader:
+    """Concurrent, streaming reader of a site's sitemap tree"""
+
+    def __init__(self, base_url: str = SWE3_BASE_URL, workers: int = DEFAULT_WORKERS,
+                 session=None, timeout: int = 30, roots: Optional[List[str]] = None):
+        """
+        Initialize reader
+
+        Args:
+            base_url: Site whose robots.txt / well-known sitemap paths are read
+            workers: Sitemaps fetched concurrently
+            session: requests session (defaults to the shared swe3_http one)
+            timeout: Per-request timeout (seconds)
+            roots: Sitemap URLs to start from instead of discovering them
+        """
+        self.base_url = base_url.rstrip('/') + '/'
+        self.workers = max(1, workers)
+        self.session = session or get_session()
+        self.timeout = timeout
+        self.roots = roots
+        self.newest = None
+        self.stats = {'sitemaps': 0, 'skipped_sitemaps': 0, 'entries': 0, 'matched': 0,
+                      'unchanged': 0, 'bytes': 0, 'errors': 0, 'seconds': 0.0}
+        self._stats_lock = threading.Lock()
+        self._visited = set()
+        self._stop = threading.Event()
+
+    def _count(self, key, amount=1):
+        """Increment a stats counter (shared by all fetch workers)"""
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def discover_roots(self) -> List[str]:
+        """
+        Sitemaps to start from: the Sitemap: lines of robots.txt, or else the
+        first well-known WordPress path that exists (Yoast redirects
+        wp-sitemap.xml to its own index, so only one is read)
+        """
+        if self.roots:
+            return list(self.roots)
+        try:
+            response = self.session.get(urljoin(self.base_url, '/robots.txt'), timeout=self.timeout)
+            if response.status_code == 200:
+                declared = []
+                for line in response.text.splitlines():
+                    key, _, value = line.partition(':')
+                    if key.strip().lower() == 'sitemap' and value.strip():
+                        declared.append(urljoin(self.base_url, value.strip()))
+                if declared:
+                    return declared
+        except Exception:
+            pass
+
+        for path in ROOT_SITEMAPS:
+            url = urljoin(self.base_url, path)
+            try:
+                with self.session.get(url, stream=True, timeout=self.timeout) as response:
+                    if response.status_code == 200:
+                        return [url]
+            except Exception:
+                continue
+        return []
+
+    def iter_entries(self, modified_after: Optional[str] = None,
+                     match: Optional[Callable[[str], bool]] = is_pdf_url) -> Iterator[SitemapEntry]:
+        """
+        Yield matching entries from every sitemap as they are parsed
+
+        Entries are not deduplicated across sitemaps (that would need memory
+        proportional to the site); entries without <lastmod> always pass
+        the cut-off.
+
+        Args:
+            modified_after: Only entries (and child sitemaps) with a newer
+                <lastmod> than this W3C datetime
+            match: URL filter (default: PDFs only; None for every URL)
+
+        Yields:
+            SitemapEntry per matching <url>
+        """
+        cutoff = parse_lastmod(modified_after)
+        if modified_after and cutoff is None:
+            raise ValueError(f'unreadable date: {modified_after}')
+
+        started = time.time()
+        results = queue.Queue(maxsize=QUEUE_SIZE)
+        done = object()
+        pending = 0
+        self._stop.clear()
+        self._visited = set()
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='sitemap')
+
+        def submit(url, depth):
+            nonlocal pending
+            with self._stats_lock:
+                if url in self._visited or self._stop.is_set():
+                    return
+                self._visited.add(url)
+                pending += 1
+                executor.submit(read, url, depth)
+
+        def put(item):
+            # A consumer that stopped early must not leave workers blocked forever
+            while not self._stop.is_set():
+                try:
+                    results.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def read(url, depth):
+            try:
+                for kind, loc, lastmod in self._fetch(url):
+                    if self._stop.is_set():
+                        break
+                    modified = parse_lastmod(lastmod)
+                    if kind == 'sitemap':
+                        if depth >= MAX_DEPTH:
+                            continue
+                        if cutoff and modified and modified <= cutoff:
+                            self._count('skipped_sitemaps')
+                            continue
+                        submit(urljoin(url, loc), depth + 1)
+                        continue
+
+                    self._count('entries')
+                    if match is not None and not match(loc):
+                        continue
+                    self._count('matched')
+                    if modified:
+                        with self._stats_lock:
+                            if self.newest is None or modified > self.newest:
+                                self.newest = modified
+                    if cutoff and modified and modified <= cutoff:
+                        self._count('unchanged')
+                        continue
+                    put(SitemapEntry(url=urljoin(url, loc), lastmod=lastmod, sitemap=url))
+            except Exception as e:
+                self._count('errors')
+                print(f"[SITEMAP] {url}: {e}", file=sys.stderr)
+            finally:
+                put(done)
+
+        try:
+            for url in self.discover_roots():
+                submit(url, 0)
+            while pending:
+                item = results.get()
+                if item is done:
+                    with self._stats_lock:
+                        pending -= 1
+                    continue
+                yield item
+        finally:
+            with self._stats_lock:
+                self._stop.set()
+            executor.shutdown(wait=True)
+            self.stats['seconds'] = round(time.time() - started, 3)
+
+    def _fetch(self, url: str):
+        """Stream one sitemap's entries"""
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                raise SitemapError(f'HTTP {response.status_code}')
+            self._count('sitemaps')
+            # iter_content undoes Content-Encoding; _inflated handles .xml.gz bodies
+            yield from parse_sitemap(self._counted(response.iter_content(CHUNK_SIZE)))
+
+    def _counted(self, chunks):
+        for chunk in chunks:
+            self._count('bytes', len(chunk))
+            yield chunk
+
+    def newest_lastmod(self) -> Optional[str]:
+        """Newest <lastmod> among matched entries seen so far (ISO, UTC), the next watermark"""
+        if self.newest is None:
+            return None
+        return self.newest.astimezone(timezone.utc).isoformat()
+
+
+def default_state_path(state_dir: Optional[str] = None) -> str:
+    """Sitemap watermark file in the state directory"""
+    return os.path.join(state_dir or default_state_dir(), STATE_FILE)
+
+
+def load_watermark(path: str) -> Optional[str]:
+    """Cut-off saved by the last complete run (missing or corrupt file = None)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('watermark')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def save_watermark(path: str, watermark: str):
+    """Write the cut-off for the next run atomically"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'watermark': watermark, 'saved_at': datetime.utcnow().isoformat() + 'Z'}, f)
+    os.replace(tmp_path, path)
+
+
+def advance_watermark(path: str, reader: SWE3SitemapReader, previous: Optional[str]):
+    """Save the reader's newest <lastmod> after a run that read every sitemap"""
+    if reader.stats['errors']:
+        # A sitemap that failed may hold changes older than what was read
+        return
+    newest = reader.newest_lastmod()
+    if newest and (not previous or parse_lastmod(newest) > parse_lastmod(previous)):
+        save_watermark(path, newest)
+
+
+def main():
+    """Command-line interface: stream document URLs found in the sitemaps"""
+    parser = argparse.ArgumentParser(description='List documents from the SWE3 sitemaps')
+    parser.add_argument('--base-url', default=SWE3_BASE_URL)
+    parser.add_argument('--sitemap', action='append', dest='roots',
+                        help='Start from this sitemap instead of robots.txt / well-known paths (repeatable)')
+    parser.add_argument('--since', help='Only entries with <lastmod> after this date (W3C datetime)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only entries changed since the last --incremental run, then move the watermark')
+    parser.add_argument('--state', default=None, help='Watermark file (default: sitemap.json in the state directory)')
+    parser.add_argument('--all-urls', action='store_true', help='Every URL, not just PDFs')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    add_output_argument(parser)
+    args = parser.parse_args()
+
+    state_path = args.state or default_state_path()
+    since = args.since
+    if args.incremental and not since:
+        since = load_watermark(state_path)
+
+    reader = SWE3SitemapReader(args.base_url, workers=args.workers, roots=args.roots)
+    match = None if args.all_urls else is_pdf_url
+    writer = NDJSONWriter() if args.output == 'ndjson' else None
+    documents = []
+
+    try:
+        for entry in reader.iter_entries(since, match=match):
+            if writer:
+                writer.document(entry.to_dict())
+            else:
+                documents.append(entry.to_dict())
+    except ValueError as e:
+        print(f"[SITEMAP] Error: {e}", file=sys.stderr)
+        return 1
+
+    print(f"[SITEMAP] {reader.stats}", file=sys.stderr)
+    if args.incremental:
+        advance_watermark(state_path, reader, since)
+
+    success = not reader.stats['errors']
+    if writer:
+        writer.summary(success, modified_after=since, watermark=reader.newest_lastmod() or since, stats=reader.stats)
+    else:
+        print(json.dumps({'success': success, 'modified_after': since, 'total_count': len(documents),
+                          'documents': documents, 'stats': reader.stats}, indent=2, ensure_ascii=False))
+    return 0 if success else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())